@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Benchmark: attendance transform (services.attendance.transform_attendance)
+
+Generates synthetic pyzk-style attendance logs and times the per-record loop
+_pull_from_device used before (three strftime calls per record) against the
+columnar transform. Columnar timings include formatting the kept
+PunchRecords as timesheet rows, so both variants produce the same output. Also reports the memory held by transformed records queued
+between the transform and write stages.
+
+Usage:
+    cd backend
+    python benchmarks/bench_attendance_transform.py              # 200,000 records
+    python benchmarks/bench_attendance_transform.py --records 50000 --batch 500
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.attendance import transform_attendance
+
+
+def make_logs(count):
+    """Synthetic buffer spanning about 70 days, 30s apart, 500 users"""
+    start = datetime(2026, 1, 1, 6, 0, 0)
+    return [
+        SimpleNamespace(user_id=i % 500 + 1, timestamp=start + timedelta(seconds=30 * i), punch=i % 6)
+        for i in range(count)
+    ]
+
+
+def legacy_transform(logs, device_id, start_date, end_date):
+    """The per-record loop from _pull_from_device before the columnar transform"""
+    records = []
+    filtered = 0
+    for log in logs:
+        if log.timestamp < start_date or log.timestamp > end_date:
+            filtered += 1
+            continue
+        punch = getattr(log, 'punch', 0) or 0
+        if punch in [0, 3, 4]:
+            log_type = 'in'
+        else:
+            log_type = 'out'
+        records.append({
+            'sync_id': f"ZK_{device_id}_{log.user_id}_{log.timestamp.strftime('%Y%m%d%H%M%S')}",
+            'user_code': str(log.user_id),
+            'log_type': log_type,
+            'date': log.timestamp.strftime("%Y-%m-%d"),
+            'time': log.timestamp.strftime("%H:%M:%S"),
+            'timestamp': log.timestamp
+        })
+    return records
+
+
+def columnar(batch, offset, start_date, end_date):
+    records, _ = transform_attendance(batch, 1, start_date, end_date, offset=offset)
+    return [record.timesheet_entry(1) for record in records]
+
+
+def held_memory_mb(build):
+    """Memory in MB still allocated by the object build() returns"""
+    tracemalloc.start()
+    held = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del held
+    return size / (1024 * 1024)
+
+
+def time_batches(fn, logs, batch, repeat):
+    """Best wall time in ms of running fn over logs in batches of `batch`"""
+    best = float('inf')
+    kept = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        kept = 0
+        for offset in range(0, len(logs), batch):
+            kept += len(fn(logs[offset:offset + batch], offset))
+        best = min(best, time.perf_counter() - started)
+    return best * 1000, kept
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--records', type=int, default=200_000, help="synthetic attendance records")
+    parser.add_argument('--batch', type=int, default=500, help="records per transform call (pull uses INGEST_BATCH_SIZE)")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per measurement (best is reported)")
+    args = parser.parse_args()
+
+    logs = make_logs(args.records)
+    # Keep roughly the newest half, like a date-ranged pull of an old buffer
+    start_date = logs[len(logs) // 2].timestamp
+    end_date = logs[-1].timestamp
+
+    variants = [
+        ("Legacy per-record loop", lambda batch, offset: legacy_transform(batch, 1, start_date, end_date)),
+        ("Columnar", lambda batch, offset: columnar(batch, offset, start_date, end_date)),
+    ]
+
+    print(f"{args.records:,} records, batches of {args.batch:,}:")
+    baseline = None
+    for label, fn in variants:
+        ms, kept = time_batches(fn, logs, args.batch, args.repeat)
+        baseline = baseline or ms
+        print(f"  {label:<24} {ms:8.1f} ms  ({kept:,} kept, {baseline / ms:.2f}x)")
+
+    print("\nMemory held by transformed records:")
+    dicts = held_memory_mb(lambda: legacy_transform(logs, 1, start_date, end_date))
+    punches = held_memory_mb(lambda: transform_attendance(logs, 1, start_date, end_date)[0])
+    print(f"  {'Row dicts (legacy)':<24} {dicts:8.1f} MB")
+    print(f"  {'PunchRecord':<24} {punches:8.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Benchmark: push queue fetch (Database.get_unsynced_timesheets)
+
+Builds a throwaway database with a large, mostly-synced timesheet history and
+times the pending-queue query with the legacy index set (a plain index on
+backend_timesheet_id) and with the idx_timesheet_pending partial index.
+
+Usage:
+    cd backend
+    python benchmarks/bench_unsynced_queue.py               # 1,000,000 rows
+    python benchmarks/bench_unsynced_queue.py --rows 200000 --pending 5000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database
+
+LEGACY_INDEXES = [
+    "DROP INDEX idx_timesheet_pending",
+    "CREATE INDEX idx_timesheet_backend_id ON timesheet(backend_timesheet_id)",
+]
+
+CURRENT_INDEXES = [
+    "DROP INDEX idx_timesheet_backend_id",
+    """
+    CREATE INDEX idx_timesheet_pending
+    ON timesheet(created_at, id)
+    WHERE backend_timesheet_id IS NULL AND status = 'success' AND sync_rejected = 0
+    """,
+]
+
+
+def populate(db, rows, pending):
+    """Insert `rows` timesheet rows, the newest `pending` of which are unsynced"""
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    cursor.executemany(
+        "INSERT INTO employee (backend_id, name, employee_code) VALUES (?, ?, ?)",
+        [(i, f"User {i}", str(i)) for i in range(1, 501)]
+    )
+    start = datetime(2025, 1, 1)
+    batch = []
+    for i in range(rows):
+        ts = start + timedelta(seconds=i * 30)
+        synced = i < rows - pending
+        batch.append((
+            f"ZK_1_{i % 500 + 1}_{ts:%Y%m%d%H%M%S}_{i}",
+            i % 500 + 1,
+            'in' if i % 2 == 0 else 'out',
+            ts.strftime("%Y-%m-%d"),
+            ts.strftime("%H:%M:%S"),
+            ts,
+            i if synced else None,
+        ))
+        if len(batch) >= 50000:
+            insert_batch(cursor, batch)
+            batch = []
+    if batch:
+        insert_batch(cursor, batch)
+    conn.commit()
+    cursor.execute("ANALYZE")
+    conn.close()
+
+
+def insert_batch(cursor, batch):
+    cursor.executemany("""
+        INSERT INTO timesheet (sync_id, employee_id, log_type, date, time, created_at, backend_timesheet_id, status)
+        VALUES (?, ?, ?, ?, ?, ?, ?, 'success')
+    """, batch)
+
+
+def time_queue_fetch(db, limit, repeat):
+    """Return the best wall time of `repeat` queue fetches, in milliseconds"""
+    best = float('inf')
+    fetched = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fetched = len(db.get_unsynced_timesheets(limit=limit))
+        best = min(best, time.perf_counter() - started)
+    return best * 1000, fetched
+
+
+def apply_indexes(db, statements):
+    conn = db.get_connection()
+    for sql in statements:
+        conn.execute(sql)
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+
+
+def query_plan(db):
+    conn = db.get_connection()
+    rows = conn.execute("""
+        EXPLAIN QUERY PLAN
+        SELECT t.id FROM timesheet t
+        WHERE t.backend_timesheet_id IS NULL AND t.status = 'success' AND t.sync_rejected = 0
+        AND (t.next_attempt_at IS NULL OR t.next_attempt_at <= ?)
+        ORDER BY t.created_at ASC LIMIT 100
+    """, (datetime.now(),)).fetchall()
+    conn.close()
+    return [row['detail'] for row in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000, help="total timesheet rows")
+    parser.add_argument('--pending', type=int, default=10_000, help="rows not yet pushed")
+    parser.add_argument('--limit', type=int, default=10_000, help="queue fetch limit (push_data uses 10000)")
+    parser.add_argument('--repeat', type=int, default=5, help="runs per measurement (best is reported)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, 'bench.db'))
+
+        print(f"Populating {args.rows:,} rows ({args.pending:,} pending)...")
+        started = time.perf_counter()
+        populate(db, args.rows, args.pending)
+        print(f"  done in {time.perf_counter() - started:.1f}s\n")
+
+        for label, statements in (("Legacy indexes (idx_timesheet_backend_id)", LEGACY_INDEXES),
+                                  ("Partial index (idx_timesheet_pending)", CURRENT_INDEXES)):
+            apply_indexes(db, statements)
+            print(f"{label}:")
+            print(f"  plan: {'; '.join(query_plan(db))}")
+            ms, fetched = time_queue_fetch(db, args.limit, args.repeat)
+            print(f"  fetched {fetched:,} rows in {ms:.1f} ms")
+            ms, fetched = time_queue_fetch(db, 100, args.repeat)
+            print(f"  fetched {fetched:,} rows in {ms:.1f} ms\n")
+
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
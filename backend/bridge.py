@@ -37,12 +37,17 @@ class Bridge(QObject):
         self.pull_service = pull_service
         self.push_service = push_service
         self.scheduler = scheduler
+        self.live_capture = None
         logger.info("Bridge initialized")
 
     def set_scheduler(self, scheduler):
         """Set the scheduler reference (called after scheduler is created)"""
         self.scheduler = scheduler
 
+    def set_live_capture(self, live_capture):
+        """Set the live capture service reference (called after it is created)"""
+        self.live_capture = live_capture
+
     # ==================== TIMESHEET METHODS ====================
 
     @pyqtSlot(result=str)
@@ -55,6 +60,16 @@ class Bridge(QObject):
             logger.error(f"Error getting timesheet stats: {e}")
             return json.dumps({"success": False, "error": str(e)})
 
+    @pyqtSlot(result=str)
+    def getTimesheetStatsByDevice(self):
+        """Get timesheet statistics per device"""
+        try:
+            stats = self.database.get_timesheet_stats_by_device()
+            return json.dumps({"success": True, "data": stats})
+        except Exception as e:
+            logger.error(f"Error getting timesheet stats by device: {e}")
+            return json.dumps({"success": False, "error": str(e)})
+
     @pyqtSlot(int, int, result=str)
     def getAllTimesheets(self, limit=1000, offset=0):
         """Get all timesheets with pagination"""
@@ -65,6 +80,20 @@ class Bridge(QObject):
             logger.error(f"Error getting timesheets: {e}")
             return json.dumps({"success": False, "error": str(e)})
 
+    @pyqtSlot(int, str, result=str)
+    def getTimesheetsPage(self, limit=100, cursor=''):
+        """Get one page of timesheets (newest first) using a continuation cursor
+
+        Pass an empty cursor for the first page, then the returned next_cursor
+        for each following page. next_cursor is null on the last page.
+        """
+        try:
+            page = self.database.get_timesheets_page(limit, cursor or None)
+            return json.dumps({"success": True, "data": page['data'], "next_cursor": page['next_cursor']})
+        except Exception as e:
+            logger.error(f"Error getting timesheet page: {e}")
+            return json.dumps({"success": False, "error": str(e)})
+
     @pyqtSlot(int, result=str)
     def getUnsyncedTimesheets(self, limit=100):
         """Get unsynced timesheets"""
@@ -79,12 +108,15 @@ class Bridge(QObject):
     def retryFailedTimesheet(self, timesheet_id):
         """Retry syncing a failed timesheet"""
         try:
-            # Clear error message to retry
+            # Clear the error and retry schedule so the next push sends it
             conn = self.database.get_connection()
             cursor = conn.cursor()
             cursor.execute("""
                 UPDATE timesheet
-                SET sync_error_message = NULL
+                SET sync_error_message = NULL,
+                    sync_attempts = 0,
+                    next_attempt_at = NULL,
+                    sync_rejected = 0
                 WHERE id = ?
             """, (timesheet_id,))
             conn.commit()
@@ -306,7 +338,9 @@ class Bridge(QObject):
                 'device_ip', 'device_port',
                 'push_url', 'push_auth_type', 'push_credentials',
                 'push_username', 'push_password',
-                'pull_interval_minutes', 'push_interval_minutes'
+                'pull_interval_minutes', 'push_interval_minutes',
+                'pull_max_workers', 'push_max_in_flight', 'push_batch_min', 'push_batch_max',
+                'rotation_window_start', 'rotation_window_end', 'rotation_require_pushed'
             ]
 
             for field in allowed_fields:
@@ -449,6 +483,8 @@ class Bridge(QObject):
             if success:
                 logger.info(f"Updated device {device_id}: {name}")
                 self.database.log_config_change(f"Updated device: {name}")
+                if self.live_capture:
+                    self.live_capture.refresh()
                 return json.dumps({"success": True, "message": "Device updated successfully"})
             else:
                 return json.dumps({"success": False, "error": "Device not found"})
@@ -456,6 +492,45 @@ class Bridge(QObject):
             logger.error(f"Error updating device: {e}")
             return json.dumps({"success": False, "error": str(e)})
 
+    @pyqtSlot(int, bool, result=str)
+    def setDeviceLiveCapture(self, device_id, enabled):
+        """Turn real-time live capture on or off for a device"""
+        try:
+            success = self.database.update_device(device_id, live_capture=enabled)
+            if not success:
+                return json.dumps({"success": False, "error": "Device not found"})
+
+            device = self.database.get_device(device_id)
+            state = "enabled" if enabled else "disabled"
+            logger.info(f"Live capture {state} for device {device_id}")
+            self.database.log_config_change(f"Live capture {state}: {device['name']}")
+
+            if self.live_capture:
+                self.live_capture.refresh()
+
+            return json.dumps({"success": True, "message": f"Live capture {state}"})
+        except Exception as e:
+            logger.error(f"Error setting live capture: {e}")
+            return json.dumps({"success": False, "error": str(e)})
+
+    @pyqtSlot(int, int, result=str)
+    def setDeviceRotation(self, device_id, threshold):
+        """Set the buffer size at which a device's attendance is rotated (0 turns rotation off)"""
+        try:
+            success = self.database.update_device(device_id, rotation_threshold=threshold)
+            if not success:
+                return json.dumps({"success": False, "error": "Device not found"})
+
+            device = self.database.get_device(device_id)
+            state = f"at {threshold} records" if threshold > 0 else "off"
+            logger.info(f"Buffer rotation for device {device_id}: {state}")
+            self.database.log_config_change(f"Buffer rotation {state}: {device['name']}")
+
+            return json.dumps({"success": True, "message": f"Buffer rotation {state}"})
+        except Exception as e:
+            logger.error(f"Error setting buffer rotation: {e}")
+            return json.dumps({"success": False, "error": str(e)})
+
     @pyqtSlot(int, result=str)
     def deleteDevice(self, device_id):
         """Delete a device"""
@@ -469,6 +544,8 @@ class Bridge(QObject):
             if success:
                 logger.info(f"Deleted device: {device_name}")
                 self.database.log_config_change(f"Deleted device: {device_name}")
+                if self.live_capture:
+                    self.live_capture.refresh()
                 return json.dumps({"success": True, "message": "Device deleted successfully"})
             else:
                 return json.dumps({"success": False, "error": "Device not found"})
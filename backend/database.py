@@ -4,15 +4,41 @@ SQLite database for storing timesheet data and sync status
 """
 
 import sqlite3
+import base64
 import json
 import sys
 import os
-from datetime import datetime
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
 from pathlib import Path
 import logging
 
+from migrations import run_migrations, rebuild_timesheet_stats
+
 logger = logging.getLogger(__name__)
 
+# Number of idle connections kept open for reuse
+DEFAULT_POOL_SIZE = 5
+
+# Idle connections older than this are health-checked before being handed out
+POOL_HEALTH_CHECK_SECONDS = 60
+
+# Prepared statements cached per connection
+STATEMENT_CACHE_SIZE = 256
+
+# Timesheet rows written per transaction by add_timesheet_entries
+INGEST_CHUNK_SIZE = 500
+
+# Maximum number of employees kept in the employee_code lookup cache
+EMPLOYEE_CACHE_SIZE = 5000
+
+# Bound parameters per IN (...) list, below SQLite's default variable limit
+SQL_VARIABLE_CHUNK = 500
+# Seconds a connection waits on another writer's lock before raising "database is locked"
+BUSY_TIMEOUT_SECONDS = 30
+
 # Determine if running as frozen executable
 IS_FROZEN = getattr(sys, 'frozen', False)
 
@@ -34,8 +60,183 @@ def get_app_data_dir():
         # Development: use local database folder
         return os.path.join(os.path.dirname(os.path.abspath(__file__)), 'database')
 
+
+def encode_page_cursor(date, time, timesheet_id):
+    """Build an opaque continuation token for get_timesheets_page"""
+    raw = json.dumps([date, time, timesheet_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_page_cursor(cursor):
+    """Decode a get_timesheets_page continuation token into (date, time, id)"""
+    try:
+        date, time, timesheet_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(date), str(time), int(timesheet_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid pagination cursor")
+
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection that returns itself to its pool on close()"""
+
+    pool = None
+    last_used = 0.0
+    in_pool = False  # idle in the pool; a second close() must not add it again
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.release(self)
+        else:
+            super().close()
+
+    def close_for_real(self):
+        """Close the underlying SQLite connection"""
+        self.pool = None
+        super().close()
+
+
+class ConnectionPool:
+    """Thread-safe pool of reusable SQLite connections
+
+    Connections are handed out to one thread at a time and go back to the
+    pool when the caller closes them. When every pooled connection is in use
+    an extra connection is opened and discarded on release, so callers never
+    block waiting for each other.
+    """
+
+    def __init__(self, db_path, size=DEFAULT_POOL_SIZE):
+        self.db_path = str(db_path)
+        self.size = max(1, int(size))
+        self._idle = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _open(self):
+        conn = sqlite3.connect(
+            self.db_path,
+            factory=PooledConnection,
+            check_same_thread=False,
+            timeout=BUSY_TIMEOUT_SECONDS,
+            cached_statements=STATEMENT_CACHE_SIZE
+        )
+        conn.row_factory = sqlite3.Row
+        conn.pool = self
+        return conn
+
+    def _is_healthy(self, conn):
+        """Check that an idle connection still works"""
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def acquire(self):
+        """Get a connection from the pool (or open a new one)"""
+        while True:
+            with self._lock:
+                if self._closed:
+                    raise sqlite3.ProgrammingError("Connection pool is closed")
+                conn = self._idle.pop() if self._idle else None
+                if conn is not None:
+                    conn.in_pool = False
+
+            if conn is None:
+                return self._open()
+
+            if time.monotonic() - conn.last_used < POOL_HEALTH_CHECK_SECONDS or self._is_healthy(conn):
+                return conn
+
+            logger.warning("Discarding unhealthy pooled database connection")
+            conn.close_for_real()
+
+    def release(self, conn):
+        """Return a connection to the pool, discarding it if the pool is full
+
+        Releasing a connection that is already idle in the pool does nothing.
+        """
+        with self._lock:
+            if conn.in_pool:
+                return
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            conn.row_factory = sqlite3.Row
+        except sqlite3.Error:
+            conn.close_for_real()
+            return
+
+        conn.last_used = time.monotonic()
+        with self._lock:
+            if conn.in_pool:
+                return
+            if not self._closed and len(self._idle) < self.size:
+                conn.in_pool = True
+                self._idle.append(conn)
+                return
+        conn.close_for_real()
+
+    def close(self):
+        """Close all idle connections and stop pooling"""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close_for_real()
+
+
+class EmployeeCache:
+    """Bounded, thread-safe LRU cache of employee rows keyed by employee_code"""
+
+    def __init__(self, max_size=EMPLOYEE_CACHE_SIZE):
+        self.max_size = max(1, int(max_size))
+        self.hits = 0
+        self.misses = 0
+        self._rows = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, employee_code):
+        """Return a copy of the cached row, or None on a miss"""
+        with self._lock:
+            row = self._rows.get(employee_code)
+            if row is None:
+                self.misses += 1
+                return None
+            self._rows.move_to_end(employee_code)
+            self.hits += 1
+            return dict(row)
+
+    def put(self, employee_code, row):
+        with self._lock:
+            self._rows[employee_code] = dict(row)
+            self._rows.move_to_end(employee_code)
+            while len(self._rows) > self.max_size:
+                self._rows.popitem(last=False)
+
+    def invalidate(self, employee_code=None, backend_id=None):
+        """Drop entries for an employee_code and/or backend_id
+
+        With no arguments the whole cache is cleared.
+        """
+        with self._lock:
+            if employee_code is None and backend_id is None:
+                self._rows.clear()
+                return
+            if employee_code is not None:
+                self._rows.pop(employee_code, None)
+            if backend_id is not None:
+                stale = [code for code, row in self._rows.items()
+                         if str(row.get('backend_id')) == str(backend_id)]
+                for code in stale:
+                    del self._rows[code]
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._rows), 'hits': self.hits, 'misses': self.misses}
+
+
 class Database:
-    def __init__(self, db_path=None):
+    def __init__(self, db_path=None, pool_size=DEFAULT_POOL_SIZE):
         """Initialize database connection and create tables if needed"""
         if db_path:
             self.db_path = Path(db_path)
@@ -46,274 +247,36 @@ class Database:
 
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
         logger.info(f"Database path: {self.db_path}")
+        self.pool = ConnectionPool(self.db_path, size=pool_size)
+        self.employee_cache = EmployeeCache()
+        # Serializes bulk ingest writes so parallel device pulls queue up in
+        # Python instead of spinning on SQLite's busy handler
+        self._write_lock = threading.RLock()
         self.init_database()
 
     def get_connection(self):
-        """Get database connection with row factory"""
-        conn = sqlite3.connect(str(self.db_path))
-        conn.row_factory = sqlite3.Row
-        return conn
+        """Get a pooled database connection with row factory
+
+        Calling close() on the returned connection hands it back to the pool;
+        any transaction left open is rolled back first.
+        """
+        return self.pool.acquire()
+
+    def close(self):
+        """Close all pooled connections (call on application shutdown)"""
+        self.pool.close()
+        logger.info("Database connections closed")
 
     def init_database(self):
-        """Create all tables and indexes"""
+        """Bring the schema up to date by applying any pending migrations"""
         conn = self.get_connection()
-        cursor = conn.cursor()
-
         try:
-            # Company table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS company (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    backend_id INTEGER UNIQUE,
-                    name TEXT NOT NULL,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_company_backend_id ON company(backend_id)")
-
-            # Employee table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS employee (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    backend_id INTEGER UNIQUE,
-                    name TEXT NOT NULL,
-                    employee_code TEXT,
-                    employee_number INTEGER,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    deleted_at DATETIME
-                )
-            """)
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_employee_backend_id ON employee(backend_id)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_employee_code ON employee(employee_code)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_employee_deleted_at ON employee(deleted_at)")
-
-            # Timesheet table (primary sync table)
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS timesheet (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    sync_id TEXT UNIQUE NOT NULL,
-                    employee_id INTEGER NOT NULL,
-                    log_type TEXT NOT NULL CHECK(log_type IN ('in', 'out')),
-                    date TEXT NOT NULL,
-                    time TEXT NOT NULL,
-                    photo_path TEXT,
-                    is_synced BOOLEAN DEFAULT 0,
-                    status TEXT DEFAULT 'success',
-                    error_message TEXT,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    backend_timesheet_id INTEGER,
-                    synced_at DATETIME,
-                    sync_error_message TEXT,
-                    FOREIGN KEY (employee_id) REFERENCES employee(id)
-                )
-            """)
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_timesheet_sync_id ON timesheet(sync_id)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_timesheet_employee_id ON timesheet(employee_id)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_timesheet_date ON timesheet(date)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_timesheet_is_synced ON timesheet(is_synced)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_timesheet_backend_id ON timesheet(backend_timesheet_id)")
-
-            # Users table (admin access)
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS users (
-                    id INTEGER PRIMARY KEY CHECK (id = 1),
-                    email TEXT NOT NULL,
-                    name TEXT NOT NULL,
-                    is_active BOOLEAN DEFAULT 1,
-                    last_login DATETIME,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-
-            # Sync logs table (track pull/push/config/other operations)
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS sync_logs (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    sync_type TEXT NOT NULL CHECK(sync_type IN ('pull', 'push', 'config', 'other')),
-                    status TEXT NOT NULL CHECK(status IN ('started', 'success', 'error')),
-                    records_processed INTEGER DEFAULT 0,
-                    records_success INTEGER DEFAULT 0,
-                    records_failed INTEGER DEFAULT 0,
-                    error_message TEXT,
-                    started_at DATETIME NOT NULL,
-                    completed_at DATETIME,
-                    metadata TEXT
-                )
-            """)
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_sync_logs_type ON sync_logs(sync_type)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_sync_logs_status ON sync_logs(status)")
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_sync_logs_started ON sync_logs(started_at)")
-
-            # Device table (for multi-device support)
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS device (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    ip TEXT NOT NULL,
-                    port INTEGER DEFAULT 4370,
-                    comm_key INTEGER DEFAULT 0,
-                    branch_id TEXT,
-                    enabled BOOLEAN DEFAULT 1,
-                    last_pull_at DATETIME,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                    deleted_at DATETIME
-                )
-            """)
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_device_enabled ON device(enabled)")
-            # Note: idx_device_deleted_at and idx_device_unique_ip_active are created after migration adds deleted_at column
-
-            # API configuration table
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS api_config (
-                    id INTEGER PRIMARY KEY CHECK (id = 1),
-                    device_ip TEXT,
-                    device_port INTEGER DEFAULT 4370,
-                    push_url TEXT,
-                    push_auth_type TEXT,
-                    push_credentials TEXT,
-                    push_username TEXT,
-                    push_password TEXT,
-                    push_token TEXT,
-                    push_token_created_at DATETIME,
-                    pull_interval_minutes INTEGER DEFAULT 30,
-                    push_interval_minutes INTEGER DEFAULT 15,
-                    last_pull_at DATETIME,
-                    last_push_at DATETIME,
-                    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-
-            # Add new columns to existing table if they don't exist (for migration)
-            # Device config fields
-            try:
-                cursor.execute("ALTER TABLE api_config ADD COLUMN device_ip TEXT")
-            except:
-                pass
-            try:
-                cursor.execute("ALTER TABLE api_config ADD COLUMN device_port INTEGER DEFAULT 4370")
-            except:
-                pass
-            # YAHSHUA push credential fields
-            try:
-                cursor.execute("ALTER TABLE api_config ADD COLUMN push_username TEXT")
-            except:
-                pass
-            try:
-                cursor.execute("ALTER TABLE api_config ADD COLUMN push_password TEXT")
-            except:
-                pass
-            try:
-                cursor.execute("ALTER TABLE api_config ADD COLUMN push_token TEXT")
-            except:
-                pass
-            try:
-                cursor.execute("ALTER TABLE api_config ADD COLUMN push_token_created_at DATETIME")
-            except:
-                pass
-            # YAHSHUA user info from login response
-            try:
-                cursor.execute("ALTER TABLE api_config ADD COLUMN push_user_logged TEXT")
-            except:
-                pass
-
-            # Migration: Update sync_logs table to allow 'other' sync_type
-            # Check if we need to migrate by trying to insert and rollback
-            try:
-                cursor.execute("INSERT INTO sync_logs (sync_type, status, started_at) VALUES ('other', 'success', datetime('now'))")
-                # If it works, delete the test record
-                cursor.execute("DELETE FROM sync_logs WHERE sync_type = 'other' AND rowid = last_insert_rowid()")
-            except sqlite3.IntegrityError:
-                # Need to migrate - recreate table with new constraint
-                logger.info("Migrating sync_logs table to support 'other' sync_type")
-                cursor.execute("ALTER TABLE sync_logs RENAME TO sync_logs_old")
-                cursor.execute("""
-                    CREATE TABLE sync_logs (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        sync_type TEXT NOT NULL CHECK(sync_type IN ('pull', 'push', 'config', 'other')),
-                        status TEXT NOT NULL CHECK(status IN ('started', 'success', 'error')),
-                        records_processed INTEGER DEFAULT 0,
-                        records_success INTEGER DEFAULT 0,
-                        records_failed INTEGER DEFAULT 0,
-                        error_message TEXT,
-                        started_at DATETIME NOT NULL,
-                        completed_at DATETIME,
-                        metadata TEXT
-                    )
-                """)
-                cursor.execute("""
-                    INSERT INTO sync_logs (id, sync_type, status, records_processed, records_success,
-                        records_failed, error_message, started_at, completed_at, metadata)
-                    SELECT id, sync_type, status, records_processed, records_success,
-                        records_failed, error_message, started_at, completed_at, metadata
-                    FROM sync_logs_old
-                """)
-                cursor.execute("DROP TABLE sync_logs_old")
-                cursor.execute("CREATE INDEX IF NOT EXISTS idx_sync_logs_type ON sync_logs(sync_type)")
-                cursor.execute("CREATE INDEX IF NOT EXISTS idx_sync_logs_status ON sync_logs(status)")
-                cursor.execute("CREATE INDEX IF NOT EXISTS idx_sync_logs_started ON sync_logs(started_at)")
-                logger.info("sync_logs table migration completed")
-
-            # Insert default config if not exists
-            cursor.execute("SELECT COUNT(*) as count FROM api_config WHERE id = 1")
-            if cursor.fetchone()['count'] == 0:
-                cursor.execute("""
-                    INSERT INTO api_config (id, pull_interval_minutes, push_interval_minutes)
-                    VALUES (1, 30, 15)
-                """)
-
-            # Add device_id column to timesheet table (for multi-device support)
-            try:
-                cursor.execute("ALTER TABLE timesheet ADD COLUMN device_id INTEGER REFERENCES device(id)")
-                cursor.execute("CREATE INDEX IF NOT EXISTS idx_timesheet_device_id ON timesheet(device_id)")
-            except:
-                pass
-
-            # Add deleted_at column to device table (for soft delete)
-            try:
-                cursor.execute("ALTER TABLE device ADD COLUMN deleted_at DATETIME")
-            except:
-                pass  # Column already exists
-
-            # Add comm_key column to device table (for device communication password)
-            try:
-                cursor.execute("ALTER TABLE device ADD COLUMN comm_key INTEGER DEFAULT 0")
-            except:
-                pass  # Column already exists
-
-            # Add branch_id column to device table (for YAHSHUA branch association)
-            try:
-                cursor.execute("ALTER TABLE device ADD COLUMN branch_id TEXT")
-            except:
-                pass  # Column already exists
-
-            # Create indexes for deleted_at (after column exists)
-            cursor.execute("CREATE INDEX IF NOT EXISTS idx_device_deleted_at ON device(deleted_at)")
-            cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_device_unique_ip_active ON device(ip) WHERE deleted_at IS NULL")
-
-            # Migrate existing device config from api_config to device table
-            cursor.execute("SELECT COUNT(*) as count FROM device")
-            if cursor.fetchone()['count'] == 0:
-                # Check if there's an existing device config in api_config
-                cursor.execute("SELECT device_ip, device_port FROM api_config WHERE id = 1")
-                row = cursor.fetchone()
-                if row and row['device_ip']:
-                    # Migrate existing device to new device table
-                    cursor.execute("""
-                        INSERT INTO device (name, ip, port, enabled)
-                        VALUES (?, ?, ?, 1)
-                    """, ('Device 1', row['device_ip'], row['device_port'] or 4370))
-                    migrated_device_id = cursor.lastrowid
-                    # Update existing timesheet records to reference the migrated device
-                    cursor.execute("""
-                        UPDATE timesheet SET device_id = ? WHERE device_id IS NULL
-                    """, (migrated_device_id,))
-                    logger.info(f"Migrated existing device config to device table (id={migrated_device_id})")
-
-            conn.commit()
+            applied = run_migrations(conn)
+            if applied:
+                total_ms = sum(elapsed_ms for _, _, elapsed_ms in applied)
+                logger.info(f"Database schema migrated to version {applied[-1][0]} in {total_ms:.1f} ms")
             logger.info("Database initialized successfully")
         except Exception as e:
-            conn.rollback()
             logger.error(f"Database initialization error: {e}")
             raise
         finally:
@@ -341,8 +304,61 @@ class Database:
         finally:
             conn.close()
 
-    def get_unsynced_timesheets(self, limit=100):
-        """Get timesheet entries that need to be pushed to backend"""
+    def add_timesheet_entries(self, entries, chunk_size=INGEST_CHUNK_SIZE):
+        """Add many timesheet entries, committing once per chunk
+
+        Args:
+            entries: Iterable of dicts with the add_timesheet_entry fields
+                     (sync_id, employee_id, log_type, date, time, and optionally
+                     photo_path and device_id)
+            chunk_size: Number of entries written per transaction
+
+        Returns:
+            dict: {'new_records', 'duplicates', 'chunks'} where chunks is a list of
+                  {'new_records', 'duplicates'} per committed chunk
+        """
+        result = {'new_records': 0, 'duplicates': 0, 'chunks': []}
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            chunk = []
+            for entry in entries:
+                chunk.append((
+                    entry['sync_id'], entry['employee_id'], entry['log_type'],
+                    entry['date'], entry['time'], entry.get('photo_path'), entry.get('device_id')
+                ))
+                if len(chunk) >= chunk_size:
+                    self._write_timesheet_chunk(conn, cursor, chunk, result)
+                    chunk = []
+            if chunk:
+                self._write_timesheet_chunk(conn, cursor, chunk, result)
+            return result
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Error adding timesheet entries: {e}")
+            raise
+        finally:
+            conn.close()
+
+    def _write_timesheet_chunk(self, conn, cursor, rows, result):
+        """Insert one chunk of timesheet rows in a single transaction"""
+        with self._write_lock:
+            cursor.executemany("""
+                INSERT OR IGNORE INTO timesheet (sync_id, employee_id, log_type, date, time, photo_path, status, device_id)
+                VALUES (?, ?, ?, ?, ?, ?, 'success', ?)
+            """, rows)
+            conn.commit()
+        new_records = max(cursor.rowcount, 0)
+        duplicates = len(rows) - new_records
+        result['new_records'] += new_records
+        result['duplicates'] += duplicates
+        result['chunks'].append({'new_records': new_records, 'duplicates': duplicates})
+
+    def get_unsynced_timesheets(self, limit=100, now=None):
+        """Get timesheet entries that are due to be pushed to backend
+
+        Rows rejected for good, or waiting out a retry delay, are left out.
+        """
         conn = self.get_connection()
         cursor = conn.cursor()
         try:
@@ -354,9 +370,11 @@ class Database:
                 LEFT JOIN device d ON t.device_id = d.id
                 WHERE t.backend_timesheet_id IS NULL
                 AND t.status = 'success'
+                AND t.sync_rejected = 0
+                AND (t.next_attempt_at IS NULL OR t.next_attempt_at <= ?)
                 ORDER BY t.created_at ASC
                 LIMIT ?
-            """, (limit,))
+            """, (now or datetime.now(), limit))
             return [dict(row) for row in cursor.fetchall()]
         finally:
             conn.close()
@@ -399,23 +417,128 @@ class Database:
         finally:
             conn.close()
 
+    def mark_timesheets_synced(self, synced):
+        """Mark many timesheet entries as synced in one transaction
+
+        Args:
+            synced: Iterable of (timesheet_id, backend_timesheet_id) pairs
+
+        Returns:
+            int: Number of rows updated
+        """
+        now = datetime.now()
+        rows = [(backend_timesheet_id, now, timesheet_id) for timesheet_id, backend_timesheet_id in synced]
+        if not rows:
+            return 0
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.executemany("""
+                UPDATE timesheet
+                SET backend_timesheet_id = ?,
+                    synced_at = ?,
+                    sync_error_message = NULL
+                WHERE id = ?
+            """, rows)
+            conn.commit()
+            return cursor.rowcount
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Error marking timesheets as synced: {e}")
+            raise
+        finally:
+            conn.close()
+
+    def mark_timesheets_sync_failed(self, failures, count_attempt=True):
+        """Mark many timesheet syncs as failed in one transaction
+
+        Args:
+            failures: Iterable of (timesheet_id, error_message) pairs, or
+                      (timesheet_id, error_message, next_attempt_at, rejected)
+                      to delay the next attempt or take the row out of the
+                      push queue for good
+            count_attempt: Count the failure toward the row's sync_attempts.
+                           Off for whole-batch failures, where Payroll never
+                           judged the record itself
+
+        Returns:
+            int: Number of rows updated
+        """
+        rows = []
+        for failure in failures:
+            timesheet_id, error_message, next_attempt_at, rejected = (tuple(failure) + (None, False))[:4]
+            rows.append((error_message, next_attempt_at, 1 if rejected else 0, 1 if count_attempt else 0, timesheet_id))
+        if not rows:
+            return 0
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.executemany("""
+                UPDATE timesheet
+                SET sync_error_message = ?,
+                    next_attempt_at = ?,
+                    sync_rejected = ?,
+                    sync_attempts = sync_attempts + ?
+                WHERE id = ?
+            """, rows)
+            conn.commit()
+            return cursor.rowcount
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Error marking syncs failed: {e}")
+            raise
+        finally:
+            conn.close()
+
     def get_timesheet_stats(self):
-        """Get statistics about timesheet entries"""
+        """Get statistics about timesheet entries (read from the timesheet_stats counters)"""
         conn = self.get_connection()
         cursor = conn.cursor()
         try:
             cursor.execute("""
                 SELECT
-                    COUNT(*) as total,
-                    SUM(CASE WHEN backend_timesheet_id IS NOT NULL THEN 1 ELSE 0 END) as synced,
-                    SUM(CASE WHEN backend_timesheet_id IS NULL AND sync_error_message IS NULL THEN 1 ELSE 0 END) as pending,
-                    SUM(CASE WHEN sync_error_message IS NOT NULL THEN 1 ELSE 0 END) as errors
-                FROM timesheet
+                    IFNULL(SUM(total), 0) as total,
+                    IFNULL(SUM(synced), 0) as synced,
+                    IFNULL(SUM(pending), 0) as pending,
+                    IFNULL(SUM(errors), 0) as errors
+                FROM timesheet_stats
             """)
             return dict(cursor.fetchone())
         finally:
             conn.close()
 
+    def get_timesheet_stats_by_device(self):
+        """Get timesheet statistics per device (device_id None = no device)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                SELECT NULLIF(s.device_id, 0) as device_id, d.name as device_name,
+                       s.total, s.synced, s.pending, s.errors
+                FROM timesheet_stats s
+                LEFT JOIN device d ON d.id = s.device_id
+                WHERE s.total > 0
+                ORDER BY s.device_id
+            """)
+            return [dict(row) for row in cursor.fetchall()]
+        finally:
+            conn.close()
+
+    def reconcile_timesheet_stats(self):
+        """Rebuild the timesheet_stats counters from the timesheet table"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            rebuild_timesheet_stats(cursor)
+            conn.commit()
+            logger.info("Timesheet stats counters rebuilt")
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Error rebuilding timesheet stats: {e}")
+            raise
+        finally:
+            conn.close()
+
     def get_timesheet_by_sync_id(self, sync_id):
         """Get a timesheet entry by sync_id"""
         conn = self.get_connection()
@@ -438,13 +561,52 @@ class Database:
                 FROM timesheet t
                 JOIN employee e ON t.employee_id = e.id
                 LEFT JOIN device d ON t.device_id = d.id
-                ORDER BY t.date DESC, t.time DESC
+                ORDER BY t.date DESC, t.time DESC, t.id DESC
                 LIMIT ? OFFSET ?
             """, (limit, offset))
             return [dict(row) for row in cursor.fetchall()]
         finally:
             conn.close()
 
+    def get_timesheets_page(self, limit=100, cursor=None):
+        """Get one page of timesheet entries, newest first, using keyset pagination
+
+        Args:
+            limit: Page size
+            cursor: Continuation token from the previous page, or None for the first page
+
+        Returns:
+            dict: {'data': [...], 'next_cursor': token, or None on the last page}
+        """
+        conn = self.get_connection()
+        db_cursor = conn.cursor()
+        try:
+            query = """
+                SELECT t.*, e.name as employee_name, e.employee_code,
+                       d.name as device_name
+                FROM timesheet t
+                JOIN employee e ON t.employee_id = e.id
+                LEFT JOIN device d ON t.device_id = d.id
+            """
+            params = []
+            if cursor:
+                query += " WHERE (t.date, t.time, t.id) < (?, ?, ?)"
+                params.extend(decode_page_cursor(cursor))
+            query += " ORDER BY t.date DESC, t.time DESC, t.id DESC LIMIT ?"
+            # Fetch one extra row to know whether another page exists
+            params.append(limit + 1)
+
+            db_cursor.execute(query, params)
+            rows = [dict(row) for row in db_cursor.fetchall()]
+            next_cursor = None
+            if len(rows) > limit:
+                rows = rows[:limit]
+                last = rows[-1]
+                next_cursor = encode_page_cursor(last['date'], last['time'], last['id'])
+            return {'data': rows, 'next_cursor': next_cursor}
+        finally:
+            conn.close()
+
     # ==================== EMPLOYEE METHODS ====================
 
     def add_or_update_employee(self, backend_id, name, employee_code=None, employee_number=None):
@@ -461,6 +623,8 @@ class Database:
                     employee_number = excluded.employee_number
             """, (backend_id, name, employee_code, employee_number))
             conn.commit()
+            # The upsert may also have changed the code of an existing row
+            self.employee_cache.invalidate(employee_code, backend_id=backend_id)
             return cursor.lastrowid
         except Exception as e:
             conn.rollback()
@@ -469,6 +633,75 @@ class Database:
         finally:
             conn.close()
 
+    def upsert_employees(self, employees):
+        """Add or update many employees in one transaction
+
+        Rows whose name, code and number are unchanged are left alone.
+
+        Args:
+            employees: Iterable of dicts with backend_id, name and optionally
+                       employee_code and employee_number
+
+        Returns:
+            dict: {'inserted', 'updated', 'unchanged'} counts
+        """
+        # Last entry wins when the same backend_id appears twice
+        rows = {}
+        for employee in employees:
+            rows[employee['backend_id']] = (
+                employee['backend_id'], employee['name'],
+                employee.get('employee_code'), employee.get('employee_number')
+            )
+        rows = list(rows.values())
+        if not rows:
+            return {'inserted': 0, 'updated': 0, 'unchanged': 0}
+
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            with self._write_lock:
+                # Count existing rows in the same transaction as the upsert, so a
+                # concurrent pull inserting the same employees cannot skew the counts
+                cursor.execute("BEGIN IMMEDIATE")
+                existing = 0
+                for i in range(0, len(rows), SQL_VARIABLE_CHUNK):
+                    ids = [row[0] for row in rows[i:i + SQL_VARIABLE_CHUNK]]
+                    cursor.execute(
+                        f"SELECT COUNT(*) FROM employee WHERE backend_id IN ({', '.join('?' * len(ids))})",
+                        ids
+                    )
+                    existing += cursor.fetchone()[0]
+
+                cursor.executemany("""
+                    INSERT INTO employee (backend_id, name, employee_code, employee_number)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT(backend_id) DO UPDATE SET
+                        name = excluded.name,
+                        employee_code = excluded.employee_code,
+                        employee_number = excluded.employee_number
+                    WHERE employee.name IS NOT excluded.name
+                       OR employee.employee_code IS NOT excluded.employee_code
+                       OR employee.employee_number IS NOT excluded.employee_number
+                """, rows)
+                changed = max(cursor.rowcount, 0)
+                conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Error upserting employees: {e}")
+            raise
+        finally:
+            conn.close()
+
+        if changed:
+            self.employee_cache.invalidate()
+
+        inserted = len(rows) - existing
+        return {
+            'inserted': inserted,
+            'updated': changed - inserted,
+            'unchanged': len(rows) - changed
+        }
+
     def get_employee_by_backend_id(self, backend_id):
         """Get employee by backend ID"""
         conn = self.get_connection()
@@ -481,16 +714,52 @@ class Database:
             conn.close()
 
     def get_employee_by_code(self, employee_code):
-        """Get employee by employee code (supports alphanumeric codes)"""
+        """Get employee by employee code (supports alphanumeric codes)
+
+        Served from the in-memory employee cache when possible.
+        """
+        cached = self.employee_cache.get(employee_code)
+        if cached is not None:
+            return cached
+
         conn = self.get_connection()
         cursor = conn.cursor()
         try:
             cursor.execute("SELECT * FROM employee WHERE employee_code = ?", (employee_code,))
             row = cursor.fetchone()
-            return dict(row) if row else None
+            if not row:
+                return None
+            employee = dict(row)
+            self.employee_cache.put(employee_code, employee)
+            return employee
         finally:
             conn.close()
 
+    def warm_employee_cache(self):
+        """Load employees into the lookup cache with a single query
+
+        Returns:
+            int: Number of employees cached
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                SELECT * FROM employee
+                WHERE employee_code IS NOT NULL
+                ORDER BY id DESC
+                LIMIT ?
+            """, (self.employee_cache.max_size,))
+            rows = cursor.fetchall()
+        finally:
+            conn.close()
+
+        # Newest first so the oldest row wins for duplicate codes, matching
+        # what an uncached lookup returns
+        for row in rows:
+            self.employee_cache.put(row['employee_code'], dict(row))
+        return len(rows)
+
     def get_all_employees(self):
         """Get all active employees"""
         conn = self.get_connection()
@@ -774,7 +1043,8 @@ class Database:
         finally:
             conn.close()
 
-    def update_device(self, device_id, name=None, ip=None, port=None, comm_key=None, branch_id=None, enabled=None):
+    def update_device(self, device_id, name=None, ip=None, port=None, comm_key=None, branch_id=None, enabled=None,
+                      live_capture=None, rotation_threshold=None):
         """Update device configuration"""
         conn = self.get_connection()
         cursor = conn.cursor()
@@ -799,6 +1069,12 @@ class Database:
             if enabled is not None:
                 updates.append("enabled = ?")
                 values.append(1 if enabled else 0)
+            if live_capture is not None:
+                updates.append("live_capture = ?")
+                values.append(1 if live_capture else 0)
+            if rotation_threshold is not None:
+                updates.append("rotation_threshold = ?")
+                values.append(max(int(rotation_threshold), 0))
 
             if not updates:
                 return False
@@ -859,3 +1135,319 @@ class Database:
             raise
         finally:
             conn.close()
+
+    def update_device_watermark(self, device_id, last_record_at, record_count):
+        """Record the newest attendance timestamp and buffer size seen on a device
+
+        Pass last_record_at=None to reset the watermark so the next pull rescans.
+        """
+        if isinstance(last_record_at, datetime):
+            last_record_at = last_record_at.isoformat(sep=' ')
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                UPDATE device
+                SET last_record_at = ?, last_record_count = ?
+                WHERE id = ?
+            """, (last_record_at, record_count, device_id))
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Error updating device watermark: {e}")
+            raise
+        finally:
+            conn.close()
+
+    def update_device_fingerprint(self, device_id, fingerprint):
+        """Store the record/user counts seen on a device's last complete pull"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("UPDATE device SET state_fingerprint = ? WHERE id = ?", (fingerprint, device_id))
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Error updating device fingerprint: {e}")
+            raise
+        finally:
+            conn.close()
+
+    def update_device_health(self, device_id, connect_latency_ms, consecutive_failures, circuit_open_until):
+        """Store a device's connect latency estimate and circuit breaker state"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                UPDATE device
+                SET connect_latency_ms = ?, consecutive_failures = ?, circuit_open_until = ?
+                WHERE id = ?
+            """, (connect_latency_ms, consecutive_failures, circuit_open_until, device_id))
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Error updating device health: {e}")
+            raise
+        finally:
+            conn.close()
+
+    def record_device_probes(self, results, probed_at=None):
+        """Store reachability probe results
+
+        Args:
+            results: dict of device id -> (reachable, latency_ms)
+            probed_at: When the probes ran (defaults to now)
+        """
+        probed_at = (probed_at or datetime.now()).isoformat(sep=' ', timespec='seconds')
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.executemany("""
+                UPDATE device
+                SET last_probe_at = ?, last_probe_ok = ?, last_probe_latency_ms = ?
+                WHERE id = ?
+            """, [(probed_at, 1 if ok else 0, latency_ms, device_id)
+                  for device_id, (ok, latency_ms) in results.items()])
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Error recording device probes: {e}")
+            raise
+        finally:
+            conn.close()
+
+    def update_pull_checkpoint(self, device_id, position, checkpoint_at=None, date_range=None):
+        """Record how far an in-progress pull has committed on a device
+
+        Args:
+            device_id: Device being pulled
+            position: Buffer position below which every record is stored;
+                      None clears the checkpoint
+            checkpoint_at: Newest timestamp among those records
+            date_range: 'date_from|date_to' of the pull, or None for a default pull
+        """
+        if isinstance(checkpoint_at, datetime):
+            checkpoint_at = checkpoint_at.isoformat(sep=' ')
+        if position is None:
+            checkpoint_at = date_range = None
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                UPDATE device
+                SET checkpoint_position = ?, checkpoint_at = ?, checkpoint_range = ?
+                WHERE id = ?
+            """, (position, checkpoint_at, date_range, device_id))
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Error updating pull checkpoint: {e}")
+            raise
+        finally:
+            conn.close()
+
+    def close_interrupted_sync_logs(self):
+        """Mark sync logs left in 'started' by a crash or forced exit as errors
+
+        Only call this when no sync can be running (at startup).
+
+        Returns:
+            int: Number of sync logs closed
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                UPDATE sync_logs
+                SET status = 'error',
+                    error_message = 'Interrupted: the application stopped before the sync finished',
+                    completed_at = ?
+                WHERE status = 'started'
+            """, (datetime.now(),))
+            conn.commit()
+            return cursor.rowcount
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Error closing interrupted sync logs: {e}")
+            raise
+        finally:
+            conn.close()
+
+    def get_confirmed_sync_ids(self, sync_ids, pushed_only=False):
+        """Which of the given sync_ids are stored locally (and settled, if pushed_only)
+
+        A settled row was pushed, or rejected by Payroll for good - it will
+        never be pushed, so it must not hold back buffer rotation.
+
+        Returns:
+            set: The confirmed sync_ids
+        """
+        confirmed = set()
+        sync_ids = list(sync_ids)
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            for start in range(0, len(sync_ids), SQL_VARIABLE_CHUNK):
+                chunk = sync_ids[start:start + SQL_VARIABLE_CHUNK]
+                placeholders = ','.join('?' * len(chunk))
+                query = f"SELECT sync_id FROM timesheet WHERE sync_id IN ({placeholders})"
+                if pushed_only:
+                    query += " AND (backend_timesheet_id IS NOT NULL OR sync_rejected = 1)"
+                cursor.execute(query, chunk)
+                confirmed.update(row['sync_id'] for row in cursor.fetchall())
+            return confirmed
+        finally:
+            conn.close()
+
+    def record_device_rotation(self, device_id):
+        """Reset a device's pull state after its attendance buffer was cleared"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                UPDATE device
+                SET last_rotated_at = ?,
+                    last_record_at = NULL, last_record_count = 0, state_fingerprint = NULL,
+                    checkpoint_position = NULL, checkpoint_at = NULL, checkpoint_range = NULL
+                WHERE id = ?
+            """, (datetime.now().isoformat(sep=' ', timespec='seconds'), device_id))
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Error recording device rotation: {e}")
+            raise
+        finally:
+            conn.close()
+
+    def claim_push_batch(self, owner, limit, lease_seconds, now=None):
+        """Lease up to `limit` due outbox rows to `owner` and return their timesheets
+
+        A row is claimable when it has no lease or its lease has expired, so
+        rows held by a pusher that crashed come back once the lease runs out.
+        The claim is one UPDATE, so concurrent pushers never get the same row.
+        `owner` must be unique per claimant.
+
+        Returns:
+            list: Timesheet dicts shaped like get_unsynced_timesheets()
+        """
+        now = now or datetime.now()
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            with self._write_lock:
+                cursor.execute("""
+                    UPDATE push_outbox
+                    SET lease_owner = ?, lease_expires_at = ?
+                    WHERE timesheet_id IN (
+                        SELECT o.timesheet_id
+                        FROM push_outbox o
+                        JOIN timesheet t ON t.id = o.timesheet_id
+                        WHERE (o.lease_expires_at IS NULL OR o.lease_expires_at <= ?)
+                        AND (t.next_attempt_at IS NULL OR t.next_attempt_at <= ?)
+                        ORDER BY t.created_at ASC, t.id ASC
+                        LIMIT ?
+                    )
+                """, (owner, now + timedelta(seconds=lease_seconds), now, now, limit))
+                conn.commit()
+            cursor.execute("""
+                SELECT t.*, e.backend_id as employee_backend_id, e.name as employee_name,
+                       e.employee_code as employee_code, d.branch_id as branch_id
+                FROM push_outbox o
+                JOIN timesheet t ON t.id = o.timesheet_id
+                JOIN employee e ON t.employee_id = e.id
+                LEFT JOIN device d ON t.device_id = d.id
+                WHERE o.lease_owner = ?
+                ORDER BY t.created_at ASC, t.id ASC
+            """, (owner,))
+            return [dict(row) for row in cursor.fetchall()]
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Error claiming push batch: {e}")
+            raise
+        finally:
+            conn.close()
+
+    def renew_push_claims(self, owner, lease_seconds, now=None):
+        """Push back the lease expiry of every outbox row `owner` still holds
+
+        Returns:
+            int: Number of rows renewed
+        """
+        now = now or datetime.now()
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                UPDATE push_outbox SET lease_expires_at = ?
+                WHERE lease_owner = ?
+            """, (now + timedelta(seconds=lease_seconds), owner))
+            conn.commit()
+            return cursor.rowcount
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Error renewing push claims: {e}")
+            raise
+        finally:
+            conn.close()
+
+    def hold_push_claims(self, owner, timesheet_ids, lease_seconds, now=None):
+        """Renew `owner`'s lease on some outbox rows and report which it still holds
+
+        Rows another push claimed after this owner's lease expired, and rows
+        that already left the outbox, are not renewed and not returned.
+
+        Returns:
+            set: The timesheet ids still leased to `owner`
+        """
+        timesheet_ids = list(timesheet_ids)
+        expires_at = (now or datetime.now()) + timedelta(seconds=lease_seconds)
+        held = set()
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            with self._write_lock:
+                for start in range(0, len(timesheet_ids), SQL_VARIABLE_CHUNK):
+                    chunk = timesheet_ids[start:start + SQL_VARIABLE_CHUNK]
+                    placeholders = ','.join('?' * len(chunk))
+                    cursor.execute(f"""
+                        UPDATE push_outbox SET lease_expires_at = ?
+                        WHERE lease_owner = ? AND timesheet_id IN ({placeholders})
+                    """, [expires_at, owner] + chunk)
+                    cursor.execute(f"""
+                        SELECT timesheet_id FROM push_outbox
+                        WHERE lease_owner = ? AND timesheet_id IN ({placeholders})
+                    """, [owner] + chunk)
+                    held.update(row[0] for row in cursor.fetchall())
+                conn.commit()
+            return held
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Error renewing push claims: {e}")
+            raise
+        finally:
+            conn.close()
+
+    def release_push_claims(self, owner):
+        """Return every outbox row `owner` still holds to the queue
+
+        Rows that were pushed or rejected have already left the outbox (the
+        timesheet triggers acknowledge them), so what remains is released.
+
+        Returns:
+            int: Number of rows released
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                UPDATE push_outbox SET lease_owner = NULL, lease_expires_at = NULL
+                WHERE lease_owner = ?
+            """, (owner,))
+            conn.commit()
+            return cursor.rowcount
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Error releasing push claims: {e}")
+            raise
+        finally:
+            conn.close()
@@ -74,11 +74,10 @@ def diagnose_device(ip, port=4370):
                 # Step 4: Try to get users
                 print(f"\n[4/4] Testing data retrieval...")
                 try:
-                    users = conn.get_users()
-                    print(f"      Users: {len(users)} registered")
-
-                    attendance = conn.get_attendance()
-                    print(f"      Attendance logs: {len(attendance)} records")
+                    # read_sizes() returns the counts without downloading the lists
+                    conn.read_sizes()
+                    print(f"      Users: {conn.users} registered (capacity {conn.users_cap})")
+                    print(f"      Attendance logs: {conn.records} records (capacity {conn.rec_cap})")
                 except Exception as e:
                     print(f"      Warning: Could not get data: {e}")
 
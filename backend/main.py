@@ -175,6 +175,7 @@ try:
     from services.pull_service import PullService
     from services.push_service import PushService
     from services.scheduler import SyncScheduler
+    from services.live_capture import LiveCaptureService
 
     early_log("All imports successful!")
 
@@ -317,6 +318,9 @@ class IntegrationApp:
 
             # Initialize database
             self.database = Database()
+            interrupted = self.database.close_interrupted_sync_logs()
+            if interrupted:
+                logger.warning(f"Closed {interrupted} sync log(s) left unfinished by the last run")
 
             self.splash.showMessage("Starting services...",
                 Qt.AlignmentFlag.AlignBottom | Qt.AlignmentFlag.AlignHCenter,
@@ -336,6 +340,10 @@ class IntegrationApp:
             # Connect scheduler to bridge
             self.bridge.set_scheduler(self.scheduler)
 
+            # Initialize live capture (devices opted in to real-time punches)
+            self.live_capture = LiveCaptureService(self.pull_service, self.database)
+            self.bridge.set_live_capture(self.live_capture)
+
             self.splash.showMessage("Starting web engine...",
                 Qt.AlignmentFlag.AlignBottom | Qt.AlignmentFlag.AlignHCenter,
                 QColor("#93c5fd"))
@@ -356,6 +364,12 @@ class IntegrationApp:
             # Start scheduler
             self.scheduler.start()
 
+            # Start live capture workers
+            self.live_capture.start()
+
+            # Stop background work and release database connections on exit
+            self.app.aboutToQuit.connect(self.shutdown)
+
         except Exception as e:
             logger.error(f"Initialization error: {e}", exc_info=True)
             self.splash.close()
@@ -524,6 +538,19 @@ class IntegrationApp:
             "© 2025 The Abba. All rights reserved."
         )
 
+    def shutdown(self):
+        """Stop the scheduler and live capture, and close pooled database connections"""
+        logger.info("Shutting down application")
+        try:
+            self.scheduler.stop()
+        except Exception as e:
+            logger.error(f"Error stopping scheduler: {e}")
+        try:
+            self.live_capture.stop()
+        except Exception as e:
+            logger.error(f"Error stopping live capture: {e}")
+        self.database.close()
+
     def run(self):
         """Run the application"""
         logger.info("Starting application event loop")
@@ -0,0 +1,495 @@
+"""
+Biometric Integration - Schema Migrations
+Numbered SQLite schema migrations, tracked with PRAGMA user_version
+"""
+
+import sqlite3
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# ==================== HELPERS ====================
+
+def _stats_counter_update(row, op):
+    """Trigger statement adding (op='+') or removing (op='-') one timesheet row from its device's counters"""
+    return f"""
+        UPDATE timesheet_stats SET
+            total = total {op} 1,
+            synced = synced {op} ({row}.backend_timesheet_id IS NOT NULL),
+            pending = pending {op} ({row}.backend_timesheet_id IS NULL AND {row}.sync_error_message IS NULL),
+            errors = errors {op} ({row}.sync_error_message IS NOT NULL)
+        WHERE device_id = IFNULL({row}.device_id, 0);
+    """
+
+
+def rebuild_timesheet_stats(cursor):
+    """Recompute the timesheet_stats counters from the timesheet table"""
+    cursor.execute("DELETE FROM timesheet_stats")
+    cursor.execute("""
+        INSERT INTO timesheet_stats (device_id, total, synced, pending, errors)
+        SELECT
+            IFNULL(device_id, 0),
+            COUNT(*),
+            SUM(CASE WHEN backend_timesheet_id IS NOT NULL THEN 1 ELSE 0 END),
+            SUM(CASE WHEN backend_timesheet_id IS NULL AND sync_error_message IS NULL THEN 1 ELSE 0 END),
+            SUM(CASE WHEN sync_error_message IS NOT NULL THEN 1 ELSE 0 END)
+        FROM timesheet
+        GROUP BY IFNULL(device_id, 0)
+    """)
+
+
+def _add_column(cursor, table, column_sql):
+    """ALTER TABLE ADD COLUMN, ignoring columns that already exist"""
+    try:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column_sql}")
+    except sqlite3.OperationalError as e:
+        if 'duplicate column name' not in str(e):
+            raise
+
+
+# ==================== MIGRATIONS ====================
+
+def _001_base_schema(cursor):
+    """Base schema; also brings databases created before versioning up to date"""
+    # Company table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS company (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            backend_id INTEGER UNIQUE,
+            name TEXT NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_company_backend_id ON company(backend_id)")
+
+    # Employee table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS employee (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            backend_id INTEGER UNIQUE,
+            name TEXT NOT NULL,
+            employee_code TEXT,
+            employee_number INTEGER,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            deleted_at DATETIME
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_employee_backend_id ON employee(backend_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_employee_code ON employee(employee_code)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_employee_deleted_at ON employee(deleted_at)")
+
+    # Timesheet table (primary sync table)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS timesheet (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            sync_id TEXT UNIQUE NOT NULL,
+            employee_id INTEGER NOT NULL,
+            log_type TEXT NOT NULL CHECK(log_type IN ('in', 'out')),
+            date TEXT NOT NULL,
+            time TEXT NOT NULL,
+            photo_path TEXT,
+            is_synced BOOLEAN DEFAULT 0,
+            status TEXT DEFAULT 'success',
+            error_message TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            backend_timesheet_id INTEGER,
+            synced_at DATETIME,
+            sync_error_message TEXT,
+            FOREIGN KEY (employee_id) REFERENCES employee(id)
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_timesheet_employee_id ON timesheet(employee_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_timesheet_date ON timesheet(date)")
+
+    # Users table (admin access)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            email TEXT NOT NULL,
+            name TEXT NOT NULL,
+            is_active BOOLEAN DEFAULT 1,
+            last_login DATETIME,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # Sync logs table (track pull/push/config/other operations)
+    cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'sync_logs'")
+    row = cursor.fetchone()
+    if row and "'other'" not in row['sql']:
+        # Older databases only allowed pull/push/config - rebuild with the new CHECK constraint
+        logger.info("Migrating sync_logs table to support 'other' sync_type")
+        cursor.execute("ALTER TABLE sync_logs RENAME TO sync_logs_old")
+        cursor.execute("DROP INDEX IF EXISTS idx_sync_logs_type")
+        cursor.execute("DROP INDEX IF EXISTS idx_sync_logs_status")
+        cursor.execute("DROP INDEX IF EXISTS idx_sync_logs_started")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS sync_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            sync_type TEXT NOT NULL CHECK(sync_type IN ('pull', 'push', 'config', 'other')),
+            status TEXT NOT NULL CHECK(status IN ('started', 'success', 'error')),
+            records_processed INTEGER DEFAULT 0,
+            records_success INTEGER DEFAULT 0,
+            records_failed INTEGER DEFAULT 0,
+            error_message TEXT,
+            started_at DATETIME NOT NULL,
+            completed_at DATETIME,
+            metadata TEXT
+        )
+    """)
+    if row and "'other'" not in row['sql']:
+        cursor.execute("""
+            INSERT INTO sync_logs (id, sync_type, status, records_processed, records_success,
+                records_failed, error_message, started_at, completed_at, metadata)
+            SELECT id, sync_type, status, records_processed, records_success,
+                records_failed, error_message, started_at, completed_at, metadata
+            FROM sync_logs_old
+        """)
+        cursor.execute("DROP TABLE sync_logs_old")
+        logger.info("sync_logs table migration completed")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sync_logs_type ON sync_logs(sync_type)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sync_logs_status ON sync_logs(status)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_sync_logs_started ON sync_logs(started_at)")
+
+    # Device table (for multi-device support)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS device (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            ip TEXT NOT NULL,
+            port INTEGER DEFAULT 4370,
+            comm_key INTEGER DEFAULT 0,
+            branch_id TEXT,
+            enabled BOOLEAN DEFAULT 1,
+            last_pull_at DATETIME,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            deleted_at DATETIME
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_device_enabled ON device(enabled)")
+
+    # API configuration table
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS api_config (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            device_ip TEXT,
+            device_port INTEGER DEFAULT 4370,
+            push_url TEXT,
+            push_auth_type TEXT,
+            push_credentials TEXT,
+            push_username TEXT,
+            push_password TEXT,
+            push_token TEXT,
+            push_token_created_at DATETIME,
+            pull_interval_minutes INTEGER DEFAULT 30,
+            push_interval_minutes INTEGER DEFAULT 15,
+            last_pull_at DATETIME,
+            last_push_at DATETIME,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # Columns added after the first release
+    _add_column(cursor, 'api_config', "device_ip TEXT")
+    _add_column(cursor, 'api_config', "device_port INTEGER DEFAULT 4370")
+    _add_column(cursor, 'api_config', "push_username TEXT")
+    _add_column(cursor, 'api_config', "push_password TEXT")
+    _add_column(cursor, 'api_config', "push_token TEXT")
+    _add_column(cursor, 'api_config', "push_token_created_at DATETIME")
+    _add_column(cursor, 'api_config', "push_user_logged TEXT")  # YAHSHUA user info from login response
+    _add_column(cursor, 'timesheet', "device_id INTEGER REFERENCES device(id)")
+    _add_column(cursor, 'device', "deleted_at DATETIME")
+    _add_column(cursor, 'device', "comm_key INTEGER DEFAULT 0")
+    _add_column(cursor, 'device', "branch_id TEXT")
+
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_timesheet_device_id ON timesheet(device_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_device_deleted_at ON device(deleted_at)")
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_device_unique_ip_active ON device(ip) WHERE deleted_at IS NULL")
+
+    # Insert default config if not exists
+    cursor.execute("SELECT COUNT(*) as count FROM api_config WHERE id = 1")
+    if cursor.fetchone()['count'] == 0:
+        cursor.execute("""
+            INSERT INTO api_config (id, pull_interval_minutes, push_interval_minutes)
+            VALUES (1, 30, 15)
+        """)
+
+    # Migrate existing device config from api_config to device table
+    cursor.execute("SELECT COUNT(*) as count FROM device")
+    if cursor.fetchone()['count'] == 0:
+        cursor.execute("SELECT device_ip, device_port FROM api_config WHERE id = 1")
+        row = cursor.fetchone()
+        if row and row['device_ip']:
+            cursor.execute("""
+                INSERT INTO device (name, ip, port, enabled)
+                VALUES (?, ?, ?, 1)
+            """, ('Device 1', row['device_ip'], row['device_port'] or 4370))
+            migrated_device_id = cursor.lastrowid
+            # Update existing timesheet records to reference the migrated device
+            cursor.execute("""
+                UPDATE timesheet SET device_id = ? WHERE device_id IS NULL
+            """, (migrated_device_id,))
+            logger.info(f"Migrated existing device config to device table (id={migrated_device_id})")
+
+
+def _002_timesheet_indexes(cursor):
+    """Index the push queue and timesheet browsing; drop unused indexes"""
+    # Push queue: only rows still waiting to be pushed, in queue order
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_timesheet_pending
+        ON timesheet(created_at, id)
+        WHERE backend_timesheet_id IS NULL AND status = 'success'
+    """)
+    # Timesheet browsing: newest first, id breaks ties for keyset paging
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_timesheet_date_time_id
+        ON timesheet(date DESC, time DESC, id DESC)
+    """)
+    # Unused indexes: is_synced is never set, sync_id already has the index
+    # behind its UNIQUE constraint, and backend_timesheet_id was only ever hit
+    # by the queue query (where it beat the partial index above but still
+    # needed a sort)
+    cursor.execute("DROP INDEX IF EXISTS idx_timesheet_is_synced")
+    cursor.execute("DROP INDEX IF EXISTS idx_timesheet_sync_id")
+    cursor.execute("DROP INDEX IF EXISTS idx_timesheet_backend_id")
+
+
+def _003_timesheet_stats(cursor):
+    """Timesheet stats counters (kept current by triggers, one row per device)"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS timesheet_stats (
+            device_id INTEGER PRIMARY KEY,
+            total INTEGER NOT NULL DEFAULT 0,
+            synced INTEGER NOT NULL DEFAULT 0,
+            pending INTEGER NOT NULL DEFAULT 0,
+            errors INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_timesheet_stats_insert
+        AFTER INSERT ON timesheet
+        BEGIN
+            INSERT OR IGNORE INTO timesheet_stats (device_id) VALUES (IFNULL(NEW.device_id, 0));
+            {_stats_counter_update('NEW', '+')}
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_timesheet_stats_delete
+        AFTER DELETE ON timesheet
+        BEGIN
+            {_stats_counter_update('OLD', '-')}
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_timesheet_stats_update
+        AFTER UPDATE OF backend_timesheet_id, sync_error_message, device_id ON timesheet
+        BEGIN
+            {_stats_counter_update('OLD', '-')}
+            INSERT OR IGNORE INTO timesheet_stats (device_id) VALUES (IFNULL(NEW.device_id, 0));
+            {_stats_counter_update('NEW', '+')}
+        END
+    """)
+    rebuild_timesheet_stats(cursor)
+
+
+def _004_pull_max_workers(cursor):
+    """Number of devices pulled in parallel"""
+    _add_column(cursor, 'api_config', "pull_max_workers INTEGER DEFAULT 4")
+
+
+def _005_device_watermark(cursor):
+    """Per-device high-water mark for incremental pulls"""
+    _add_column(cursor, 'device', "last_record_at TEXT")
+    _add_column(cursor, 'device', "last_record_count INTEGER DEFAULT 0")
+
+
+def _006_device_fingerprint(cursor):
+    """Record/user counts seen on the last complete pull of each device"""
+    _add_column(cursor, 'device', "state_fingerprint TEXT")
+
+
+def _007_device_live_capture(cursor):
+    """Opt-in real-time capture per device"""
+    _add_column(cursor, 'device', "live_capture BOOLEAN DEFAULT 0")
+
+
+def _008_device_health(cursor):
+    """Connect latency and circuit breaker state per device"""
+    _add_column(cursor, 'device', "connect_latency_ms REAL")
+    _add_column(cursor, 'device', "consecutive_failures INTEGER DEFAULT 0")
+    _add_column(cursor, 'device', "circuit_open_until TEXT")
+
+
+def _009_device_probe(cursor):
+    """Result of the last TCP reachability probe per device"""
+    _add_column(cursor, 'device', "last_probe_at TEXT")
+    _add_column(cursor, 'device', "last_probe_ok BOOLEAN")
+    _add_column(cursor, 'device', "last_probe_latency_ms REAL")
+
+
+def _010_pull_checkpoint(cursor):
+    """Progress of an unfinished pull per device, so the next pull can resume it"""
+    _add_column(cursor, 'device', "checkpoint_position INTEGER")
+    _add_column(cursor, 'device', "checkpoint_at TEXT")
+    _add_column(cursor, 'device', "checkpoint_range TEXT")
+
+
+def _011_buffer_rotation(cursor):
+    """Per-device attendance buffer rotation and its maintenance window"""
+    _add_column(cursor, 'device', "rotation_threshold INTEGER DEFAULT 0")
+    _add_column(cursor, 'device', "last_rotated_at TEXT")
+    _add_column(cursor, 'api_config', "rotation_window_start TEXT DEFAULT '03:00'")
+    _add_column(cursor, 'api_config', "rotation_window_end TEXT DEFAULT '05:00'")
+    _add_column(cursor, 'api_config', "rotation_require_pushed BOOLEAN DEFAULT 1")
+
+
+def _012_push_max_in_flight(cursor):
+    """Number of push batches sent concurrently"""
+    _add_column(cursor, 'api_config', "push_max_in_flight INTEGER DEFAULT 1")
+
+
+def _013_push_batch_bounds(cursor):
+    """Floor and ceiling for the adaptive push batch size"""
+    _add_column(cursor, 'api_config', "push_batch_min INTEGER DEFAULT 10")
+    _add_column(cursor, 'api_config', "push_batch_max INTEGER DEFAULT 200")
+
+
+def _014_push_retry_schedule(cursor):
+    """Per-record push attempts, retry time and permanent rejection"""
+    _add_column(cursor, 'timesheet', "sync_attempts INTEGER DEFAULT 0")
+    _add_column(cursor, 'timesheet', "next_attempt_at DATETIME")
+    _add_column(cursor, 'timesheet', "sync_rejected BOOLEAN DEFAULT 0")
+    # Rejected rows leave the push queue, so they leave its partial index too
+    cursor.execute("DROP INDEX IF EXISTS idx_timesheet_pending")
+    cursor.execute("""
+        CREATE INDEX idx_timesheet_pending
+        ON timesheet(created_at, id)
+        WHERE backend_timesheet_id IS NULL AND status = 'success' AND sync_rejected = 0
+    """)
+
+
+# A timesheet row is waiting to be pushed while this holds
+_PUSH_PENDING = "NEW.backend_timesheet_id IS NULL AND NEW.status = 'success' AND IFNULL(NEW.sync_rejected, 0) = 0"
+
+
+def _015_push_outbox(cursor):
+    """Push outbox with leases (kept in step with timesheet by triggers)"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS push_outbox (
+            timesheet_id INTEGER PRIMARY KEY,
+            enqueued_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            lease_owner TEXT,
+            lease_expires_at DATETIME
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_push_outbox_lease ON push_outbox(lease_owner)")
+    # Pending rows enter the outbox; synced, rejected and deleted rows leave it
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_push_outbox_insert
+        AFTER INSERT ON timesheet
+        WHEN {_PUSH_PENDING}
+        BEGIN
+            INSERT OR IGNORE INTO push_outbox (timesheet_id) VALUES (NEW.id);
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_push_outbox_requeue
+        AFTER UPDATE OF backend_timesheet_id, status, sync_rejected ON timesheet
+        WHEN {_PUSH_PENDING}
+        BEGIN
+            INSERT OR IGNORE INTO push_outbox (timesheet_id) VALUES (NEW.id);
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_push_outbox_done
+        AFTER UPDATE OF backend_timesheet_id, status, sync_rejected ON timesheet
+        WHEN NOT ({_PUSH_PENDING})
+        BEGIN
+            DELETE FROM push_outbox WHERE timesheet_id = NEW.id;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_push_outbox_delete
+        AFTER DELETE ON timesheet
+        BEGIN
+            DELETE FROM push_outbox WHERE timesheet_id = OLD.id;
+        END
+    """)
+    cursor.execute("""
+        INSERT OR IGNORE INTO push_outbox (timesheet_id, enqueued_at)
+        SELECT id, created_at FROM timesheet
+        WHERE backend_timesheet_id IS NULL AND status = 'success' AND sync_rejected = 0
+    """)
+
+
+# (version, description, function) - append new migrations, never renumber
+MIGRATIONS = [
+    (1, "Base schema", _001_base_schema),
+    (2, "Timesheet queue and browsing indexes", _002_timesheet_indexes),
+    (3, "Timesheet stats counters", _003_timesheet_stats),
+    (4, "Parallel pull setting", _004_pull_max_workers),
+    (5, "Device pull watermark", _005_device_watermark),
+    (6, "Device state fingerprint", _006_device_fingerprint),
+    (7, "Device live capture", _007_device_live_capture),
+    (8, "Device health", _008_device_health),
+    (9, "Device reachability probe", _009_device_probe),
+    (10, "Pull checkpoints", _010_pull_checkpoint),
+    (11, "Device buffer rotation", _011_buffer_rotation),
+    (12, "Concurrent push batches", _012_push_max_in_flight),
+    (13, "Adaptive push batch bounds", _013_push_batch_bounds),
+    (14, "Push retry schedule", _014_push_retry_schedule),
+    (15, "Push outbox", _015_push_outbox),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def run_migrations(conn):
+    """Apply every migration newer than the database's user_version
+
+    Each migration runs in its own transaction together with the
+    user_version bump, so a failed migration leaves the schema at the
+    previous version.
+
+    Returns:
+        list: (version, description, milliseconds) for each applied migration
+    """
+    current = get_schema_version(conn)
+    if current >= LATEST_VERSION:
+        if current > LATEST_VERSION:
+            logger.warning(f"Database schema version {current} is newer than this app ({LATEST_VERSION})")
+        return []
+
+    applied = []
+    cursor = conn.cursor()
+    for version, description, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+
+        started = time.perf_counter()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have migrated while we waited for the lock
+            if get_schema_version(conn) >= version:
+                conn.rollback()
+                continue
+            migrate(cursor)
+            cursor.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"Migration {version} ({description}) failed: {e}")
+            raise
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        logger.info(f"Applied migration {version} ({description}) in {elapsed_ms:.1f} ms")
+        applied.append((version, description, elapsed_ms))
+
+    return applied
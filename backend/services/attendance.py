@@ -0,0 +1,134 @@
+"""
+Biometric Integration - Attendance Transform
+Columnar conversion of pyzk attendance records into timesheet rows
+"""
+
+import logging
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+# Punch codes recorded as 'in' (0=Check-In, 3=Break-In, 4=OT-In); everything else is 'out'
+IN_PUNCHES = (0, 3, 4)
+
+_EPOCH = datetime(1970, 1, 1)
+_SECOND = timedelta(seconds=1)
+
+
+def to_epoch(timestamp):
+    """Whole seconds since 1970-01-01 for a naive device-local datetime"""
+    return (timestamp - _EPOCH) // _SECOND
+
+
+def from_epoch(epoch):
+    """Naive datetime for seconds produced by to_epoch()"""
+    return _EPOCH + timedelta(seconds=epoch)
+
+
+class PunchRecord:
+    """One attendance punch as it moves through the pull pipeline
+
+    Holds only the device, user code, time and IN/OUT type; the timesheet
+    strings (sync_id, date, time) are produced by timesheet_entry() when the
+    record is written.
+    """
+
+    __slots__ = ('device_id', 'user_code', 'epoch', 'punch_type')
+
+    def __init__(self, device_id, user_code, epoch, punch_type):
+        self.device_id = device_id
+        self.user_code = user_code
+        self.epoch = epoch  # seconds since 1970-01-01 in device-local time
+        self.punch_type = punch_type  # 'in' or 'out'
+
+    def __eq__(self, other):
+        if not isinstance(other, PunchRecord):
+            return NotImplemented
+        return all(getattr(self, slot) == getattr(other, slot) for slot in self.__slots__)
+
+    def __repr__(self):
+        return (f"PunchRecord(device_id={self.device_id!r}, user_code={self.user_code!r}, "
+                f"epoch={self.epoch!r}, punch_type={self.punch_type!r})")
+
+    @property
+    def timestamp(self):
+        return from_epoch(self.epoch)
+
+    @property
+    def sync_id(self):
+        """Unique across devices: ZK_<device>_<user>_<YYYYmmddHHMMSS>"""
+        return self._sync_id(self.timestamp.isoformat(sep=' '))
+
+    def _sync_id(self, stamp):
+        """sync_id from this record's 'YYYY-MM-DD HH:MM:SS' timestamp string"""
+        return (f"ZK_{self.device_id}_{self.user_code}_{stamp[0:4]}{stamp[5:7]}{stamp[8:10]}"
+                f"{stamp[11:13]}{stamp[14:16]}{stamp[17:19]}")
+
+    def timesheet_entry(self, employee_id):
+        """Format the record as an add_timesheet_entries() row"""
+        stamp = self.timestamp.isoformat(sep=' ')  # 'YYYY-MM-DD HH:MM:SS'
+        return {
+            'sync_id': self._sync_id(stamp),
+            'employee_id': employee_id,
+            'log_type': self.punch_type,
+            'date': stamp[0:10],
+            'time': stamp[11:19],
+            'device_id': self.device_id
+        }
+
+
+def transform_attendance(logs, device_id, start_date, end_date, skip_count=0, watermark_at=None,
+                         offset=0):
+    """Filter and classify a batch of attendance logs in bulk
+
+    Records are read into columns once, then the watermark skip, date range
+    filter and IN/OUT classification are evaluated over whole columns. No
+    strings are formatted here; see PunchRecord.timesheet_entry().
+
+    Args:
+        logs: Sequence of pyzk Attendance objects (user_id, timestamp, punch)
+        device_id: Device the logs came from
+        start_date, end_date: Inclusive datetime range of records to keep
+        skip_count: Records at positions below this that are not newer than
+                    watermark_at were stored by an earlier pull
+        watermark_at: Newest timestamp stored by the last pull, or None
+        offset: Device buffer position of logs[0]
+
+    Returns:
+        tuple: (records, counts) where records is a list of PunchRecord and
+               counts has 'below_watermark', 'filtered', 'processed' and 'errors'
+    """
+    counts = {'below_watermark': 0, 'filtered': 0, 'processed': 0, 'errors': 0}
+
+    positions, timestamps, user_codes, punches = [], [], [], []
+    for position, log in enumerate(logs, offset):
+        timestamp = getattr(log, 'timestamp', None)
+        if not isinstance(timestamp, datetime):
+            counts['errors'] += 1
+            logger.error(f"Error processing log: invalid timestamp {timestamp!r}")
+            continue
+        positions.append(position)
+        timestamps.append(timestamp)
+        user_codes.append(str(log.user_id))
+        punches.append(getattr(log, 'punch', 0) or 0)
+
+    if watermark_at is None:
+        skip_count = 0
+
+    keep = []
+    for i, (position, timestamp) in enumerate(zip(positions, timestamps)):
+        if position < skip_count and timestamp <= watermark_at:
+            counts['below_watermark'] += 1
+        elif timestamp < start_date or timestamp > end_date:
+            counts['filtered'] += 1
+        else:
+            keep.append(i)
+
+    records = [
+        PunchRecord(device_id, user_codes[i], to_epoch(timestamps[i]),
+                    'in' if punches[i] in IN_PUNCHES else 'out')
+        for i in keep
+    ]
+    counts['processed'] = len(records)
+    return records, counts
+
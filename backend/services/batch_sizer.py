@@ -0,0 +1,81 @@
+"""
+Biometric Integration - Adaptive Batch Sizing
+Chooses how many records to send per push batch from observed responses
+"""
+
+import threading
+from collections import deque
+
+# Batch size used before anything has been observed (the old fixed size)
+DEFAULT_BATCH_SIZE = 50
+
+# Bounds when api_config.push_batch_min / push_batch_max are not set
+DEFAULT_BATCH_FLOOR = 10
+DEFAULT_BATCH_CEILING = 200
+
+# Growth while healthy: this many records per batch, per good response
+GROW_STEP = 25
+
+# Shrink factors: on a timeout, 413 or 5xx, and on a slow but successful response
+FAILURE_SHRINK = 0.5
+SLOW_SHRINK = 0.75
+
+# Responses slower than this (ms) stop growth and shrink the batch
+TARGET_LATENCY_MS = 10000
+
+# Growth also stops while more than this share of recent batches failed
+MAX_ERROR_RATE = 0.1
+ERROR_WINDOW = 10
+
+
+def is_size_related(status_code=None, error_type=None):
+    """Whether a failed batch may have failed because it was too large"""
+    if error_type == 'timeout':
+        return True
+    return status_code is not None and (status_code == 413 or status_code >= 500)
+
+
+class AdaptiveBatchSizer:
+    """Additive-increase / multiplicative-decrease controller for push batch size
+
+    The size grows by GROW_STEP after each response under TARGET_LATENCY_MS
+    while the recent batch error rate is under MAX_ERROR_RATE. It is halved
+    after a timeout, 413 or 5xx, and cut by a quarter after a slow success.
+    Other failures (bad credentials, no network) count toward the error rate
+    but do not change the size. The size always stays within [floor, ceiling].
+    Safe to use from the concurrent push workers.
+    """
+
+    def __init__(self, initial=DEFAULT_BATCH_SIZE, floor=DEFAULT_BATCH_FLOOR, ceiling=DEFAULT_BATCH_CEILING):
+        self.floor = max(1, floor)
+        self.ceiling = max(self.floor, ceiling)
+        self.size = self._clamp(initial)
+        self._outcomes = deque(maxlen=ERROR_WINDOW)  # True for each failed batch
+        self._lock = threading.Lock()
+
+    def _clamp(self, size):
+        return max(self.floor, min(self.ceiling, int(size)))
+
+    @property
+    def error_rate(self):
+        """Share of the last ERROR_WINDOW batches that failed"""
+        if not self._outcomes:
+            return 0.0
+        return sum(self._outcomes) / len(self._outcomes)
+
+    def record(self, latency_ms, success, status_code=None, error_type=None):
+        """Adjust the size after one batch's response
+
+        Returns:
+            int: The batch size to use next
+        """
+        with self._lock:
+            self._outcomes.append(not success)
+            if not success:
+                if is_size_related(status_code, error_type):
+                    self.size = self._clamp(self.size * FAILURE_SHRINK)
+            elif latency_ms > TARGET_LATENCY_MS:
+                self.size = self._clamp(self.size * SLOW_SHRINK)
+            elif self.error_rate <= MAX_ERROR_RATE:
+                self.size = self._clamp(self.size + GROW_STEP)
+            return self.size
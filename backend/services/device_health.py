@@ -0,0 +1,117 @@
+"""
+Biometric Integration - Device Health
+Connect-latency tracking, adaptive timeouts, circuit breaking and reachability probes per device
+"""
+
+import math
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+# pyzk socket timeout bounds (seconds); 30 is what every connect used before
+CONNECT_TIMEOUT_MIN = 5
+CONNECT_TIMEOUT_MAX = 30
+
+# pyzk socket timeout once connected; downloading or clearing a large buffer
+# takes far longer than a connect, so reads never use the adaptive timeout
+DEVICE_IO_TIMEOUT = CONNECT_TIMEOUT_MAX
+
+# Timeout = this many times the device's typical connect latency (then clamped)
+LATENCY_TIMEOUT_FACTOR = 5
+
+# Weight of the newest sample in the connect latency moving average
+LATENCY_EWMA_ALPHA = 0.3
+
+# Consecutive connect failures before a device is skipped
+FAILURE_THRESHOLD = 3
+
+# Skip period after reaching the threshold; doubles with each further failure
+CIRCUIT_OPEN_BASE_MINUTES = 5
+CIRCUIT_OPEN_MAX_MINUTES = 240
+
+# TCP reachability probe run before multi-device pulls
+PROBE_TIMEOUT_SECONDS = 2
+PROBE_MAX_WORKERS = 16
+
+
+def connect_timeout(device):
+    """Socket timeout for connecting to a device, from its latency history"""
+    latency_ms = (device or {}).get('connect_latency_ms')
+    if not latency_ms:
+        return CONNECT_TIMEOUT_MAX
+    seconds = math.ceil(latency_ms * LATENCY_TIMEOUT_FACTOR / 1000)
+    return max(CONNECT_TIMEOUT_MIN, min(CONNECT_TIMEOUT_MAX, seconds))
+
+
+def circuit_open_until(device, now=None):
+    """When the device's circuit closes again, or None if it may be tried now
+
+    Once the open period has passed the next attempt is let through as a probe
+    (half-open): success closes the circuit, failure re-opens it for longer.
+    """
+    until = (device or {}).get('circuit_open_until')
+    if not until:
+        return None
+    try:
+        until = datetime.fromisoformat(until)
+    except (TypeError, ValueError):
+        return None
+    return until if until > (now or datetime.now()) else None
+
+
+def health_after_success(device, latency_ms):
+    """Device health fields after a successful connect taking latency_ms"""
+    previous = (device or {}).get('connect_latency_ms')
+    if previous:
+        latency_ms = LATENCY_EWMA_ALPHA * latency_ms + (1 - LATENCY_EWMA_ALPHA) * previous
+    return {
+        'connect_latency_ms': round(latency_ms, 1),
+        'consecutive_failures': 0,
+        'circuit_open_until': None
+    }
+
+
+def health_after_failure(device, now=None):
+    """Device health fields after a failed connect"""
+    device = device or {}
+    failures = (device.get('consecutive_failures') or 0) + 1
+    open_until = None
+    if failures >= FAILURE_THRESHOLD:
+        minutes = min(CIRCUIT_OPEN_BASE_MINUTES * 2 ** (failures - FAILURE_THRESHOLD), CIRCUIT_OPEN_MAX_MINUTES)
+        open_until = ((now or datetime.now()) + timedelta(minutes=minutes)).isoformat(sep=' ', timespec='seconds')
+    return {
+        'connect_latency_ms': device.get('connect_latency_ms'),
+        'consecutive_failures': failures,
+        'circuit_open_until': open_until
+    }
+
+
+def probe_device(ip, port, timeout=PROBE_TIMEOUT_SECONDS):
+    """Open and close a plain TCP connection to the device's port
+
+    Returns:
+        tuple: (reachable, latency_ms) - latency_ms is None when unreachable
+    """
+    started = time.perf_counter()
+    try:
+        with socket.create_connection((ip, port), timeout=timeout):
+            return True, round((time.perf_counter() - started) * 1000, 1)
+    except OSError:
+        return False, None
+
+
+def probe_devices(devices, timeout=PROBE_TIMEOUT_SECONDS):
+    """Probe many devices at once
+
+    Returns:
+        dict: device id -> (reachable, latency_ms)
+    """
+    if not devices:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(len(devices), PROBE_MAX_WORKERS), thread_name_prefix='probe') as executor:
+        futures = {
+            device['id']: executor.submit(probe_device, device['ip'], device.get('port') or 4370, timeout)
+            for device in devices
+        }
+        return {device_id: future.result() for device_id, future in futures.items()}
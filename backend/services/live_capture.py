@@ -0,0 +1,176 @@
+"""
+Biometric Integration - Live Capture Service
+Receives punches from ZKTeco devices in real time via PyZk live capture
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime
+
+from services.attendance import transform_attendance
+
+logger = logging.getLogger(__name__)
+
+# live_capture() hands control back at least this often so stop/flush checks run
+LIVE_POLL_SECONDS = 1
+
+# Punches written together; a batch is also flushed once its oldest punch waited LIVE_FLUSH_SECONDS
+LIVE_BATCH_SIZE = 50
+LIVE_FLUSH_SECONDS = 2
+
+# Live connections are recycled this often for a catch-up pull, which also
+# detects connections that died without the socket noticing
+LIVE_RECONCILE_MINUTES = 15
+
+# Reconnect delay doubles after each failure, from the minimum up to the maximum
+RECONNECT_MIN_SECONDS = 5
+RECONNECT_MAX_SECONDS = 300
+
+
+class LiveCaptureService:
+    """Keeps live capture connections open to devices with live_capture enabled
+
+    Each live device gets a worker thread that loops: catch-up pull, open the
+    connection, ingest punch events in micro-batches, and after
+    LIVE_RECONCILE_MINUTES (or on error) start over. Scheduled pulls skip
+    devices a worker currently holds.
+    """
+
+    def __init__(self, pull_service, database):
+        self.pull_service = pull_service
+        self.database = database
+        self.running = False
+        self._workers = {}  # device_id -> (thread, stop event)
+        self._stopping = {}  # device_id -> thread told to stop that may still be running
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start workers for every enabled device with live capture on"""
+        logger.info("Starting live capture service")
+        self.running = True
+        self.refresh()
+
+    def stop(self):
+        """Stop all workers (call on application shutdown)"""
+        logger.info("Stopping live capture service")
+        self.running = False
+        with self._lock:
+            workers = list(self._workers.values())
+            self._workers.clear()
+            stopping = list(self._stopping.values())
+            self._stopping.clear()
+        for _, stop in workers:
+            stop.set()
+        for thread in [thread for thread, _ in workers] + stopping:
+            thread.join(timeout=LIVE_POLL_SECONDS * 5)
+
+    def refresh(self):
+        """Start or stop workers to match the current device settings"""
+        wanted = set()
+        if self.running:
+            wanted = {d['id'] for d in self.database.get_enabled_devices() if d.get('live_capture')}
+
+        with self._lock:
+            for device_id in list(self._workers):
+                if device_id not in wanted:
+                    thread, stop = self._workers.pop(device_id)
+                    stop.set()
+                    self._stopping[device_id] = thread
+                    logger.info(f"Live capture stopped for device {device_id}")
+
+            for device_id, thread in list(self._stopping.items()):
+                if not thread.is_alive():
+                    del self._stopping[device_id]
+
+            for device_id in wanted - set(self._workers):
+                stop = threading.Event()
+                # A worker stopped moments ago may still hold the device; the new one waits for it
+                previous = self._stopping.pop(device_id, None)
+                thread = threading.Thread(
+                    target=self._run, args=(device_id, stop, previous),
+                    name=f"live-{device_id}", daemon=True
+                )
+                self._workers[device_id] = (thread, stop)
+                thread.start()
+                logger.info(f"Live capture started for device {device_id}")
+
+    def active_device_ids(self):
+        """IDs of devices with a running live capture worker"""
+        with self._lock:
+            return set(self._workers)
+
+    def _run(self, device_id, stop, previous=None):
+        """Worker loop for one device: catch up, capture, reconnect with backoff
+
+        `previous` is an earlier worker for the same device that was told to
+        stop; it is waited for so the two never hold the device at once.
+        """
+        while previous is not None and previous.is_alive():
+            if stop.is_set():
+                return
+            previous.join(timeout=LIVE_POLL_SECONDS)
+
+        self.pull_service.live_device_ids.add(device_id)
+        backoff = RECONNECT_MIN_SECONDS
+        try:
+            while not stop.is_set():
+                try:
+                    # Pick up anything punched while we were not connected
+                    success, message, _ = self.pull_service.pull_data(device_id=device_id)
+                    if not success:
+                        raise Exception(f"Catch-up pull failed: {message}")
+
+                    conn = self.pull_service.connect(device_id)
+                    backoff = RECONNECT_MIN_SECONDS
+                    self._capture(device_id, conn, stop)
+                    self.pull_service.disconnect()
+
+                except Exception as e:
+                    self.pull_service.disconnect()
+                    logger.warning(f"Live capture for device {device_id} interrupted: {e}; "
+                                   f"reconnecting in {backoff}s")
+                    stop.wait(backoff)
+                    backoff = min(backoff * 2, RECONNECT_MAX_SECONDS)
+        finally:
+            self.pull_service.live_device_ids.discard(device_id)
+
+    def _capture(self, device_id, conn, stop):
+        """Ingest live punch events until stopped or a reconciliation pull is due"""
+        device = self.database.get_device(device_id)
+        device_name = device['name'] if device else f"Device {device_id}"
+        reconcile_at = time.monotonic() + LIVE_RECONCILE_MINUTES * 60
+        logger.info(f"Live capture connected to {device_name}")
+
+        batch = []
+        first_at = None
+        for log in conn.live_capture(new_timeout=LIVE_POLL_SECONDS):
+            now = time.monotonic()
+            if log is not None:
+                batch.append(log)
+                first_at = first_at or now
+
+            if batch and (len(batch) >= LIVE_BATCH_SIZE or now - first_at >= LIVE_FLUSH_SECONDS):
+                self._ingest(device_id, device_name, batch)
+                batch = []
+                first_at = None
+
+            if stop.is_set() or now >= reconcile_at:
+                # PyZk leaves its capture loop (and cleans up) on the next wake-up
+                conn.end_live_capture = True
+
+        if batch:
+            self._ingest(device_id, device_name, batch)
+
+    def _ingest(self, device_id, device_name, logs):
+        """Write one micro-batch through the same path as pulled records"""
+        try:
+            records, counts = transform_attendance(logs, device_id, datetime.min, datetime.max)
+            stats = {'errors': counts['errors']}
+            entries, _ = self.pull_service.build_timesheet_entries(records, stats)
+            result = self.database.add_timesheet_entries(entries) if entries else {'new_records': 0, 'duplicates': 0}
+            logger.info(f"Live capture from {device_name}: {result['new_records']} new, "
+                        f"{result['duplicates']} duplicates, {stats['errors']} errors")
+        except Exception as e:
+            # The next catch-up pull re-reads anything lost here
+            logger.error(f"Live capture ingest for {device_name} failed: {e}", exc_info=True)
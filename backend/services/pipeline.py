@@ -0,0 +1,153 @@
+"""
+Biometric Integration - Staged Pipeline
+Runs fetch -> transform -> write stages on threads joined by bounded queues
+"""
+
+import logging
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Batches buffered between two stages before the upstream stage waits
+PIPELINE_QUEUE_SIZE = 4
+
+_DONE = object()
+
+
+class PipelineStopped(Exception):
+    """Raised inside a stage when another stage has failed"""
+
+
+def _put(q, item, stop):
+    """Put onto a bounded queue, giving up if the pipeline was stopped"""
+    while True:
+        if stop.is_set():
+            raise PipelineStopped()
+        try:
+            q.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            continue
+
+
+def run_pipeline(source, transform, write, setup=None, flush=None, name='pipeline', maxsize=PIPELINE_QUEUE_SIZE):
+    """Stream batches through fetch, transform and write stages
+
+    The fetch stage (iterating `source`) and the transform stage each run on
+    their own thread; `write` runs on the calling thread. At most `maxsize`
+    batches wait between two stages, so a slow writer holds back the stages
+    before it instead of letting batches pile up in memory.
+
+    Args:
+        source: Iterable of batches (consumed on the fetch thread)
+        transform: Function mapping one batch to the batch handed to `write`
+        write: Function called with each transformed batch
+        setup: Optional function run on the calling thread once the fetch stage
+               has started and before the first write, so it overlaps the fetch
+        flush: Optional function called once after the last batch is written
+        name: Prefix for the stage thread names
+        maxsize: Batches buffered between two stages
+
+    Returns:
+        dict: Busy time per stage in milliseconds ('fetch_ms', 'transform_ms', 'write_ms')
+
+    Raises:
+        The first exception raised by any stage, after all stages have stopped.
+    """
+    fetched = queue.Queue(maxsize=maxsize)
+    transformed = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+    errors = []
+    timings = {'fetch_ms': 0.0, 'transform_ms': 0.0, 'write_ms': 0.0}
+
+    def fetch_stage():
+        try:
+            batches = iter(source)
+            while True:
+                started = time.perf_counter()
+                try:
+                    batch = next(batches)
+                except StopIteration:
+                    break
+                finally:
+                    timings['fetch_ms'] += (time.perf_counter() - started) * 1000
+                _put(fetched, batch, stop)
+        except PipelineStopped:
+            return
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+        try:
+            _put(fetched, _DONE, stop)
+        except PipelineStopped:
+            pass
+
+    def transform_stage():
+        try:
+            while True:
+                batch = fetched.get()
+                if batch is _DONE:
+                    break
+                started = time.perf_counter()
+                result = transform(batch)
+                timings['transform_ms'] += (time.perf_counter() - started) * 1000
+                _put(transformed, result, stop)
+        except PipelineStopped:
+            return
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+        try:
+            _put(transformed, _DONE, stop)
+        except PipelineStopped:
+            pass
+
+    threads = [
+        threading.Thread(target=fetch_stage, name=f"{name}-fetch", daemon=True),
+        threading.Thread(target=transform_stage, name=f"{name}-transform", daemon=True),
+    ]
+    for thread in threads:
+        thread.start()
+
+    try:
+        if setup:
+            started = time.perf_counter()
+            setup()
+            timings['write_ms'] += (time.perf_counter() - started) * 1000
+
+        while True:
+            try:
+                batch = transformed.get(timeout=0.1)
+            except queue.Empty:
+                if stop.is_set():
+                    break
+                continue
+            if batch is _DONE:
+                break
+            started = time.perf_counter()
+            write(batch)
+            timings['write_ms'] += (time.perf_counter() - started) * 1000
+
+        if not stop.is_set() and flush:
+            started = time.perf_counter()
+            flush()
+            timings['write_ms'] += (time.perf_counter() - started) * 1000
+    except Exception as e:
+        errors.append(e)
+        stop.set()
+    finally:
+        # Unblock a transform stage waiting on an empty fetch queue
+        if stop.is_set():
+            try:
+                fetched.put_nowait(_DONE)
+            except queue.Full:
+                pass
+        for thread in threads:
+            thread.join()
+
+    if errors:
+        raise errors[0]
+
+    return {stage: round(ms, 1) for stage, ms in timings.items()}
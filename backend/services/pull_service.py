@@ -4,20 +4,68 @@ Pulls attendance data from ZKTeco devices via PyZk
 """
 
 import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from zk import ZK
 
+from services.attendance import from_epoch, transform_attendance
+from services.device_health import (
+    DEVICE_IO_TIMEOUT, circuit_open_until, connect_timeout, health_after_failure, health_after_success,
+    probe_devices
+)
+from services.pipeline import run_pipeline
+
 logger = logging.getLogger(__name__)
 
+# Attendance records handed to the database per add_timesheet_entries call
+INGEST_BATCH_SIZE = 500
+
+# Devices pulled at the same time when api_config.pull_max_workers is not set
+DEFAULT_PULL_MAX_WORKERS = 4
+
+# Per-device stats summed into the multi-device pull result
+AGGREGATED_STATS = (
+    'total_logs', 'processed', 'new_records', 'duplicates', 'errors', 'below_watermark',
+    'employees_inserted', 'employees_updated', 'employees_unchanged'
+)
+
 
 class PullService:
     """Service for pulling attendance data from ZKTeco device"""
 
     def __init__(self, database):
         self.database = database
-        self.zk = None
-        self.conn = None
-        self.current_device_id = None
+        # Device connection state is per thread so devices can be pulled in parallel
+        self._local = threading.local()
+        # Devices currently held open by LiveCaptureService; scheduled pulls skip them
+        self.live_device_ids = set()
+
+    @property
+    def zk(self):
+        return getattr(self._local, 'zk', None)
+
+    @zk.setter
+    def zk(self, value):
+        self._local.zk = value
+
+    @property
+    def conn(self):
+        return getattr(self._local, 'conn', None)
+
+    @conn.setter
+    def conn(self, value):
+        self._local.conn = value
+
+    @property
+    def current_device_id(self):
+        return getattr(self._local, 'current_device_id', None)
+
+    @current_device_id.setter
+    def current_device_id(self, value):
+        self._local.current_device_id = value
 
     def get_device_config(self, device_id=None):
         """Get ZKTeco device configuration from database
@@ -50,24 +98,83 @@ class PullService:
             device_id: If provided, connect to specific device.
                       If None, uses legacy api_config.
         """
-        ip, port, comm_key, _ = self.get_device_config(device_id)
+        ip, port, comm_key, config = self.get_device_config(device_id)
 
         if not ip:
             raise Exception("Device IP not configured")
 
-        logger.info(f"Connecting to ZKTeco device at {ip}:{port} (comm_key: {comm_key or 0})")
+        # Devices with a latency history get a tighter timeout than the default 30s
+        timeout = connect_timeout(config) if device_id is not None else 30
+        logger.info(f"Connecting to ZKTeco device at {ip}:{port} (comm_key: {comm_key or 0}, timeout: {timeout}s)")
 
         # Use comm_key (password) if set, otherwise use 0
-        self.zk = ZK(ip, port=port, timeout=30, password=comm_key or 0)
-        self.conn = self.zk.connect()
-        self.current_device_id = device_id
+        started = time.perf_counter()
+        try:
+            self.zk = ZK(ip, port=port, timeout=timeout, password=comm_key or 0)
+            self.conn = self.zk.connect()
+            self.current_device_id = device_id
+
+            if not self.conn:
+                raise Exception(f"Failed to connect to device at {ip}:{port}")
+            self._set_io_timeout(self.zk, DEVICE_IO_TIMEOUT)
+        except Exception:
+            if device_id is not None:
+                self._record_health(device_id, health_after_failure(config))
+            raise
 
-        if not self.conn:
-            raise Exception(f"Failed to connect to device at {ip}:{port}")
+        if device_id is not None:
+            latency_ms = (time.perf_counter() - started) * 1000
+            self._record_health(device_id, health_after_success(config, latency_ms))
 
         logger.info("Connected to ZKTeco device successfully")
         return self.conn
 
+    def _set_io_timeout(self, zk, seconds):
+        """Use `seconds` for socket reads after the (adaptively timed) connect
+
+        pyzk applies its constructor timeout to every socket operation and
+        keeps it private; live_capture() also restores it when it ends.
+        """
+        zk._ZK__timeout = seconds
+        sock = getattr(zk, '_ZK__sock', None)
+        if sock is not None:
+            sock.settimeout(seconds)
+
+    def _record_health(self, device_id, health):
+        """Persist device health; a failure here must not fail the pull"""
+        try:
+            self.database.update_device_health(device_id, **health)
+            if health['circuit_open_until']:
+                logger.warning(f"Device {device_id} failed {health['consecutive_failures']} connects in a row; "
+                               f"skipping it until {health['circuit_open_until']}")
+        except Exception as e:
+            logger.error(f"Error recording health for device {device_id}: {e}")
+
+    def _log_unavailable(self, device, message):
+        """Record a failed pull for a device skipped without a connect attempt"""
+        try:
+            log_id = self.database.create_sync_log('pull')
+            self.database.update_sync_log(
+                log_id,
+                status='error',
+                error_message=message,
+                metadata={'device_id': device['id'], 'device_name': device['name']}
+            )
+        except Exception as e:
+            logger.error(f"Error logging skipped pull for device {device['id']}: {e}")
+
+    def _record_probes(self, probes):
+        """Persist reachability probe results for the dashboard"""
+        if not probes:
+            return
+        try:
+            self.database.record_device_probes(probes)
+        except Exception as e:
+            logger.error(f"Error recording device probes: {e}")
+        unreachable = [device_id for device_id, (ok, _) in probes.items() if not ok]
+        if unreachable:
+            logger.warning(f"Devices unreachable before pull: {unreachable}")
+
     def disconnect(self):
         """Disconnect from ZKTeco device"""
         if self.conn:
@@ -102,7 +209,7 @@ class PullService:
             self.disconnect()
             return False, str(e)
 
-    def pull_data(self, date_from=None, date_to=None, device_id=None, progress_callback=None):
+    def pull_data(self, date_from=None, date_to=None, device_id=None, progress_callback=None, max_workers=None):
         """
         Pull attendance data from ZKTeco device(s)
 
@@ -111,6 +218,8 @@ class PullService:
             date_to: End date (YYYY-MM-DD) - filter logs before this date
             device_id: If provided, pull from specific device. If None, pull from all enabled devices.
             progress_callback: Function to call with progress updates
+            max_workers: Devices pulled at the same time when pulling all devices.
+                         Defaults to api_config.pull_max_workers; 1 pulls one device at a time.
 
         Returns:
             tuple: (success, message, stats)
@@ -119,21 +228,48 @@ class PullService:
         if device_id is None:
             devices = self.database.get_enabled_devices()
             if not devices:
-                return False, "No enabled devices configured", {'total_logs': 0, 'processed': 0, 'new_records': 0, 'duplicates': 0, 'errors': 0, 'devices_synced': 0, 'devices_failed': 0}
+                return False, "No enabled devices configured", {'total_logs': 0, 'processed': 0, 'new_records': 0, 'duplicates': 0, 'errors': 0, 'devices_synced': 0, 'devices_failed': 0, 'devices_skipped': 0}
+
+            # Live capture workers hold their device's connection and run their own catch-up pulls
+            live_ids = set(self.live_device_ids)
+            if live_ids:
+                devices = [d for d in devices if d['id'] not in live_ids]
+                if not devices:
+                    return True, "All enabled devices are in live capture mode", {'total_logs': 0, 'processed': 0, 'new_records': 0, 'duplicates': 0, 'errors': 0, 'devices_synced': 0, 'devices_failed': 0, 'devices_skipped': 0}
+
+            # Devices whose circuit is open are failed without a connect attempt
+            now = datetime.now()
+            unavailable = {}
+            for device in devices:
+                until = circuit_open_until(device, now)
+                if until:
+                    unavailable[device['id']] = f"Skipped after repeated connection failures (retry after {until:%H:%M})"
+
+            # Probe the rest concurrently; unreachable devices skip the slow pyzk handshake
+            probes = probe_devices([d for d in devices if d['id'] not in unavailable])
+            self._record_probes(probes)
+            for device in devices:
+                reachable, _ = probes.get(device['id'], (True, None))
+                if not reachable:
+                    unavailable[device['id']] = f"Device unreachable at {device['ip']}:{device.get('port') or 4370}"
+                    self._record_health(device['id'], health_after_failure(device, now))
+
+            if max_workers is None:
+                max_workers = self.get_max_workers()
+            max_workers = max(1, min(max_workers, len(devices) - len(unavailable)))
 
             # Aggregate stats across all devices
-            total_stats = {
-                'total_logs': 0,
-                'processed': 0,
-                'new_records': 0,
-                'duplicates': 0,
-                'errors': 0,
-                'devices_synced': 0,
-                'devices_failed': 0
-            }
+            total_stats = {key: 0 for key in AGGREGATED_STATS}
+            total_stats['devices_synced'] = 0
+            total_stats['devices_failed'] = 0
+            total_stats['devices_skipped'] = 0
             messages = []
 
-            for i, device in enumerate(devices):
+            def pull_one(i, device):
+                if device['id'] in unavailable:
+                    self._log_unavailable(device, unavailable[device['id']])
+                    return False, unavailable[device['id']], {}
+
                 if progress_callback:
                     progress_callback({
                         'type': 'pull',
@@ -144,21 +280,29 @@ class PullService:
                         'device_name': device['name']
                     })
 
-                success, msg, stats = self._pull_from_device(
+                return self._pull_from_device(
                     device['id'],
                     date_from,
                     date_to,
                     progress_callback
                 )
 
-                total_stats['total_logs'] += stats.get('total_logs', 0)
-                total_stats['processed'] += stats.get('processed', 0)
-                total_stats['new_records'] += stats.get('new_records', 0)
-                total_stats['duplicates'] += stats.get('duplicates', 0)
-                total_stats['errors'] += stats.get('errors', 0)
+            if max_workers > 1:
+                logger.info(f"Pulling {len(devices)} devices with up to {max_workers} in parallel")
+                with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='pull') as executor:
+                    futures = [executor.submit(pull_one, i, device) for i, device in enumerate(devices)]
+                    results = [future.result() for future in futures]
+            else:
+                results = [pull_one(i, device) for i, device in enumerate(devices)]
+
+            for device, (success, msg, stats) in zip(devices, results):
+                for key in AGGREGATED_STATS:
+                    total_stats[key] += stats.get(key, 0)
 
                 if success:
                     total_stats['devices_synced'] += 1
+                    if stats.get('skipped'):
+                        total_stats['devices_skipped'] += 1
                     messages.append(f"{device['name']}: {msg}")
                 else:
                     total_stats['devices_failed'] += 1
@@ -166,6 +310,8 @@ class PullService:
 
             overall_success = total_stats['devices_synced'] > 0
             summary = f"Pull complete: {total_stats['devices_synced']}/{len(devices)} devices synced, {total_stats['new_records']} new records"
+            if total_stats['devices_skipped'] > 0:
+                summary += f", {total_stats['devices_skipped']} unchanged"
             if total_stats['devices_failed'] > 0:
                 summary += f", {total_stats['devices_failed']} device(s) failed"
 
@@ -175,6 +321,14 @@ class PullService:
             # Pull from specific device
             return self._pull_from_device(device_id, date_from, date_to, progress_callback)
 
+    def get_max_workers(self):
+        """Get the configured number of devices to pull in parallel"""
+        config = self.database.get_api_config() or {}
+        try:
+            return max(1, int(config.get('pull_max_workers') or DEFAULT_PULL_MAX_WORKERS))
+        except (TypeError, ValueError):
+            return DEFAULT_PULL_MAX_WORKERS
+
     def _pull_from_device(self, device_id, date_from=None, date_to=None, progress_callback=None):
         """
         Pull attendance data from a specific ZKTeco device
@@ -194,7 +348,14 @@ class PullService:
             'new_records': 0,
             'duplicates': 0,
             'errors': 0,
-            'filtered': 0  # records outside the requested date range
+            'filtered': 0,  # records outside the requested date range
+            'below_watermark': 0,  # records already ingested by an earlier pull
+            'resumed_from': None,  # checkpoint position an interrupted pull was resumed from
+            'employees_inserted': 0,
+            'employees_updated': 0,
+            'employees_unchanged': 0,
+            'skipped': False,  # device unchanged since the last pull, nothing downloaded
+            'stage_ms': {}  # busy time of the fetch/transform/write stages
         }
 
         # Get device info for logging
@@ -229,7 +390,27 @@ class PullService:
 
             conn = self.connect(device_id)
 
-            # Get all attendance records
+            # Cheap record/user counts; if they match the last complete pull there
+            # is nothing new to download
+            fingerprint = self._read_fingerprint(conn, device_name)
+            if (fingerprint and not (date_from or date_to) and device
+                    and fingerprint == device.get('state_fingerprint')):
+                self.disconnect()
+                stats['skipped'] = True
+                self.database.update_sync_log(
+                    log_id,
+                    status='success',
+                    metadata={'device_id': device_id, 'device_name': device_name, 'skipped': True}
+                )
+                self.database.update_device_last_pull(device_id)
+                message = "No changes since last pull"
+                logger.info(f"Pull from {device_name} skipped: device unchanged ({fingerprint})")
+                return True, message, stats
+
+            # Users first, so the attendance download overlaps the employee upsert
+            users = conn.get_users()
+            logger.info(f"Retrieved {len(users)} users from {device_name}")
+
             if progress_callback:
                 progress_callback({
                     'type': 'pull',
@@ -238,95 +419,105 @@ class PullService:
                     'device_name': device_name
                 })
 
-            attendance = conn.get_attendance()
-            stats['total_logs'] = len(attendance)
-
-            logger.info(f"Retrieved {len(attendance)} total attendance logs from {device_name}")
-
-            # Get users for employee mapping
-            users = conn.get_users()
-            user_map = {str(u.user_id): u.name for u in users}
-
-            logger.info(f"Retrieved {len(users)} users from {device_name}")
-
-            # Sync users to employee table
-            for user in users:
-                self.database.add_or_update_employee(
-                    backend_id=str(user.user_id),
-                    name=user.name or f"User {user.user_id}",
-                    employee_code=str(user.user_id)
+            # Watermark bounds (set by the fetch stage) and newest stored punch epoch
+            scan = {'skip_count': 0, 'watermark_at': None, 'latest_epoch': None}
+            pending = []
+            # Checkpoints only resume pulls over the same date range
+            checkpoint_range = f"{date_from}|{date_to}" if date_from or date_to else None
+            # (buffer position, entries queued once records below it were written)
+            marks = deque()
+            progress = {'queued': 0, 'committed': 0}
+
+            def fetch():
+                attendance = conn.get_attendance()
+                # Stats found here travel with the first batch; only the writer updates stats
+                found = {'total_logs': len(attendance)}
+                logger.info(f"Retrieved {len(attendance)} total attendance logs from {device_name}")
+
+                # Default pulls skip what the last pull stored; explicit date ranges rescan
+                watermark_at, watermark_count = self._get_watermark(device, attendance, device_name)
+                scan['watermark_at'] = watermark_at
+                scan['skip_count'] = 0 if date_from or date_to else watermark_count
+
+                # An interrupted pull left a checkpoint further along - carry on from there
+                position, checkpoint_at = self._get_checkpoint(device, attendance, checkpoint_range, device_name)
+                if position > scan['skip_count']:
+                    scan['skip_count'] = position
+                    scan['watermark_at'] = max(scan['watermark_at'], checkpoint_at) if scan['watermark_at'] else checkpoint_at
+                    found['resumed_from'] = position
+                    logger.info(f"Resuming interrupted pull of {device_name} from record {position}")
+
+                for offset in range(0, len(attendance), INGEST_BATCH_SIZE):
+                    yield offset, attendance[offset:offset + INGEST_BATCH_SIZE], found if offset == 0 else None
+
+            def transform(batch):
+                offset, logs, found = batch
+                records, counts = transform_attendance(
+                    logs, device_id, start_date, end_date,
+                    skip_count=scan['skip_count'], watermark_at=scan['watermark_at'], offset=offset
                 )
-
-            # Process attendance logs
-            for i, log in enumerate(attendance):
-                try:
-                    # Filter by date range
-                    if log.timestamp < start_date or log.timestamp > end_date:
-                        stats['filtered'] += 1
-                        continue
-
-                    stats['processed'] += 1
-
-                    # Determine punch type (0=IN, 1=OUT, or based on device config)
-                    # Some devices use: 0=Check-In, 1=Check-Out, 2=Break-Out, 3=Break-In, 4=OT-In, 5=OT-Out
-                    punch = getattr(log, 'punch', 0) or 0
-                    if punch in [0, 3, 4]:  # IN types
-                        log_type = 'in'
-                    else:  # OUT types
-                        log_type = 'out'
-
-                    # Create unique sync_id (includes device_id for uniqueness across devices)
-                    date_str = log.timestamp.strftime("%Y-%m-%d")
-                    time_str = log.timestamp.strftime("%H:%M:%S")
-                    sync_id = f"ZK_{device_id}_{log.user_id}_{log.timestamp.strftime('%Y%m%d%H%M%S')}"
-
-                    # Get employee from database, create if not found
-                    employee = self.database.get_employee_by_code(str(log.user_id))
-                    if not employee:
-                        self.database.add_or_update_employee(
-                            backend_id=str(log.user_id),
-                            name=f"User {log.user_id}",
-                            employee_code=str(log.user_id)
-                        )
-                        employee = self.database.get_employee_by_code(str(log.user_id))
-
-                    if not employee:
-                        logger.error(f"Emp not found: {log.user_id}")
-                        continue
-
-                    # Add to database with device_id
-                    result = self.database.add_timesheet_entry(
-                        sync_id=sync_id,
-                        employee_id=employee['id'],
-                        log_type=log_type,
-                        date=date_str,
-                        time=time_str,
-                        device_id=device_id
-                    )
-
-                    if result:
-                        stats['new_records'] += 1
-                        logger.debug(f"Added: {employee.get('name', 'Unknown')} - {date_str} {time_str} - {log_type}")
-                    else:
-                        stats['duplicates'] += 1
-
-                    # Progress update
-                    if progress_callback and stats['processed'] % 50 == 0:
-                        progress_callback({
-                            'type': 'pull',
-                            'status': 'processing',
-                            'records_fetched': stats['total_logs'],
-                            'records_processed': stats['processed'],
-                            'records_success': stats['new_records'],
-                            'device_name': device_name
-                        })
-
-                except Exception as e:
-                    stats['errors'] += 1
-                    logger.error(f"Error processing log: {e}")
+                # Counts travel with the batch; only the writer (calling thread) updates stats
+                return offset + len(logs), records, counts, found
+
+            def sync_users():
+                # Sync users to employee table (unchanged users are skipped)
+                employee_stats = self.database.upsert_employees({
+                    'backend_id': str(user.user_id),
+                    'name': user.name or f"User {user.user_id}",
+                    'employee_code': str(user.user_id)
+                } for user in users)
+                stats['employees_inserted'] = employee_stats['inserted']
+                stats['employees_updated'] = employee_stats['updated']
+                stats['employees_unchanged'] = employee_stats['unchanged']
+
+                # Resolve employees from memory for the rest of the pull
+                self.database.warm_employee_cache()
+
+            def write(batch):
+                nonlocal pending
+                end, records, counts, found = batch
+                if found:
+                    stats.update(found)
+                for key, value in counts.items():
+                    stats[key] += value
+                entries, newest_epoch = self.build_timesheet_entries(records, stats)
+                if newest_epoch is not None and (scan['latest_epoch'] is None or newest_epoch > scan['latest_epoch']):
+                    scan['latest_epoch'] = newest_epoch
+                pending.extend(entries)
+                progress['queued'] += len(entries)
+                marks.append((end, progress['queued']))
+                while len(pending) >= INGEST_BATCH_SIZE:
+                    commit(pending[:INGEST_BATCH_SIZE])
+                    pending = pending[INGEST_BATCH_SIZE:]
+
+            def flush():
+                if pending:
+                    commit(pending)
+
+            def commit(entries):
+                self._ingest_entries(entries, stats, device_name, progress_callback)
+                progress['committed'] += len(entries)
+                position = None
+                while marks and marks[0][1] <= progress['committed']:
+                    position = marks.popleft()[0]
+                # Failed records must be re-read, so the checkpoint stops at the first error
+                if position is not None and stats['errors'] == 0:
+                    self._save_checkpoint(device_id, position, scan, checkpoint_range)
+
+            stats['stage_ms'] = run_pipeline(
+                fetch(), transform, write,
+                setup=sync_users, flush=flush, name=f"pull-{device_id}"
+            )
+            latest_at = scan['watermark_at']
+            if scan['latest_epoch'] is not None:
+                newest = from_epoch(scan['latest_epoch'])
+                latest_at = max(latest_at, newest) if latest_at else newest
 
             self.disconnect()
 
+            # The pull finished - the watermark below takes over from the checkpoint
+            self.database.update_pull_checkpoint(device_id, None)
+
             # Update sync log with device metadata
             self.database.update_sync_log(
                 log_id,
@@ -334,17 +525,39 @@ class PullService:
                 records_processed=stats['processed'],
                 records_success=stats['new_records'],
                 records_failed=stats['errors'],
-                metadata={'device_id': device_id, 'device_name': device_name}
+                metadata={
+                    'device_id': device_id,
+                    'device_name': device_name,
+                    'employees_inserted': stats['employees_inserted'],
+                    'employees_updated': stats['employees_updated'],
+                    'employees_unchanged': stats['employees_unchanged'],
+                    'below_watermark': stats['below_watermark'],
+                    'resumed_from': stats['resumed_from'],
+                    'stage_ms': stats['stage_ms']
+                }
             )
 
             # Update device last pull timestamp
             self.database.update_device_last_pull(device_id)
 
+            # Only move the watermark when every record made it in, so failed
+            # records are retried on the next pull. Date-range pulls store only
+            # their own range, so they must not let default pulls skip the rest
+            if stats['errors'] == 0 and not (date_from or date_to):
+                if latest_at is not None:
+                    self.database.update_device_watermark(device_id, latest_at, stats['total_logs'])
+                if fingerprint:
+                    self.database.update_device_fingerprint(device_id, fingerprint)
+
             # Also update global last pull timestamp for backwards compatibility
             self.database.update_api_config(last_pull_at=datetime.now().isoformat())
 
             message = f"{stats['new_records']} new, {stats['duplicates']} duplicates, {stats['errors']} errors, {stats['filtered']} outside date range"
+            if stats['below_watermark']:
+                message += f", {stats['below_watermark']} already pulled"
             logger.info(f"Pull from {device_name} complete: {message}")
+            logger.debug(f"Pull stage timings for {device_name}: {stats['stage_ms']}")
+            logger.debug(f"Employee cache: {self.database.employee_cache.stats()}")
 
             return True, message, stats
 
@@ -361,6 +574,131 @@ class PullService:
 
             return False, str(e), stats
 
+    def _read_fingerprint(self, conn, device_name):
+        """Read the device's record and user counts without downloading them
+
+        Returns:
+            str: "<records>:<users>", or None if the device can't report its sizes
+        """
+        try:
+            conn.read_sizes()
+            return f"{int(conn.records)}:{int(conn.users)}"
+        except Exception as e:
+            logger.warning(f"Could not read record counts from {device_name}: {e}")
+            return None
+
+    def _get_watermark(self, device, attendance, device_name):
+        """Get the (last_record_at, last_record_count) high-water mark for a device
+
+        Returns (None, 0) - a full rescan - when no watermark is stored or the
+        device's buffer looks cleared or reset since the last pull.
+        """
+        if not device or not device.get('last_record_at'):
+            return None, 0
+
+        try:
+            watermark_at = datetime.fromisoformat(device['last_record_at'])
+        except (TypeError, ValueError):
+            logger.warning(f"Ignoring invalid watermark for {device_name}: {device['last_record_at']!r}")
+            return None, 0
+        watermark_count = device.get('last_record_count') or 0
+
+        if len(attendance) < watermark_count:
+            logger.info(f"{device_name} has {len(attendance)} records, fewer than the "
+                        f"{watermark_count} seen last pull - device was cleared, rescanning")
+            return None, 0
+
+        return watermark_at, watermark_count
+
+    def _get_checkpoint(self, device, attendance, checkpoint_range, device_name):
+        """Get the (position, checkpoint_at) an interrupted pull reached, or (0, None)
+
+        A checkpoint only applies to a pull over the same date range, and is
+        dropped when the device buffer has shrunk below it (cleared or reset).
+        """
+        position = (device or {}).get('checkpoint_position')
+        if not position or device.get('checkpoint_range') != checkpoint_range:
+            return 0, None
+
+        try:
+            checkpoint_at = datetime.fromisoformat(device['checkpoint_at'])
+        except (TypeError, ValueError):
+            logger.warning(f"Ignoring invalid pull checkpoint for {device_name}: {device['checkpoint_at']!r}")
+            return 0, None
+
+        if len(attendance) < position:
+            logger.info(f"{device_name} has {len(attendance)} records, fewer than its pull "
+                        f"checkpoint at {position} - device was cleared, ignoring it")
+            return 0, None
+
+        return position, checkpoint_at
+
+    def _save_checkpoint(self, device_id, position, scan, checkpoint_range):
+        """Persist pull progress after a write; a failure here only costs re-reading"""
+        # Newest punch queued so far - never older than anything below position
+        checkpoint_at = scan['watermark_at']
+        if scan['latest_epoch'] is not None:
+            newest = from_epoch(scan['latest_epoch'])
+            checkpoint_at = max(checkpoint_at, newest) if checkpoint_at else newest
+        if checkpoint_at is None:
+            return
+        try:
+            self.database.update_pull_checkpoint(device_id, position, checkpoint_at, checkpoint_range)
+        except Exception as e:
+            logger.error(f"Error saving pull checkpoint for device {device_id}: {e}")
+
+    def build_timesheet_entries(self, records, stats):
+        """Resolve employees for PunchRecords and format them as timesheet rows
+
+        Employees missing from the database are created. Records that fail are
+        counted in stats['errors'].
+
+        Returns:
+            tuple: (entries for add_timesheet_entries, newest epoch among them or None)
+        """
+        entries = []
+        newest_epoch = None
+        for record in records:
+            try:
+                # Get employee from database, create if not found
+                employee = self.database.get_employee_by_code(record.user_code)
+                if not employee:
+                    self.database.add_or_update_employee(
+                        backend_id=record.user_code,
+                        name=f"User {record.user_code}",
+                        employee_code=record.user_code
+                    )
+                    employee = self.database.get_employee_by_code(record.user_code)
+
+                if not employee:
+                    logger.error(f"Emp not found: {record.user_code}")
+                    continue
+
+                entries.append(record.timesheet_entry(employee['id']))
+                if newest_epoch is None or record.epoch > newest_epoch:
+                    newest_epoch = record.epoch
+
+            except Exception as e:
+                stats['errors'] += 1
+                logger.error(f"Error processing log: {e}")
+        return entries, newest_epoch
+
+    def _ingest_entries(self, entries, stats, device_name, progress_callback=None):
+        """Write a batch of timesheet entries and update pull stats"""
+        result = self.database.add_timesheet_entries(entries)
+        stats['new_records'] += result['new_records']
+        stats['duplicates'] += result['duplicates']
+
+        if progress_callback:
+            progress_callback({
+                'type': 'pull',
+                'status': 'processing',
+                'records_fetched': stats['total_logs'],
+                'records_processed': stats['processed'],
+                'records_success': stats['new_records'],
+                'device_name': device_name
+            })
+
     def get_device_users(self):
         """Get list of users from ZKTeco device"""
         try:
@@ -380,15 +718,90 @@ class PullService:
             self.disconnect()
             raise
 
-    def clear_device_attendance(self):
-        """Clear attendance logs from device (use with caution!)"""
+    def clear_device_attendance(self, device_id=None):
+        """Clear attendance logs from device (use with caution!)
+
+        Nothing is checked first; rotate_device() clears only records that are
+        confirmed stored.
+        """
         try:
-            conn = self.connect()
+            conn = self.connect(device_id)
             conn.clear_attendance()
             self.disconnect()
+            if device_id is not None:
+                self.database.record_device_rotation(device_id)
             logger.info("Cleared attendance logs from device")
             return True, "Attendance logs cleared from device"
         except Exception as e:
             logger.error(f"Failed to clear attendance: {e}")
             self.disconnect()
             return False, str(e)
+
+    def rotate_device(self, device_id, min_records=0, require_pushed=True, retain_since=None):
+        """Clear a device's attendance buffer once every record in it is confirmed stored
+
+        The device is disabled (no punches accepted) while its buffer is read,
+        missing records are ingested, and every record is checked against the
+        timesheet table - and, with require_pushed, that it was pushed. Only
+        then is the buffer cleared; otherwise nothing on the device changes.
+
+        Args:
+            device_id: Device to rotate
+            min_records: Leave the buffer alone while it holds fewer records
+            require_pushed: Also require every record to be pushed to Payroll
+            retain_since: Records older than this are past local retention
+                          (see scheduler CLEANUP_DAYS) and are not checked
+
+        Returns:
+            tuple: (rotated, message, stats)
+        """
+        stats = {'buffer_records': 0, 'new_records': 0, 'expired': 0, 'unconfirmed': 0, 'errors': 0}
+        device = self.database.get_device(device_id)
+        device_name = device['name'] if device else f"Device {device_id}"
+
+        try:
+            conn = self.connect(device_id)
+            conn.read_sizes()
+            stats['buffer_records'] = conn.records
+            if conn.records == 0 or conn.records < min_records:
+                self.disconnect()
+                return False, f"{conn.records} records on device, below the rotation threshold", stats
+
+            conn.disable_device()
+            try:
+                attendance = conn.get_attendance()
+                stats['buffer_records'] = len(attendance)
+
+                records, counts = transform_attendance(attendance, device_id, retain_since or datetime.min, datetime.max)
+                stats['expired'] = counts['filtered']
+                stats['errors'] = counts['errors']
+                entries, _ = self.build_timesheet_entries(records, stats)
+                if entries:
+                    stats['new_records'] = self.database.add_timesheet_entries(entries)['new_records']
+
+                # Punches by one user within the same second share a sync_id
+                sync_ids = {record.sync_id for record in records}
+                confirmed = self.database.get_confirmed_sync_ids(sync_ids, pushed_only=require_pushed)
+                stats['unconfirmed'] = len(sync_ids - confirmed)
+                if stats['errors'] or stats['unconfirmed']:
+                    requirement = "stored and pushed" if require_pushed else "stored"
+                    message = (f"Rotation deferred: {stats['unconfirmed']} records not yet {requirement}, "
+                               f"{stats['errors']} unreadable")
+                    logger.info(f"{device_name}: {message}")
+                    return False, message, stats
+
+                conn.clear_attendance()
+            finally:
+                conn.enable_device()
+                self.disconnect()
+
+            self.database.record_device_rotation(device_id)
+            message = f"Cleared {stats['buffer_records']} records ({stats['expired']} past local retention)"
+            self.database.log_other_event(f"Buffer rotated on {device_name}: {message}")
+            logger.info(f"Buffer rotated on {device_name}: {message}")
+            return True, message, stats
+
+        except Exception as e:
+            logger.error(f"Buffer rotation on {device_name} failed: {e}", exc_info=True)
+            self.disconnect()
+            return False, str(e), stats
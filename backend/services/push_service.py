@@ -5,14 +5,43 @@ Service for pushing timesheet data to cloud payroll systems
 
 import requests
 import logging
-from datetime import datetime
+import math
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from datetime import datetime, timedelta
 import json
 
+from requests.adapters import HTTPAdapter
+
+from services.batch_sizer import (
+    DEFAULT_BATCH_CEILING, DEFAULT_BATCH_FLOOR, DEFAULT_BATCH_SIZE, AdaptiveBatchSizer
+)
+from services.retry_policy import RetryPolicy
+
 logger = logging.getLogger(__name__)
 
 # YAHSHUA API endpoints (default, can be overridden via config)
 DEFAULT_YAHSHUA_BASE_URL = "https://yahshuapayroll.com/api"
 
+# Batches sent at once when api_config.push_max_in_flight is not set (1 = one after another)
+DEFAULT_PUSH_MAX_IN_FLIGHT = 1
+PUSH_MAX_IN_FLIGHT_LIMIT = 16
+
+# Records claimed from the push outbox per cycle, and how long the claim lasts.
+# A batch's lease is renewed before every send attempt, and all claims every
+# PUSH_LEASE_RENEW_SECONDS while waiting on a batch and after each result;
+# rows held by a pusher that stops without releasing them become claimable
+# again once it expires. One attempt (send, 401 re-auth and re-send) must fit
+# well inside it.
+PUSH_CLAIM_LIMIT = 10000
+PUSH_LEASE_SECONDS = 600
+PUSH_LEASE_RENEW_SECONDS = PUSH_LEASE_SECONDS / 4
+
 # User-friendly messages for YAHSHUA error codes
 YAHSHUA_ERROR_MESSAGES = {
     100: "Invalid request format",
@@ -32,6 +61,37 @@ YAHSHUA_ERROR_MESSAGES = {
     500: "Payroll server internal error",
 }
 
+# How records rejected with each YAHSHUA error code are retried:
+#   'synced'    - Payroll already has the record (a re-send after a crash or an
+#                 expired push lease); it is marked synced, not failed
+#   'permanent' - resending the same record cannot succeed; it leaves the push queue
+#   'later'     - fixable in Payroll (employee or branch setup); retried after a growing delay
+#   'now'       - a server-side problem; retried on the next push
+# Codes not listed are retried 'later'.
+YAHSHUA_RETRY_CLASSES = {
+    100: 'permanent',
+    101: 'permanent',
+    102: 'permanent',
+    103: 'permanent',
+    110: 'permanent',
+    120: 'synced',
+    130: 'later',
+    140: 'later',
+    141: 'later',
+    142: 'later',
+    143: 'later',
+    150: 'permanent',
+    160: 'permanent',
+    200: 'now',
+    500: 'now',
+}
+
+# 'later' delay doubles per failed attempt from the base up to the maximum;
+# after RETRY_LATER_MAX_ATTEMPTS failures the record is rejected for good
+RETRY_LATER_BASE_MINUTES = 60
+RETRY_LATER_MAX_MINUTES = 24 * 60
+RETRY_LATER_MAX_ATTEMPTS = 8
+
 # User-friendly messages for HTTP status codes
 HTTP_ERROR_MESSAGES = {
     400: "Bad request - the data sent was invalid",
@@ -58,6 +118,34 @@ def get_friendly_yahshua_error(error_code, reason):
     return f"Sync failed (error code {error_code})"
 
 
+def get_retry_class(error_code):
+    """'permanent', 'later' or 'now' for a YAHSHUA error code"""
+    try:
+        return YAHSHUA_RETRY_CLASSES.get(int(error_code), 'later')
+    except (TypeError, ValueError):
+        return 'later'
+
+
+def schedule_retry(retry_class, attempts, now=None):
+    """When to push a rejected record again
+
+    Args:
+        retry_class: From get_retry_class()
+        attempts: Failed push attempts for the record, including this one
+
+    Returns:
+        tuple: (next_attempt_at or None for the next push, rejected)
+    """
+    if retry_class == 'permanent':
+        return None, True
+    if retry_class == 'now':
+        return None, False
+    if attempts >= RETRY_LATER_MAX_ATTEMPTS:
+        return None, True
+    minutes = min(RETRY_LATER_BASE_MINUTES * 2 ** (attempts - 1), RETRY_LATER_MAX_MINUTES)
+    return (now or datetime.now()) + timedelta(minutes=minutes), False
+
+
 def get_friendly_http_error(status_code):
     """Get a user-friendly error message for an HTTP status code"""
     friendly = HTTP_ERROR_MESSAGES.get(status_code)
@@ -73,14 +161,24 @@ def get_friendly_http_error(status_code):
 class PushService:
     """Service for pushing data to YAHSHUA Payroll cloud system"""
 
-    def __init__(self, database):
+    def __init__(self, database, sleep=time.sleep):
         self.database = database
+        self.sleep = sleep  # used for retry backoff; tests pass a stub
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Biometric Integration/1.0',
             'Accept': 'application/json',
             'Content-Type': 'application/json'
         })
+        # Enough pooled connections for every in-flight batch
+        adapter = HTTPAdapter(pool_maxsize=PUSH_MAX_IN_FLIGHT_LIMIT)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        # Concurrent batches hitting a 401 re-authenticate once: (expired token, fresh token)
+        self._auth_lock = threading.Lock()
+        self._token_refresh = (None, None)
+        # Batch size the last push ended on; the next push starts from it
+        self._batch_size = DEFAULT_BATCH_SIZE
 
     def get_base_url(self):
         """Get the YAHSHUA API base URL from config or use default"""
@@ -192,19 +290,64 @@ class PushService:
         except Exception as e:
             return False, str(e)
 
-    def push_data(self, progress_callback=None):
+    def get_max_in_flight(self):
+        """Get the configured number of batches to have in flight at once"""
+        config = self.database.get_api_config() or {}
+        try:
+            value = int(config.get('push_max_in_flight') or DEFAULT_PUSH_MAX_IN_FLIGHT)
+        except (TypeError, ValueError):
+            return DEFAULT_PUSH_MAX_IN_FLIGHT
+        return max(1, min(value, PUSH_MAX_IN_FLIGHT_LIMIT))
+
+    def get_batch_sizer(self):
+        """Batch size controller bounded by api_config.push_batch_min / push_batch_max"""
+        config = self.database.get_api_config() or {}
+        try:
+            floor = int(config.get('push_batch_min') or DEFAULT_BATCH_FLOOR)
+            ceiling = int(config.get('push_batch_max') or DEFAULT_BATCH_CEILING)
+        except (TypeError, ValueError):
+            floor, ceiling = DEFAULT_BATCH_FLOOR, DEFAULT_BATCH_CEILING
+        return AdaptiveBatchSizer(initial=self._batch_size, floor=floor, ceiling=ceiling)
+
+    def get_retry_policy(self):
+        """Retry policy for one push cycle (its retry budget is shared by all batches)"""
+        return RetryPolicy(sleep=self.sleep)
+
+    def push_data(self, progress_callback=None, max_in_flight=None):
         """
-        Push unsynced timesheet data to YAHSHUA Payroll in batches of 50
+        Push unsynced timesheet data to YAHSHUA Payroll in adaptively sized batches
+
+        Each batch's size is chosen by an AdaptiveBatchSizer from the responses
+        so far. Up to max_in_flight batches are sent concurrently; their
+        results are applied to the database in batch order by this thread
+        only.
+
+        Transient batch failures (timeouts, connection errors, 408/429/5xx)
+        are retried with backoff under a RetryPolicy. A batch that runs out of
+        attempts is marked failed and the push carries on; once the cycle's
+        retry budget is spent, or on a failure that retrying cannot fix, no
+        new batches are sent (those already in flight are still recorded).
+        Each response adjusts the batch size as it arrives. A batch that
+        fails with a 413 or a timeout is not retried at its old size: it is
+        cut again at the shrunk batch size and re-sent, unless it is already
+        that small.
+
+        Records are leased from the push outbox rather than read, so a
+        scheduled and a manual push running together never send the same
+        record. Before each send attempt the batch's lease is renewed, and
+        records whose lease ran out and were claimed by another push are
+        dropped from it. The leases of queued and in-flight records are
+        renewed while waiting on a slow batch as well. Whatever is still leased when the push ends is
+        released.
 
         Args:
             progress_callback: Optional callback function for progress updates.
                               Called with dict: {batch_current, batch_total, batch_size, success, failed}
+            max_in_flight: Batches sent at once (defaults to api_config.push_max_in_flight)
 
         Returns:
             tuple: (success: bool, message: str, stats: dict)
         """
-        BATCH_SIZE = 50
-
         log_id = self.database.create_sync_log('push')
         stats = {
             'processed': 0,
@@ -212,8 +355,16 @@ class PushService:
             'failed': 0,
             'skipped': 0,
             'batches_completed': 0,
-            'batches_total': 0
+            'batches_total': 0,
+            'records_not_sent': 0,  # left queued after the push stopped early
+            'retries': 0,  # extra attempts made for transient batch failures
+            'batches_exhausted': 0,  # batches marked failed after their last retry
+            'rejected': 0,  # records taken out of the push queue for good
+            'batches_resplit': 0,  # too-large batches cut smaller and re-sent
+            'lease_lost': 0,  # records left to another push after this one's lease expired
+            'batches': []  # [size, latency_ms] per batch, in send order
         }
+        owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
 
         try:
             logger.info("Starting push sync to YAHSHUA Payroll")
@@ -221,9 +372,9 @@ class PushService:
             # Get token
             token = self.get_valid_token()
 
-            # Get ALL unsynced timesheets
-            all_unsynced = self.database.get_unsynced_timesheets(limit=10000)
-            logger.info(f"Found {len(all_unsynced)} unsynced timesheet records")
+            # Claim every due record not already claimed by another push
+            all_unsynced = self.database.claim_push_batch(owner, PUSH_CLAIM_LIMIT, PUSH_LEASE_SECONDS)
+            logger.info(f"Claimed {len(all_unsynced)} unsynced timesheet records")
 
             if len(all_unsynced) == 0:
                 message = "No records to sync"
@@ -273,72 +424,89 @@ class PushService:
                 )
                 return True, message, stats
 
-            # Split into batches of 50
-            batches = []
-            for i in range(0, len(all_log_entries), BATCH_SIZE):
-                batches.append(all_log_entries[i:i + BATCH_SIZE])
+            sizer = self.get_batch_sizer()
+            logger.info(f"Pushing {len(all_log_entries)} records in batches starting at {sizer.size} "
+                        f"(between {sizer.floor} and {sizer.ceiling})")
 
-            stats['batches_total'] = len(batches)
-            logger.info(f"Split {len(all_log_entries)} records into {len(batches)} batches of up to {BATCH_SIZE}")
+            policy = self.get_retry_policy()
 
-            batch_error = None
+            def hold(entries):
+                return self.database.hold_push_claims(owner, [entry['id'] for entry in entries], PUSH_LEASE_SECONDS)
 
-            # Process each batch
-            for batch_num, batch in enumerate(batches, 1):
-                logger.info(f"Processing batch {batch_num}/{len(batches)} ({len(batch)} records)")
-
-                # Emit progress before processing batch
-                if progress_callback:
-                    progress_callback({
-                        'batch_current': batch_num,
-                        'batch_total': len(batches),
-                        'batch_size': len(batch),
-                        'success': stats['success'],
-                        'failed': stats['failed']
-                    })
-
-                # Push batch to YAHSHUA
-                success, result = self.push_batch(token, batch)
-
-                if success:
-                    # Process results for this batch
-                    logs_synced = result.get('logs_successfully_sync', [])
-                    logs_failed = result.get('logs_not_sync', [])
-
-                    # Mark successful logs
-                    for local_id in logs_synced:
-                        self.database.mark_timesheet_synced(local_id, local_id)
-                        stats['success'] += 1
-                        logger.info(f"Timesheet {local_id} synced successfully")
-
-                    # Mark failed logs with reason (individual record failures)
-                    for failed_log in logs_failed:
-                        local_id = failed_log.get('id')
-                        reason = failed_log.get('reason', 'Unknown error')
-                        error_code = failed_log.get('error_code', 0)
-
-                        friendly_msg = get_friendly_yahshua_error(error_code, reason)
-                        self.database.mark_timesheet_sync_failed(local_id, friendly_msg)
-                        stats['failed'] += 1
-                        logger.warning(f"Timesheet {local_id} failed (code {error_code}): {reason} -> {friendly_msg}")
-
-                    stats['batches_completed'] += 1
-                    logger.info(f"Batch {batch_num} completed: {len(logs_synced)} synced, {len(logs_failed)} failed")
-
-                else:
-                    # Batch-level failure (network error, timeout) - STOP immediately
-                    batch_error = result.get('error', 'Unknown error')
-                    logger.error(f"Batch {batch_num} failed: {batch_error} - stopping")
-
-                    # Mark all records in this batch as failed
-                    for log_entry in batch:
-                        self.database.mark_timesheet_sync_failed(
-                            log_entry['id'],
-                            batch_error
-                        )
-                        stats['failed'] += 1
-
-                    break  # Stop processing remaining batches
+            batch_error = None
+            max_in_flight = max_in_flight or self.get_max_in_flight()
+            in_flight = deque()  # (batch_num, batch, future) in send order
+            unsent = deque(all_log_entries)  # entries not yet on the wire, in send order
+            sent = 0  # batches sent so far
+
+            with ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix='push') as executor:
+                while in_flight or (batch_error is None and unsent):
+                    # Keep up to max_in_flight batches on the wire; stop sending after a failure
+                    while batch_error is None and unsent and len(in_flight) < max_in_flight:
+                        batch = [unsent.popleft() for _ in range(min(sizer.size, len(unsent)))]
+                        sent += 1
+                        # Remaining batches are estimated at the current size
+                        stats['batches_total'] = sent + math.ceil(len(unsent) / sizer.size)
+                        logger.info(f"Processing batch {sent}/{stats['batches_total']} ({len(batch)} records)")
+
+                        # Emit progress as each batch is sent
+                        if progress_callback:
+                            progress_callback({
+                                'batch_current': sent,
+                                'batch_total': stats['batches_total'],
+                                'batch_size': len(batch),
+                                'success': stats['success'],
+                                'failed': stats['failed']
+                            })
+
+                        in_flight.append((sent, batch, executor.submit(
+                            self._push_with_retry, token, batch, policy, hold, sizer
+                        )))
+
+                    # Apply results in send order, on this thread only
+                    batch_num, batch, future = in_flight.popleft()
+                    while True:
+                        try:
+                            success, result, attempts, sent_batch, resplit = future.result(
+                                timeout=PUSH_LEASE_RENEW_SECONDS
+                            )
+                            break
+                        except FutureTimeout:
+                            # Slow batch or long backoff: keep everything else claimed meanwhile
+                            self.database.renew_push_claims(owner, PUSH_LEASE_SECONDS)
+                    self.database.renew_push_claims(owner, PUSH_LEASE_SECONDS)
+                    if len(sent_batch) < len(batch):
+                        stats['lease_lost'] += len(batch) - len(sent_batch)
+                        logger.warning(f"Batch {batch_num}: {len(batch) - len(sent_batch)} record(s) were claimed "
+                                       f"by another push after this push's lease expired - not sending them")
+                        batch = sent_batch
+                        if not batch:
+                            continue
+                    stats['batches'].append([len(batch), attempts[-1][0]])
+                    stats['retries'] += len(attempts) - 1
+                    if resplit:
+                        # Too large for the server: send it again in pieces of the shrunk size
+                        logger.warning(f"Batch {batch_num} ({len(batch)} records) failed: {result.get('error')} "
+                                       f"- re-sending in batches of {sizer.size}")
+                        unsent.extendleft(reversed(batch))
+                        stats['batches_resplit'] += 1
+                        continue
+                    error = self._apply_batch_result(batch_num, batch, success, result, stats, timesheet_map)
+                    if not error:
+                        continue
+                    if len(attempts) >= policy.max_attempts and not policy.exhausted:
+                        # Out of attempts for this batch only; the outage may be over for the next
+                        stats['batches_exhausted'] += 1
+                        logger.warning(f"Batch {batch_num} failed after {len(attempts)} attempts - continuing")
+                    elif batch_error is None:
+                        batch_error = error
+                        if unsent or in_flight:
+                            logger.error(f"Batch {batch_num} failed - sending no further batches")
+
+            self._batch_size = sizer.size
+            stats['records_not_sent'] = len(unsent)
+            if not stats['records_not_sent']:
+                stats['batches_total'] = sent
 
             # Emit final progress (completed)
             if progress_callback:
@@ -356,12 +524,23 @@ class PushService:
 
             # Update sync log
             status = 'success' if batch_error is None and stats['failed'] == 0 else 'error'
+            latencies = [latency_ms for _, latency_ms in stats['batches']]
             self.database.update_sync_log(
                 log_id,
                 status=status,
                 records_processed=stats['processed'],
                 records_success=stats['success'],
-                records_failed=stats['failed']
+                records_failed=stats['failed'],
+                metadata={
+                    'batch_size_final': sizer.size,
+                    'latency_ms_avg': round(sum(latencies) / len(latencies), 1) if latencies else None,
+                    'latency_ms_max': max(latencies, default=None),
+                    'retries': stats['retries'],
+                    'batches_exhausted': stats['batches_exhausted'],
+                    'batches_resplit': stats['batches_resplit'],
+                    'lease_lost': stats['lease_lost'],
+                    'batches': stats['batches']
+                }
             )
 
             # Build message
@@ -369,8 +548,12 @@ class PushService:
                 message = f"Push failed: {batch_error}"
                 if stats['success'] > 0:
                     message += f" ({stats['success']} synced before error, {stats['failed']} failed)"
+                if stats['records_not_sent']:
+                    message += f" - {stats['records_not_sent']} record(s) left for the next push"
             elif stats['failed'] > 0:
                 message = f"Push completed with errors: {stats['success']} synced, {stats['failed']} failed"
+                if stats['rejected']:
+                    message += f" ({stats['rejected']} rejected, will not be retried)"
             else:
                 message = f"Push completed: {stats['success']} records synced successfully"
 
@@ -385,6 +568,146 @@ class PushService:
             )
             return False, error_msg, stats
 
+        finally:
+            try:
+                self.database.release_push_claims(owner)
+            except Exception as e:
+                logger.warning(f"Could not release push claims (they expire on their own): {e}")
+
+    def _apply_batch_result(self, batch_num, batch, success, result, stats, timesheets=None):
+        """Record one batch's push result in the database and stats
+
+        Returns:
+            str or None: The batch-level error, if the whole batch failed
+        """
+        if success:
+            # Process results for this batch
+            logs_synced = result.get('logs_successfully_sync', [])
+            logs_failed = result.get('logs_not_sync', [])
+
+            synced = [(local_id, local_id) for local_id in logs_synced]
+
+            # Mark failed logs with reason (individual record failures) and schedule any retry
+            failures = []
+            now = datetime.now()
+            for failed_log in logs_failed:
+                local_id = failed_log.get('id')
+                reason = failed_log.get('reason', 'Unknown error')
+                error_code = failed_log.get('error_code', 0)
+
+                retry_class = get_retry_class(error_code)
+                if retry_class == 'synced':
+                    # Keep Payroll's id for the record when the response names it
+                    synced.append((local_id, failed_log.get('timesheet_id') or local_id))
+                    logger.info(f"Timesheet {local_id} already in Payroll (code {error_code}) - marking synced")
+                    continue
+
+                friendly_msg = get_friendly_yahshua_error(error_code, reason)
+                attempts = ((timesheets or {}).get(local_id, {}).get('sync_attempts') or 0) + 1
+                next_attempt_at, rejected = schedule_retry(retry_class, attempts, now)
+                failures.append((local_id, friendly_msg, next_attempt_at, rejected))
+                stats['rejected'] += rejected
+                logger.warning(f"Timesheet {local_id} failed (code {error_code}): {reason} -> {friendly_msg}"
+                               f"{' - not retrying' if rejected else ''}")
+            self.database.mark_timesheets_sync_failed(failures)
+            stats['failed'] += len(failures)
+
+            # Mark successful logs
+            self.database.mark_timesheets_synced(synced)
+            stats['success'] += len(synced)
+            logger.info(f"Timesheets synced successfully: {[local_id for local_id, _ in synced]}")
+
+            stats['batches_completed'] += 1
+            logger.info(f"Batch {batch_num} completed: {len(synced)} synced, {len(failures)} failed")
+            return None
+
+        # Batch-level failure (network error, timeout)
+        batch_error = result.get('error', 'Unknown error')
+        logger.error(f"Batch {batch_num} failed: {batch_error}")
+
+        # Mark all records in this batch as failed; Payroll never judged the
+        # records themselves, so this does not move them toward rejection
+        self.database.mark_timesheets_sync_failed(
+            ((log_entry['id'], batch_error) for log_entry in batch), count_attempt=False
+        )
+        stats['failed'] += len(batch)
+        return batch_error
+
+    def _should_resplit(self, batch, result, sizer):
+        """Whether a failed batch should be re-sent in smaller batches this cycle
+
+        Only a 413 or a timeout says the batch itself was too large, and only
+        a batch bigger than the (already shrunk) size can be cut smaller.
+        """
+        too_large = result.get('status_code') == 413 or result.get('error_type') == 'timeout'
+        return too_large and len(batch) > sizer.size
+
+    def _timed_push_batch(self, token, log_list):
+        """push_batch() plus its wall time in ms"""
+        started = time.perf_counter()
+        success, result = self.push_batch(token, log_list)
+        return success, result, round((time.perf_counter() - started) * 1000, 1)
+
+    def _push_with_retry(self, token, log_list, policy, hold=None, sizer=None):
+        """Push one batch, retrying transient failures as the policy allows
+
+        Args:
+            hold: Optional function called with the entries before every
+                  attempt; it renews their push lease and returns the ids
+                  still leased to this push. The others are not sent.
+            sizer: Optional AdaptiveBatchSizer given every response. Once it
+                   has shrunk below the batch after a 413 or timeout, the
+                   batch is not retried at this size.
+
+        Returns:
+            tuple: (success, result, attempts, sent, resplit) with attempts a
+                   list of (latency_ms, success, result) per try (latency_ms
+                   is None when nothing was left to send), sent the entries
+                   of the last attempt and resplit whether they should be
+                   re-sent in smaller batches
+        """
+        timings = []
+        sent = list(log_list)
+        resplit = False
+
+        def send():
+            nonlocal sent
+            if hold is not None:
+                held = hold(sent)
+                sent = [entry for entry in sent if entry['id'] in held]
+            if not sent:
+                timings.append(None)
+                return True, {'logs_successfully_sync': [], 'logs_not_sync': []}
+            success, result, latency_ms = self._timed_push_batch(token, sent)
+            timings.append(latency_ms)
+            if sizer is not None:
+                sizer.record(latency_ms, success, result.get('status_code'), result.get('error_type'))
+            if not success:
+                logger.warning(f"Push attempt {len(timings)} failed: {result.get('error')}")
+            return success, result
+
+        def give_up(result):
+            nonlocal resplit
+            resplit = sizer is not None and self._should_resplit(sent, result, sizer)
+            return resplit
+
+        success, result, attempts = policy.call(send, give_up)
+        return success, result, [
+            (latency_ms, attempt_success, attempt_result)
+            for latency_ms, (attempt_success, attempt_result) in zip(timings, attempts)
+        ], sent, resplit
+
+    def _refresh_token(self, expired_token):
+        """Re-authenticate after a 401, once for all batches that sent expired_token"""
+        with self._auth_lock:
+            stale, fresh = self._token_refresh
+            if stale == expired_token and fresh:
+                return fresh
+            self.database.update_push_token(None)
+            fresh = self.authenticate()['token']
+            self._token_refresh = (expired_token, fresh)
+            return fresh
+
     def push_batch(self, token, log_list):
         """
         Push a batch of logs to YAHSHUA
@@ -423,7 +746,11 @@ class PushService:
                 timeout=60
             )
 
-            data = response.json()
+            try:
+                data = response.json()
+            except ValueError:
+                # Proxies and servers answer 413/5xx with HTML; the status code still matters
+                data = {}
             logger.info(f"YAHSHUA response: {json.dumps(data)}")
 
             if response.status_code == 200:
@@ -434,15 +761,13 @@ class PushService:
                 # Bad request - check for partial success
                 if data.get('logs_successfully_sync'):
                     return True, data
-                return False, {'error': data.get('message', 'Bad request')}
+                return False, {'error': data.get('message', 'Bad request'), 'status_code': 400}
 
             elif response.status_code == 401:
                 # Token expired, try to re-authenticate
                 logger.warning("Token expired, re-authenticating...")
-                self.database.update_push_token(None)
-                auth_result = self.authenticate()
                 # Retry once with new token
-                headers['Authorization'] = f'Token {auth_result["token"]}'
+                headers['Authorization'] = f'Token {self._refresh_token(token)}'
                 retry_response = self.session.post(
                     sync_url,
                     headers=headers,
@@ -453,17 +778,21 @@ class PushService:
                     return True, retry_response.json()
                 friendly = get_friendly_http_error(retry_response.status_code)
                 logger.error(f"Retry after re-auth failed: HTTP {retry_response.status_code}")
-                return False, {'error': f'Authentication failed after retry: {friendly}'}
+                return False, {'error': f'Authentication failed after retry: {friendly}',
+                               'status_code': retry_response.status_code}
 
             else:
                 friendly = get_friendly_http_error(response.status_code)
                 logger.error(f"Push batch failed: HTTP {response.status_code} - {response.text[:200]}")
-                return False, {'error': friendly}
+                return False, {'error': friendly, 'status_code': response.status_code,
+                               'retry_after': response.headers.get('Retry-After')}
 
         except requests.exceptions.Timeout:
-            return False, {'error': 'Request timed out - the payroll server took too long to respond'}
+            return False, {'error': 'Request timed out - the payroll server took too long to respond',
+                           'error_type': 'timeout'}
         except requests.exceptions.ConnectionError:
-            return False, {'error': 'Cannot connect to the payroll server - check your internet connection'}
+            return False, {'error': 'Cannot connect to the payroll server - check your internet connection',
+                           'error_type': 'connection'}
         except Exception as e:
             return False, {'error': str(e)}
 
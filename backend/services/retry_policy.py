@@ -0,0 +1,125 @@
+"""
+Biometric Integration - Push Retry Policy
+Exponential backoff with jitter, Retry-After and a per-cycle retry budget
+"""
+
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+# Attempts per batch, including the first
+MAX_ATTEMPTS = 4
+
+# Backoff before retry n (1-based) is a random delay up to BASE * 2^(n-1), capped
+BACKOFF_BASE_SECONDS = 2
+BACKOFF_MAX_SECONDS = 60
+
+# Retries allowed across all batches of one push cycle
+RETRY_BUDGET = 20
+
+# A Retry-After longer than this ends retrying for the cycle instead of waiting
+RETRY_AFTER_MAX_SECONDS = 300
+
+# HTTP statuses worth retrying; 429 and 503 may carry Retry-After
+RETRYABLE_STATUS_CODES = (408, 429, 500, 502, 503, 504)
+
+
+def is_retryable(result):
+    """Whether a failed push_batch result is likely transient"""
+    if result.get('error_type') in ('timeout', 'connection'):
+        return True
+    return result.get('status_code') in RETRYABLE_STATUS_CODES
+
+
+def parse_retry_after(value, now=None):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date), or None"""
+    if isinstance(value, (int, float)):
+        return max(0.0, float(value))
+    if not isinstance(value, str) or not value.strip():
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - (now or datetime.now(timezone.utc))).total_seconds())
+
+
+class RetryPolicy:
+    """Decides whether and when a failed push batch is retried
+
+    One policy is shared by all batches of a push cycle so the retry budget
+    caps the total extra requests (and waiting) an outage can cause. Safe to
+    use from the concurrent push workers.
+    """
+
+    def __init__(self, max_attempts=MAX_ATTEMPTS, budget=RETRY_BUDGET, base_delay=BACKOFF_BASE_SECONDS,
+                 max_delay=BACKOFF_MAX_SECONDS, sleep=time.sleep, rng=random.random):
+        self.max_attempts = max_attempts
+        self.budget = budget
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+        self.rng = rng
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    @property
+    def exhausted(self):
+        """Whether the cycle's retry budget is used up"""
+        with self._lock:
+            return self.retries >= self.budget
+
+    def backoff(self, attempt):
+        """Full-jitter delay before retrying after failed attempt number `attempt`"""
+        ceiling = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return self.rng() * ceiling
+
+    def next_delay(self, attempt, result):
+        """Seconds to wait before retrying, or None to give up on the batch
+
+        Consumes one retry from the budget when a retry is granted.
+        """
+        if attempt >= self.max_attempts or not is_retryable(result):
+            return None
+
+        delay = parse_retry_after(result.get('retry_after'))
+        if delay is None:
+            delay = self.backoff(attempt)
+        elif delay > RETRY_AFTER_MAX_SECONDS:
+            return None
+
+        with self._lock:
+            if self.retries >= self.budget:
+                return None
+            self.retries += 1
+        return delay
+
+    def call(self, send, give_up=None):
+        """Run send() until it succeeds or the policy gives up
+
+        Args:
+            send: Callable returning (success, result)
+            give_up: Optional callable given a failed result; returning True
+                     stops retrying without spending the budget
+
+        Returns:
+            tuple: (success, result, attempts) where attempts lists the
+                   (success, result) of every try in order
+        """
+        attempts = []
+        while True:
+            success, result = send()
+            attempts.append((success, result))
+            if success or (give_up is not None and give_up(result)):
+                return success, result, attempts
+            delay = self.next_delay(len(attempts), result)
+            if delay is None:
+                return success, result, attempts
+            self.sleep(delay)
@@ -14,6 +14,20 @@ logger = logging.getLogger(__name__)
 # Records older than this will be auto-deleted
 CLEANUP_DAYS = 60
 
+# How often to look for devices due a buffer rotation while in the maintenance window
+ROTATION_CHECK_MINUTES = 15
+
+# A device is rotated at most once per this many hours
+ROTATION_MIN_HOURS = 20
+
+
+def in_maintenance_window(now, start, end):
+    """Whether now's time of day falls in [start, end) - 'HH:MM' strings, may wrap midnight"""
+    current = now.strftime("%H:%M")
+    if start <= end:
+        return start <= current < end
+    return current >= start or current < end
+
 
 class SyncScheduler:
     """Scheduler for automated sync operations"""
@@ -77,6 +91,9 @@ class SyncScheduler:
             schedule.every().day.at("02:00").do(self.run_cleanup)
             logger.info(f"Cleanup scheduled daily at 02:00 AM (deletes records older than {CLEANUP_DAYS} days)")
 
+            # Device buffer rotation; the window is read from config on every check
+            schedule.every(ROTATION_CHECK_MINUTES).minutes.do(self.run_rotation)
+
         except Exception as e:
             logger.error(f"Error updating schedules: {e}")
 
@@ -145,6 +162,9 @@ class SyncScheduler:
             conn.commit()
             conn.close()
 
+            # Triggers keep the stats counters current; rebuild daily to correct any drift
+            self.database.reconcile_timesheet_stats()
+
             # Log the cleanup event
             message = f"Auto-cleanup: deleted {deleted_count} records older than {cutoff_date}"
             self.database.log_other_event(message)
@@ -159,6 +179,39 @@ class SyncScheduler:
             # Log the error
             self.database.log_other_event(f"Auto-cleanup failed: {str(e)}", status="error")
 
+    def run_rotation(self):
+        """Rotate the buffers of devices over their rotation threshold, inside the maintenance window"""
+        try:
+            config = self.database.get_api_config() or {}
+            start = config.get('rotation_window_start') or '03:00'
+            end = config.get('rotation_window_end') or '05:00'
+            if not in_maintenance_window(datetime.now(), start, end):
+                return
+
+            # A NULL setting (e.g. saved as null through updateApiConfig) keeps the safe default
+            require_pushed = config.get('rotation_require_pushed')
+            require_pushed = True if require_pushed is None else bool(require_pushed)
+            retain_since = datetime.now() - timedelta(days=CLEANUP_DAYS)
+            for device in self.database.get_enabled_devices():
+                if not device.get('rotation_threshold') or device['id'] in self.pull_service.live_device_ids:
+                    continue
+                if device.get('last_rotated_at'):
+                    last = datetime.fromisoformat(device['last_rotated_at'])
+                    if datetime.now() - last < timedelta(hours=ROTATION_MIN_HOURS):
+                        continue
+                if not in_maintenance_window(datetime.now(), start, end):
+                    logger.info("Maintenance window closed, remaining rotations wait for the next one")
+                    break
+
+                _, message, _ = self.pull_service.rotate_device(
+                    device['id'], min_records=device['rotation_threshold'],
+                    require_pushed=require_pushed, retain_since=retain_since
+                )
+                logger.info(f"Rotation of {device['name']}: {message}")
+
+        except Exception as e:
+            logger.error(f"Rotation error: {e}", exc_info=True)
+
     def trigger_cleanup_now(self):
         """Manually trigger cleanup immediately"""
         logger.info("Manual cleanup triggered")
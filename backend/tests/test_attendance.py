@@ -0,0 +1,91 @@
+"""
+Tests for services/attendance.py
+
+Run with:
+    cd backend && python -m pytest tests/test_attendance.py -v
+"""
+
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from types import SimpleNamespace
+from datetime import datetime
+from services.attendance import PunchRecord, to_epoch, transform_attendance
+
+START = datetime(2026, 3, 5)
+END = datetime(2026, 3, 6, 23, 59, 59)
+
+
+def make_log(user_id, timestamp, punch=0):
+    return SimpleNamespace(user_id=user_id, timestamp=timestamp, punch=punch)
+
+
+class TestTransformAttendance:
+    def test_builds_punch_records(self):
+        logs = [make_log(7, datetime(2026, 3, 6, 8, 5, 9), punch=1)]
+
+        records, counts = transform_attendance(logs, 3, START, END)
+
+        assert records == [PunchRecord(3, '7', to_epoch(datetime(2026, 3, 6, 8, 5, 9)), 'out')]
+        assert records[0].timesheet_entry(42) == {
+            'sync_id': 'ZK_3_7_20260306080509',
+            'employee_id': 42,
+            'log_type': 'out',
+            'date': '2026-03-06',
+            'time': '08:05:09',
+            'device_id': 3
+        }
+        assert records[0].sync_id == 'ZK_3_7_20260306080509'
+        assert counts['processed'] == 1
+
+    def test_punch_classification(self):
+        logs = [make_log(1, datetime(2026, 3, 6, 8, 0, punch), punch=punch) for punch in range(6)]
+        logs.append(make_log(1, datetime(2026, 3, 6, 9, 0, 0), punch=None))
+
+        records, _ = transform_attendance(logs, 1, START, END)
+
+        assert [r.punch_type for r in records] == ['in', 'out', 'out', 'in', 'in', 'out', 'in']
+
+    def test_range_and_watermark_counts(self):
+        logs = [
+            make_log(1, datetime(2026, 3, 5, 7, 0, 0)),   # position 10: below watermark
+            make_log(1, datetime(2026, 3, 7, 0, 0, 0)),   # position 11: after range
+            make_log(1, datetime(2026, 3, 4, 7, 0, 0)),   # position 12: past the old count, before range
+            make_log(1, datetime(2026, 3, 5, 6, 0, 0)),   # position 13: past the old count, in range
+        ]
+
+        records, counts = transform_attendance(
+            logs, 1, START, END, skip_count=12, watermark_at=datetime(2026, 3, 5, 8, 0, 0),
+            offset=10
+        )
+
+        assert [r.timestamp for r in records] == [datetime(2026, 3, 5, 6, 0, 0)]
+        assert counts == {'below_watermark': 1, 'filtered': 2, 'processed': 1, 'errors': 0}
+
+    def test_microseconds_are_dropped(self):
+        logs = [make_log(1, datetime(2026, 3, 6, 8, 0, 0, 250000))]
+
+        records, _ = transform_attendance(logs, 1, START, END)
+
+        entry = records[0].timesheet_entry(1)
+        assert entry['time'] == '08:00:00'
+        assert entry['sync_id'] == 'ZK_1_1_20260306080000'
+
+    def test_invalid_timestamp_counts_as_error(self):
+        logs = [make_log(1, None), make_log(2, datetime(2026, 3, 6, 8, 0, 0))]
+
+        records, counts = transform_attendance(logs, 1, START, END)
+
+        assert [r.user_code for r in records] == ['2']
+        assert counts['errors'] == 1
+
+
+def test_punch_record_has_no_instance_dict():
+    record = PunchRecord(1, '7', 0, 'in')
+
+    assert not hasattr(record, '__dict__')
+    with pytest.raises(AttributeError):
+        record.extra = 1
@@ -0,0 +1,65 @@
+"""
+Tests for services/batch_sizer.py
+
+Run with:
+    cd backend && python -m pytest tests/test_batch_sizer.py -v
+"""
+
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.batch_sizer import (
+    ERROR_WINDOW, GROW_STEP, TARGET_LATENCY_MS, AdaptiveBatchSizer, is_size_related
+)
+
+
+class TestAdaptiveBatchSizer:
+    def test_grows_on_fast_responses_up_to_the_ceiling(self):
+        sizer = AdaptiveBatchSizer(initial=50, floor=10, ceiling=90)
+
+        assert sizer.record(200, True) == 50 + GROW_STEP
+        assert sizer.record(200, True) == 90
+        assert sizer.record(200, True) == 90
+
+    @pytest.mark.parametrize('status_code, error_type', [(None, 'timeout'), (413, None), (502, None)])
+    def test_halves_on_size_related_failures(self, status_code, error_type):
+        sizer = AdaptiveBatchSizer(initial=100, floor=10, ceiling=200)
+
+        assert sizer.record(60000, False, status_code, error_type) == 50
+
+    def test_other_failures_keep_the_size(self):
+        sizer = AdaptiveBatchSizer(initial=100, floor=10, ceiling=200)
+
+        assert sizer.record(50, False, 401) == 100
+        assert sizer.record(50, False, error_type='connection') == 100
+
+    def test_slow_success_shrinks_but_not_below_the_floor(self):
+        sizer = AdaptiveBatchSizer(initial=12, floor=10, ceiling=200)
+
+        assert sizer.record(TARGET_LATENCY_MS + 1, True) == 10
+
+    def test_no_growth_while_error_rate_is_high(self):
+        sizer = AdaptiveBatchSizer(initial=50, floor=10, ceiling=200)
+        sizer.record(100, False, 401)
+        sizer.record(100, False, 401)
+
+        assert sizer.record(100, True) == 50
+
+        for _ in range(ERROR_WINDOW):
+            sizer.record(100, True)
+        assert sizer.size > 50
+
+    def test_initial_size_is_clamped(self):
+        assert AdaptiveBatchSizer(initial=500, floor=10, ceiling=200).size == 200
+        assert AdaptiveBatchSizer(initial=50, floor=80, ceiling=60).size == 80
+
+
+def test_size_related_failures():
+    assert is_size_related(error_type='timeout')
+    assert is_size_related(413)
+    assert is_size_related(503)
+    assert not is_size_related(400)
+    assert not is_size_related(error_type='connection')
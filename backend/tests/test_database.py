@@ -0,0 +1,781 @@
+"""
+Tests for database.py
+
+Run with:
+    cd backend && python -m pytest tests/test_database.py -v
+"""
+
+import pytest
+import sqlite3
+import sys
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from unittest.mock import MagicMock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database
+from migrations import LATEST_VERSION, MIGRATIONS
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+@pytest.fixture
+def db(tmp_path):
+    """Return a Database backed by a temporary SQLite file."""
+    database = Database(tmp_path / 'test.db')
+    yield database
+    database.close()
+
+
+# ---------------------------------------------------------------------------
+# Connection pool
+# ---------------------------------------------------------------------------
+
+class TestConnectionPool:
+    def test_closed_connection_is_reused(self, db):
+        """close() hands the connection back to the pool instead of closing it."""
+        conn = db.get_connection()
+        conn.close()
+
+        assert db.get_connection() is conn
+
+    def test_double_close_returns_the_connection_once(self, db):
+        """Closing a connection twice must not let two callers share it."""
+        conn = db.get_connection()
+        conn.close()
+        conn.close()
+
+        assert len(db.pool._idle) == 1
+        first = db.get_connection()
+        second = db.get_connection()
+        assert first is conn
+        assert second is not conn
+
+    def test_pooled_connection_still_works_after_close(self, db):
+        """A connection returned to the pool can run queries when handed out again."""
+        conn = db.get_connection()
+        conn.close()
+
+        conn = db.get_connection()
+        assert conn.execute("SELECT 1").fetchone()[0] == 1
+        conn.close()
+
+    def test_uncommitted_work_is_rolled_back_on_release(self, db):
+        """A transaction left open by a caller must not leak to the next user."""
+        conn = db.get_connection()
+        conn.execute("INSERT INTO company (name) VALUES ('Leaked')")
+        conn.close()
+
+        conn = db.get_connection()
+        count = conn.execute("SELECT COUNT(*) FROM company").fetchone()[0]
+        conn.close()
+        assert count == 0
+
+    def test_pool_never_holds_more_than_size_idle_connections(self, tmp_path):
+        """Connections beyond the pool size are closed on release."""
+        database = Database(tmp_path / 'test.db', pool_size=2)
+        conns = [database.get_connection() for _ in range(4)]
+        for conn in conns:
+            conn.close()
+
+        assert len(database.pool._idle) == 2
+        database.close()
+
+    def test_connections_are_shared_across_threads(self, db):
+        """A connection released by one thread can be used by another."""
+        conn = db.get_connection()
+        conn.close()
+
+        result = {}
+
+        def worker():
+            c = db.get_connection()
+            result['same'] = c is conn
+            result['value'] = c.execute("SELECT 1").fetchone()[0]
+            c.close()
+
+        t = threading.Thread(target=worker)
+        t.start()
+        t.join()
+
+        assert result == {'same': True, 'value': 1}
+
+    def test_get_connection_fails_after_shutdown(self, db):
+        """close() shuts the pool down for good."""
+        db.close()
+
+        with pytest.raises(sqlite3.ProgrammingError):
+            db.get_connection()
+
+
+# ---------------------------------------------------------------------------
+# Bulk timesheet ingest
+# ---------------------------------------------------------------------------
+
+def make_entries(employee_id, count, prefix='ZK_1_1_'):
+    return [{
+        'sync_id': f'{prefix}{i}', 'employee_id': employee_id, 'log_type': 'in',
+        'date': '2026-03-06', 'time': '08:00:00', 'device_id': None
+    } for i in range(count)]
+
+
+class TestAddTimesheetEntries:
+    def test_counts_new_and_duplicate_entries(self, db):
+        """Duplicate sync_ids are ignored and reported, not raised."""
+        db.add_or_update_employee('1', 'Alice', employee_code='1')
+        employee = db.get_employee_by_code('1')
+
+        first = db.add_timesheet_entries(make_entries(employee['id'], 3))
+        second = db.add_timesheet_entries(make_entries(employee['id'], 5))
+
+        assert (first['new_records'], first['duplicates']) == (3, 0)
+        assert (second['new_records'], second['duplicates']) == (2, 3)
+        assert db.get_timesheet_stats()['total'] == 5
+
+    def test_reports_counts_per_chunk(self, db):
+        """Each committed chunk reports its own new/duplicate counts."""
+        db.add_or_update_employee('1', 'Alice', employee_code='1')
+        employee = db.get_employee_by_code('1')
+        db.add_timesheet_entries(make_entries(employee['id'], 2))
+
+        result = db.add_timesheet_entries(make_entries(employee['id'], 5), chunk_size=2)
+
+        assert result['chunks'] == [
+            {'new_records': 0, 'duplicates': 2},
+            {'new_records': 2, 'duplicates': 0},
+            {'new_records': 1, 'duplicates': 0},
+        ]
+
+
+# ---------------------------------------------------------------------------
+# Employee lookup cache
+# ---------------------------------------------------------------------------
+
+class TestEmployeeCache:
+    def test_repeat_lookups_are_served_from_cache(self, db):
+        """Only the first lookup for a code reaches SQLite."""
+        db.add_or_update_employee('1', 'Alice', employee_code='1')
+
+        db.get_employee_by_code('1')
+        db.get_employee_by_code('1')
+
+        stats = db.employee_cache.stats()
+        assert (stats['hits'], stats['misses']) == (1, 1)
+
+    def test_upsert_invalidates_cached_employee(self, db):
+        """add_or_update_employee must not leave a stale row in the cache."""
+        db.add_or_update_employee('1', 'Alice', employee_code='1')
+        db.get_employee_by_code('1')
+
+        db.add_or_update_employee('1', 'Alice Smith', employee_code='1')
+
+        assert db.get_employee_by_code('1')['name'] == 'Alice Smith'
+
+    def test_code_change_invalidates_old_code(self, db):
+        """Changing an employee's code drops the entry cached under the old code."""
+        db.add_or_update_employee('1', 'Alice', employee_code='A1')
+        db.get_employee_by_code('A1')
+
+        db.add_or_update_employee('1', 'Alice', employee_code='B1')
+
+        assert db.get_employee_by_code('A1') is None
+        assert db.get_employee_by_code('B1')['name'] == 'Alice'
+
+    def test_warm_cache_loads_all_employees(self, db):
+        """warm_employee_cache fills the cache so lookups don't miss."""
+        for code in ('1', '2', '3'):
+            db.add_or_update_employee(code, f'User {code}', employee_code=code)
+
+        assert db.warm_employee_cache() == 3
+        for code in ('1', '2', '3'):
+            assert db.get_employee_by_code(code)['name'] == f'User {code}'
+        assert db.employee_cache.stats()['misses'] == 0
+
+    def test_cache_is_bounded(self, db):
+        """The least recently used entry is evicted once max_size is reached."""
+        db.employee_cache.max_size = 2
+        for code in ('1', '2', '3'):
+            db.add_or_update_employee(code, f'User {code}', employee_code=code)
+            db.get_employee_by_code(code)
+
+        assert db.employee_cache.stats()['size'] == 2
+        assert db.employee_cache.get('1') is None
+
+
+# ---------------------------------------------------------------------------
+# Bulk employee upsert
+# ---------------------------------------------------------------------------
+
+class TestUpsertEmployees:
+    def test_reports_inserted_updated_and_unchanged(self, db):
+        """Unchanged rows are skipped; new and modified rows are counted separately."""
+        db.upsert_employees([
+            {'backend_id': '1', 'name': 'Alice', 'employee_code': '1'},
+            {'backend_id': '2', 'name': 'Bob', 'employee_code': '2'},
+        ])
+
+        result = db.upsert_employees([
+            {'backend_id': '1', 'name': 'Alice', 'employee_code': '1'},
+            {'backend_id': '2', 'name': 'Robert', 'employee_code': '2'},
+            {'backend_id': '3', 'name': 'Carol', 'employee_code': '3'},
+        ])
+
+        assert result == {'inserted': 1, 'updated': 1, 'unchanged': 1}
+        assert db.get_employee_by_code('2')['name'] == 'Robert'
+        assert db.get_employee_by_code('3')['name'] == 'Carol'
+
+    def test_repeated_upsert_is_a_no_op(self, db):
+        """Re-sending the same device user list changes nothing."""
+        users = [{'backend_id': str(i), 'name': f'User {i}', 'employee_code': str(i)} for i in range(5)]
+        db.upsert_employees(users)
+
+        assert db.upsert_employees(users) == {'inserted': 0, 'updated': 0, 'unchanged': 5}
+
+    def test_upsert_invalidates_employee_cache(self, db):
+        """A changed name is visible through the cached lookup."""
+        db.upsert_employees([{'backend_id': '1', 'name': 'Alice', 'employee_code': '1'}])
+        db.get_employee_by_code('1')
+
+        db.upsert_employees([{'backend_id': '1', 'name': 'Alicia', 'employee_code': '1'}])
+
+        assert db.get_employee_by_code('1')['name'] == 'Alicia'
+
+    def test_concurrent_upserts_of_the_same_users_count_each_insert_once(self, db):
+        """Parallel pulls sending the same new users never report negative updates."""
+        users = [{'backend_id': str(i), 'name': f'User {i}', 'employee_code': str(i)} for i in range(200)]
+        results = []
+        start = threading.Barrier(4)
+        write_lock = db._write_lock
+
+        class SlowLock:
+            """Delays taking the write lock so every thread reaches it together"""
+            def __enter__(self):
+                time.sleep(0.05)
+                write_lock.acquire()
+
+            def __exit__(self, *exc):
+                write_lock.release()
+
+        db._write_lock = SlowLock()
+
+        def upsert():
+            start.wait(timeout=5)
+            results.append(db.upsert_employees(users))
+
+        threads = [threading.Thread(target=upsert) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert sum(r['inserted'] for r in results) == 200
+        assert all(r['updated'] == 0 for r in results)
+
+
+# ---------------------------------------------------------------------------
+# Bulk push result updates
+# ---------------------------------------------------------------------------
+
+class TestBulkSyncMarking:
+    def test_mark_many_synced_and_failed(self, db):
+        """One call per outcome updates every row in the batch response."""
+        db.add_or_update_employee('1', 'Alice', employee_code='1')
+        employee = db.get_employee_by_code('1')
+        db.add_timesheet_entries(make_entries(employee['id'], 4))
+        ids = [row['id'] for row in db.get_unsynced_timesheets()]
+
+        assert db.mark_timesheets_synced([(ids[0], 100), (ids[1], 101)]) == 2
+        assert db.mark_timesheets_sync_failed([(ids[2], 'Employee not found')]) == 1
+
+        stats = db.get_timesheet_stats()
+        assert (stats['synced'], stats['errors'], stats['pending']) == (2, 1, 1)
+        assert db.get_timesheet_by_sync_id('ZK_1_1_0')['backend_timesheet_id'] == 100
+
+
+# ---------------------------------------------------------------------------
+# Schema / indexes
+# ---------------------------------------------------------------------------
+
+class TestTimesheetIndexes:
+    def index_names(self, db):
+        conn = db.get_connection()
+        rows = conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'timesheet'").fetchall()
+        conn.close()
+        return {row['name'] for row in rows}
+
+    def test_unused_indexes_are_dropped(self, db):
+        names = self.index_names(db)
+        assert 'idx_timesheet_is_synced' not in names
+        assert 'idx_timesheet_sync_id' not in names
+        assert 'idx_timesheet_backend_id' not in names
+
+    def test_pending_queue_uses_partial_index(self, db):
+        """The push queue query is answered from idx_timesheet_pending without a sort."""
+        conn = db.get_connection()
+        plan = ' '.join(row['detail'] for row in conn.execute("""
+            EXPLAIN QUERY PLAN
+            SELECT t.id FROM timesheet t
+            WHERE t.backend_timesheet_id IS NULL AND t.status = 'success' AND t.sync_rejected = 0
+            AND (t.next_attempt_at IS NULL OR t.next_attempt_at <= ?)
+            ORDER BY t.created_at ASC LIMIT 100
+        """, (datetime.now(),)))
+        conn.close()
+
+        assert 'idx_timesheet_pending' in plan
+        assert 'TEMP B-TREE' not in plan
+
+
+class TestPushRetrySchedule:
+    def seed(self, db, count):
+        db.add_or_update_employee('1', 'Alice', employee_code='1')
+        employee = db.get_employee_by_code('1')
+        db.add_timesheet_entries(make_entries(employee['id'], count))
+        return [row['id'] for row in db.get_unsynced_timesheets()]
+
+    def test_queue_skips_rejected_and_delayed_rows(self, db):
+        first, second, third = self.seed(db, 3)
+        retry_at = datetime.now() + timedelta(hours=1)
+
+        db.mark_timesheets_sync_failed([
+            (first, 'Invalid date format', None, True),
+            (second, 'Employee not found in payroll system', retry_at, False),
+            (third, 'Payroll server error'),
+        ])
+
+        assert [row['id'] for row in db.get_unsynced_timesheets()] == [third]
+        due_later = db.get_unsynced_timesheets(now=retry_at + timedelta(seconds=1))
+        assert [row['id'] for row in due_later] == [second, third]
+
+    def test_each_failure_counts_an_attempt(self, db):
+        (timesheet_id,) = self.seed(db, 1)
+
+        db.mark_timesheets_sync_failed([(timesheet_id, 'Payroll server error')])
+        db.mark_timesheets_sync_failed([(timesheet_id, 'Payroll server error')])
+
+        row = db.get_unsynced_timesheets()[0]
+        assert row['sync_attempts'] == 2
+        assert row['sync_error_message'] == 'Payroll server error'
+
+    def test_batch_failures_do_not_count_attempts(self, db):
+        (timesheet_id,) = self.seed(db, 1)
+
+        db.mark_timesheets_sync_failed([(timesheet_id, 'Payroll server timed out')], count_attempt=False)
+
+        row = db.get_unsynced_timesheets()[0]
+        assert row['sync_attempts'] == 0
+        assert row['sync_error_message'] == 'Payroll server timed out'
+
+
+class TestPushOutbox:
+    def seed(self, db, count):
+        db.add_or_update_employee('1', 'Alice', employee_code='1')
+        employee = db.get_employee_by_code('1')
+        db.add_timesheet_entries(make_entries(employee['id'], count))
+        return [row['id'] for row in db.get_unsynced_timesheets()]
+
+    def outbox_ids(self, db):
+        conn = db.get_connection()
+        ids = [row[0] for row in conn.execute("SELECT timesheet_id FROM push_outbox ORDER BY timesheet_id")]
+        conn.close()
+        return ids
+
+    def test_claims_do_not_overlap(self, db):
+        ids = self.seed(db, 5)
+
+        first = [row['id'] for row in db.claim_push_batch('a', 3, 600)]
+        second = [row['id'] for row in db.claim_push_batch('b', 10, 600)]
+
+        assert first == ids[:3]
+        assert second == ids[3:]
+        assert db.claim_push_batch('c', 10, 600) == []
+
+    def test_concurrent_claimers_never_share_a_row(self, db):
+        self.seed(db, 200)
+        claimed = {}
+
+        def claim(owner):
+            claimed[owner] = [row['id'] for row in db.claim_push_batch(owner, 30, 600)]
+
+        threads = [threading.Thread(target=claim, args=(f'p{n}',)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        all_ids = [i for ids in claimed.values() for i in ids]
+        assert len(all_ids) == len(set(all_ids)) == 200
+
+    def test_expired_lease_can_be_claimed_again(self, db):
+        ids = self.seed(db, 2)
+        now = datetime.now()
+        db.claim_push_batch('crashed', 10, 60, now=now)
+
+        assert db.claim_push_batch('next', 10, 60, now=now + timedelta(seconds=30)) == []
+        reclaimed = db.claim_push_batch('next', 10, 60, now=now + timedelta(seconds=61))
+        assert [row['id'] for row in reclaimed] == ids
+
+    def test_renewed_lease_is_not_reclaimed(self, db):
+        self.seed(db, 1)
+        now = datetime.now()
+        db.claim_push_batch('a', 10, 60, now=now)
+
+        assert db.renew_push_claims('a', 60, now=now + timedelta(seconds=50)) == 1
+        assert db.claim_push_batch('b', 10, 60, now=now + timedelta(seconds=70)) == []
+
+    def test_hold_renews_only_rows_still_owned(self, db):
+        ids = self.seed(db, 3)
+        now = datetime.now()
+        db.claim_push_batch('a', 10, 60, now=now)
+        later = now + timedelta(seconds=61)
+        taken = db.claim_push_batch('b', 1, 60, now=later)
+
+        held = db.hold_push_claims('a', ids, 60, now=later)
+
+        assert [row['id'] for row in taken] == ids[:1]
+        assert held == set(ids[1:])
+        assert db.claim_push_batch('c', 10, 60, now=later + timedelta(seconds=30)) == []
+
+    def test_release_returns_rows_to_the_queue(self, db):
+        ids = self.seed(db, 2)
+        db.claim_push_batch('a', 10, 600)
+
+        assert db.release_push_claims('a') == 2
+        assert [row['id'] for row in db.claim_push_batch('b', 10, 600)] == ids
+
+    def test_synced_and_rejected_rows_leave_the_outbox(self, db):
+        synced, rejected, failed, deleted = self.seed(db, 4)
+        db.claim_push_batch('a', 10, 600)
+
+        db.mark_timesheets_synced([(synced, 900)])
+        db.mark_timesheets_sync_failed([
+            (rejected, 'Invalid date format', None, True),
+            (failed, 'Payroll server error'),
+        ])
+        conn = db.get_connection()
+        conn.execute("DELETE FROM timesheet WHERE id = ?", (deleted,))
+        conn.commit()
+        conn.close()
+
+        assert self.outbox_ids(db) == [failed]
+
+    def test_retried_rejection_is_queued_again(self, db):
+        (timesheet_id,) = self.seed(db, 1)
+        db.mark_timesheets_sync_failed([(timesheet_id, 'Invalid date format', None, True)])
+
+        conn = db.get_connection()
+        conn.execute("UPDATE timesheet SET sync_rejected = 0 WHERE id = ?", (timesheet_id,))
+        conn.commit()
+        conn.close()
+
+        assert self.outbox_ids(db) == [timesheet_id]
+
+    def test_delayed_rows_are_not_claimed_until_due(self, db):
+        first, second = self.seed(db, 2)
+        retry_at = datetime.now() + timedelta(hours=1)
+        db.mark_timesheets_sync_failed([(first, 'Employee not found in payroll system', retry_at, False)])
+
+        assert [row['id'] for row in db.claim_push_batch('a', 10, 7200)] == [second]
+        due = db.claim_push_batch('b', 10, 600, now=retry_at + timedelta(seconds=1))
+        assert [row['id'] for row in due] == [first]
+
+
+# ---------------------------------------------------------------------------
+# Keyset pagination
+# ---------------------------------------------------------------------------
+
+class TestTimesheetsPage:
+    def seed(self, db, count):
+        db.add_or_update_employee('1', 'Alice', employee_code='1')
+        employee = db.get_employee_by_code('1')
+        # Several rows share a timestamp so the id tie-breaker matters
+        db.add_timesheet_entries({
+            'sync_id': f'ZK_1_1_{i}', 'employee_id': employee['id'], 'log_type': 'in',
+            'date': f'2026-03-{1 + i // 6:02d}', 'time': f'08:{(i // 2) % 3:02d}:00'
+        } for i in range(count))
+
+    def test_pages_cover_every_row_once_in_order(self, db):
+        self.seed(db, 25)
+
+        seen = []
+        cursor = None
+        while True:
+            page = db.get_timesheets_page(limit=7, cursor=cursor)
+            seen.extend(page['data'])
+            cursor = page['next_cursor']
+            if cursor is None:
+                break
+
+        expected = db.get_all_timesheets(limit=100)
+        assert [row['id'] for row in seen] == [row['id'] for row in expected]
+        assert len(seen) == 25
+
+    def test_last_page_has_no_cursor(self, db):
+        self.seed(db, 3)
+
+        page = db.get_timesheets_page(limit=3)
+
+        assert len(page['data']) == 3
+        assert page['next_cursor'] is None
+
+    def test_invalid_cursor_raises_value_error(self, db):
+        with pytest.raises(ValueError, match="Invalid pagination cursor"):
+            db.get_timesheets_page(cursor='not-a-cursor')
+
+    def test_next_page_seeks_through_index(self, db):
+        """Later pages start from an index seek instead of skipping rows."""
+        conn = db.get_connection()
+        plan = ' '.join(row['detail'] for row in conn.execute("""
+            EXPLAIN QUERY PLAN
+            SELECT t.id FROM timesheet t
+            WHERE (t.date, t.time, t.id) < (?, ?, ?)
+            ORDER BY t.date DESC, t.time DESC, t.id DESC LIMIT 50
+        """, ('2026-03-01', '08:00:00', 10)))
+        conn.close()
+
+        assert plan.startswith('SEARCH t')
+        assert 'idx_timesheet_date_time_id' in plan
+        assert 'TEMP B-TREE' not in plan
+
+
+# ---------------------------------------------------------------------------
+# Timesheet stats counters
+# ---------------------------------------------------------------------------
+
+def full_scan_stats(db):
+    """The old aggregate query, used as the source of truth."""
+    conn = db.get_connection()
+    row = conn.execute("""
+        SELECT
+            COUNT(*) as total,
+            IFNULL(SUM(CASE WHEN backend_timesheet_id IS NOT NULL THEN 1 ELSE 0 END), 0) as synced,
+            IFNULL(SUM(CASE WHEN backend_timesheet_id IS NULL AND sync_error_message IS NULL THEN 1 ELSE 0 END), 0) as pending,
+            IFNULL(SUM(CASE WHEN sync_error_message IS NOT NULL THEN 1 ELSE 0 END), 0) as errors
+        FROM timesheet
+    """).fetchone()
+    conn.close()
+    return dict(row)
+
+
+class TestTimesheetStatsCounters:
+    def test_counters_follow_inserts_updates_and_deletes(self, db):
+        device_id = db.add_device('Front door', '10.0.0.1')
+        db.add_or_update_employee('1', 'Alice', employee_code='1')
+        employee = db.get_employee_by_code('1')
+        entries = make_entries(employee['id'], 6)
+        for entry in entries[:4]:
+            entry['device_id'] = device_id
+        db.add_timesheet_entries(entries)
+        ids = [row['id'] for row in db.get_unsynced_timesheets()]
+
+        db.mark_timesheets_synced([(ids[0], 1), (ids[1], 2)])
+        db.mark_timesheets_sync_failed([(ids[2], 'Employee not found')])
+        conn = db.get_connection()
+        conn.execute("DELETE FROM timesheet WHERE id = ?", (ids[5],))
+        conn.commit()
+        conn.close()
+
+        assert db.get_timesheet_stats() == full_scan_stats(db) == {
+            'total': 5, 'synced': 2, 'pending': 2, 'errors': 1
+        }
+        by_device = {row['device_id']: row for row in db.get_timesheet_stats_by_device()}
+        assert by_device[device_id]['total'] == 4
+        assert by_device[device_id]['device_name'] == 'Front door'
+        assert by_device[None]['total'] == 1
+
+    def test_empty_database_reports_zeros(self, db):
+        assert db.get_timesheet_stats() == {'total': 0, 'synced': 0, 'pending': 0, 'errors': 0}
+
+    def test_reconcile_repairs_drift(self, db):
+        db.add_or_update_employee('1', 'Alice', employee_code='1')
+        db.add_timesheet_entries(make_entries(db.get_employee_by_code('1')['id'], 3))
+        conn = db.get_connection()
+        conn.execute("UPDATE timesheet_stats SET total = 99")
+        conn.commit()
+        conn.close()
+
+        db.reconcile_timesheet_stats()
+
+        assert db.get_timesheet_stats() == full_scan_stats(db)
+
+    def test_existing_database_is_backfilled(self, tmp_path):
+        """Opening a database created before the counters existed fills them in."""
+        path = tmp_path / 'legacy.db'
+        database = Database(path)
+        database.add_or_update_employee('1', 'Alice', employee_code='1')
+        database.add_timesheet_entries(make_entries(database.get_employee_by_code('1')['id'], 3))
+        conn = database.get_connection()
+        for trigger in ('insert', 'delete', 'update'):
+            conn.execute(f"DROP TRIGGER trg_timesheet_stats_{trigger}")
+        conn.execute("DROP TABLE timesheet_stats")
+        conn.execute("PRAGMA user_version = 2")
+        conn.commit()
+        conn.close()
+        database.close()
+
+        reopened = Database(path)
+        assert reopened.get_timesheet_stats()['total'] == 3
+        reopened.close()
+
+
+# ---------------------------------------------------------------------------
+# Device pull watermark
+# ---------------------------------------------------------------------------
+
+class TestDeviceWatermark:
+    def test_watermark_round_trips_through_get_device(self, db):
+        device_id = db.add_device('Front door', '10.0.0.1')
+        assert db.get_device(device_id)['last_record_at'] is None
+
+        db.update_device_watermark(device_id, datetime(2026, 3, 6, 8, 30, 0), 120)
+
+        device = db.get_device(device_id)
+        assert datetime.fromisoformat(device['last_record_at']) == datetime(2026, 3, 6, 8, 30, 0)
+        assert device['last_record_count'] == 120
+
+    def test_watermark_can_be_reset(self, db):
+        device_id = db.add_device('Front door', '10.0.0.1')
+        db.update_device_watermark(device_id, datetime(2026, 3, 6, 8, 30, 0), 120)
+
+        db.update_device_watermark(device_id, None, 0)
+
+        assert db.get_device(device_id)['last_record_at'] is None
+
+
+class TestPullCheckpoint:
+    def test_checkpoint_round_trips_and_clears(self, db):
+        device_id = db.add_device('Front door', '10.0.0.1')
+
+        db.update_pull_checkpoint(device_id, 500, datetime(2026, 3, 6, 8, 30, 0), '2026-03-01|2026-03-06')
+        device = db.get_device(device_id)
+        assert device['checkpoint_position'] == 500
+        assert datetime.fromisoformat(device['checkpoint_at']) == datetime(2026, 3, 6, 8, 30, 0)
+        assert device['checkpoint_range'] == '2026-03-01|2026-03-06'
+
+        db.update_pull_checkpoint(device_id, None)
+        device = db.get_device(device_id)
+        assert (device['checkpoint_position'], device['checkpoint_at'], device['checkpoint_range']) == (None, None, None)
+
+    def test_interrupted_sync_logs_are_closed(self, db):
+        finished = db.create_sync_log('pull')
+        db.update_sync_log(finished, status='success')
+        db.create_sync_log('pull')
+        db.create_sync_log('push')
+
+        assert db.close_interrupted_sync_logs() == 2
+
+        logs = db.get_recent_sync_logs()
+        assert {log['status'] for log in logs} == {'success', 'error'}
+        assert all(log['completed_at'] for log in logs)
+        assert db.close_interrupted_sync_logs() == 0
+
+
+class TestBufferRotation:
+    def test_confirmed_sync_ids_optionally_require_push(self, db):
+        db.add_or_update_employee('1', 'Alice', employee_code='1')
+        employee = db.get_employee_by_code('1')
+        db.add_timesheet_entries(make_entries(employee['id'], 3))
+        pushed = db.get_timesheet_by_sync_id('ZK_1_1_0')
+        db.mark_timesheets_synced([(pushed['id'], 99)])
+
+        wanted = ['ZK_1_1_0', 'ZK_1_1_1', 'ZK_1_1_2', 'ZK_1_1_missing']
+        assert db.get_confirmed_sync_ids(wanted) == {'ZK_1_1_0', 'ZK_1_1_1', 'ZK_1_1_2'}
+        assert db.get_confirmed_sync_ids(wanted, pushed_only=True) == {'ZK_1_1_0'}
+
+    def test_rejected_rows_count_as_settled(self, db):
+        """A row Payroll rejected for good will never be pushed, so it must not block rotation."""
+        db.add_or_update_employee('1', 'Alice', employee_code='1')
+        employee = db.get_employee_by_code('1')
+        db.add_timesheet_entries(make_entries(employee['id'], 2))
+        rejected = db.get_timesheet_by_sync_id('ZK_1_1_0')
+        db.mark_timesheets_sync_failed([(rejected['id'], 'Invalid date format', None, True)])
+
+        assert db.get_confirmed_sync_ids(['ZK_1_1_0', 'ZK_1_1_1'], pushed_only=True) == {'ZK_1_1_0'}
+
+    def test_rotation_resets_pull_state(self, db):
+        device_id = db.add_device('Front door', '10.0.0.1')
+        db.update_device_watermark(device_id, datetime(2026, 3, 6, 8, 30, 0), 120)
+        db.update_device_fingerprint(device_id, '120:5')
+        db.update_pull_checkpoint(device_id, 60, datetime(2026, 3, 6, 8, 0, 0))
+
+        db.record_device_rotation(device_id)
+
+        device = db.get_device(device_id)
+        assert device['last_rotated_at'] is not None
+        assert (device['last_record_at'], device['last_record_count']) == (None, 0)
+        assert device['state_fingerprint'] is None
+        assert device['checkpoint_position'] is None
+
+
+# ---------------------------------------------------------------------------
+# Schema migrations
+# ---------------------------------------------------------------------------
+
+def schema_version(database):
+    conn = database.get_connection()
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    conn.close()
+    return version
+
+
+class TestMigrations:
+    def test_new_database_is_at_latest_version(self, db):
+        assert schema_version(db) == LATEST_VERSION
+
+    def test_current_schema_skips_all_migrations(self, tmp_path, mocker):
+        """Opening an up-to-date database runs no migration code at all."""
+        Database(tmp_path / 'test.db').close()
+        spies = [MagicMock() for _ in MIGRATIONS]
+        mocker.patch('migrations.MIGRATIONS', [(v, d, spy) for (v, d, _), spy in zip(MIGRATIONS, spies)])
+
+        Database(tmp_path / 'test.db').close()
+
+        for spy in spies:
+            spy.assert_not_called()
+
+    def test_unversioned_legacy_database_is_upgraded(self, tmp_path):
+        """A pre-versioning database keeps its data and gains the new schema."""
+        path = tmp_path / 'legacy.db'
+        conn = sqlite3.connect(path)
+        conn.executescript("""
+            CREATE TABLE employee (id INTEGER PRIMARY KEY AUTOINCREMENT, backend_id INTEGER UNIQUE,
+                name TEXT NOT NULL, employee_code TEXT, employee_number INTEGER,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP, deleted_at DATETIME);
+            CREATE TABLE timesheet (id INTEGER PRIMARY KEY AUTOINCREMENT, sync_id TEXT UNIQUE NOT NULL,
+                employee_id INTEGER NOT NULL, log_type TEXT NOT NULL, date TEXT NOT NULL, time TEXT NOT NULL,
+                photo_path TEXT, is_synced BOOLEAN DEFAULT 0, status TEXT DEFAULT 'success',
+                error_message TEXT, created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                backend_timesheet_id INTEGER, synced_at DATETIME, sync_error_message TEXT);
+            CREATE INDEX idx_timesheet_is_synced ON timesheet(is_synced);
+            CREATE TABLE sync_logs (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                sync_type TEXT NOT NULL CHECK(sync_type IN ('pull', 'push', 'config')),
+                status TEXT NOT NULL CHECK(status IN ('started', 'success', 'error')),
+                records_processed INTEGER DEFAULT 0, records_success INTEGER DEFAULT 0,
+                records_failed INTEGER DEFAULT 0, error_message TEXT, started_at DATETIME NOT NULL,
+                completed_at DATETIME, metadata TEXT);
+            CREATE INDEX idx_sync_logs_type ON sync_logs(sync_type);
+            CREATE TABLE api_config (id INTEGER PRIMARY KEY CHECK (id = 1), device_ip TEXT,
+                device_port INTEGER DEFAULT 4370, push_url TEXT,
+                pull_interval_minutes INTEGER DEFAULT 30, push_interval_minutes INTEGER DEFAULT 15);
+            INSERT INTO api_config (id, device_ip) VALUES (1, '192.168.1.201');
+            INSERT INTO employee (backend_id, name, employee_code) VALUES (1, 'Alice', '1');
+            INSERT INTO timesheet (sync_id, employee_id, log_type, date, time) VALUES ('ZK_1', 1, 'in', '2026-03-06', '08:00:00');
+            INSERT INTO sync_logs (sync_type, status, started_at) VALUES ('pull', 'success', '2026-03-06');
+        """)
+        conn.close()
+
+        database = Database(path)
+
+        assert schema_version(database) == LATEST_VERSION
+        assert database.get_timesheet_stats()['total'] == 1
+        assert [row['sync_id'] for row in database.claim_push_batch('test', 10, 600)] == ['ZK_1']
+        assert [d['ip'] for d in database.get_devices()] == ['192.168.1.201']
+        assert database.get_timesheet_by_sync_id('ZK_1')['device_id'] == database.get_devices()[0]['id']
+        database.log_other_event("sync_logs now accepts 'other'")
+        assert len(database.get_recent_sync_logs()) == 2
+        database.close()
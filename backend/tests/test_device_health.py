@@ -0,0 +1,151 @@
+"""
+Tests for services/device_health.py and its use in PullService.connect
+
+Run with:
+    cd backend && python -m pytest tests/test_device_health.py -v
+"""
+
+import pytest
+import sys
+import os
+import socket
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from unittest.mock import MagicMock
+from datetime import datetime
+from services.device_health import (
+    CONNECT_TIMEOUT_MAX, CONNECT_TIMEOUT_MIN, DEVICE_IO_TIMEOUT, FAILURE_THRESHOLD,
+    circuit_open_until, connect_timeout, health_after_failure, health_after_success,
+    probe_device, probe_devices
+)
+from services.pull_service import PullService
+
+NOW = datetime(2026, 3, 6, 8, 0, 0)
+
+
+class TestConnectTimeout:
+    def test_unknown_latency_uses_full_timeout(self):
+        assert connect_timeout({'connect_latency_ms': None}) == CONNECT_TIMEOUT_MAX
+
+    def test_fast_device_gets_minimum_timeout(self):
+        assert connect_timeout({'connect_latency_ms': 120}) == CONNECT_TIMEOUT_MIN
+
+    def test_slow_device_timeout_scales_with_latency(self):
+        assert connect_timeout({'connect_latency_ms': 2000}) == 10
+
+    def test_latency_is_a_moving_average(self):
+        health = health_after_success({'connect_latency_ms': 100}, 1100)
+        assert health['connect_latency_ms'] == 400.0
+
+
+class TestCircuitBreaker:
+    def test_circuit_opens_after_threshold_and_backs_off(self):
+        device = {'consecutive_failures': 0}
+        opened = []
+        for _ in range(FAILURE_THRESHOLD + 2):
+            device = health_after_failure(device, now=NOW)
+            opened.append(device['circuit_open_until'])
+
+        assert opened[:FAILURE_THRESHOLD - 1] == [None] * (FAILURE_THRESHOLD - 1)
+        assert opened[FAILURE_THRESHOLD - 1:] == [
+            '2026-03-06 08:05:00', '2026-03-06 08:10:00', '2026-03-06 08:20:00'
+        ]
+
+    def test_half_open_after_period_passes(self):
+        device = {'circuit_open_until': '2026-03-06 08:05:00'}
+
+        assert circuit_open_until(device, now=NOW) == datetime(2026, 3, 6, 8, 5, 0)
+        assert circuit_open_until(device, now=datetime(2026, 3, 6, 8, 6, 0)) is None
+
+    def test_success_closes_circuit(self):
+        health = health_after_success({'consecutive_failures': 5, 'circuit_open_until': '2026-03-06 09:00:00'}, 300)
+
+        assert health['consecutive_failures'] == 0
+        assert health['circuit_open_until'] is None
+
+
+class TestPullServiceHealth:
+    def make_service(self, device):
+        db = MagicMock()
+        db.get_device.return_value = device
+        return PullService(db)
+
+    def test_connect_uses_adaptive_timeout_and_records_success(self, mocker):
+        svc = self.make_service({'id': 1, 'ip': '10.0.0.1', 'port': 4370, 'connect_latency_ms': 200})
+        zk = mocker.patch('services.pull_service.ZK')
+
+        svc.connect(1)
+
+        assert zk.call_args.kwargs['timeout'] == CONNECT_TIMEOUT_MIN
+        health = svc.database.update_device_health.call_args.kwargs
+        assert health['consecutive_failures'] == 0
+
+    def test_reads_after_connect_use_the_io_timeout(self, mocker):
+        """Only the connect is tightened; downloads get the full I/O timeout."""
+        svc = self.make_service({'id': 1, 'ip': '10.0.0.1', 'port': 4370, 'connect_latency_ms': 200})
+        zk = mocker.patch('services.pull_service.ZK')
+        sock = zk.return_value._ZK__sock
+
+        svc.connect(1)
+
+        assert zk.call_args.kwargs['timeout'] == CONNECT_TIMEOUT_MIN
+        sock.settimeout.assert_called_once_with(DEVICE_IO_TIMEOUT)
+        assert zk.return_value._ZK__timeout == DEVICE_IO_TIMEOUT
+
+    def test_connect_failure_is_recorded(self, mocker):
+        svc = self.make_service({'id': 1, 'ip': '10.0.0.1', 'port': 4370, 'consecutive_failures': 2})
+        zk = mocker.patch('services.pull_service.ZK')
+        zk.return_value.connect.side_effect = Exception("timed out")
+
+        with pytest.raises(Exception, match="timed out"):
+            svc.connect(1)
+
+        health = svc.database.update_device_health.call_args.kwargs
+        assert health['consecutive_failures'] == 3
+        assert health['circuit_open_until'] is not None
+
+    def test_multi_device_pull_skips_open_circuits(self, mocker):
+        svc = self.make_service(None)
+        svc.database.get_enabled_devices.return_value = [
+            {'id': 1, 'name': 'A', 'circuit_open_until': '2999-01-01 00:00:00'},
+            {'id': 2, 'name': 'B', 'circuit_open_until': None},
+        ]
+        probe = mocker.patch('services.pull_service.probe_devices', return_value={2: (True, 1.0)})
+        pull = mocker.patch.object(svc, '_pull_from_device', return_value=(True, "ok", {}))
+
+        _, _, stats = svc.pull_data(max_workers=1)
+
+        assert [d['id'] for d in probe.call_args.args[0]] == [2]
+        assert [c.args[0] for c in pull.call_args_list] == [2]
+        assert stats['devices_failed'] == 1
+        assert stats['devices_synced'] == 1
+
+
+class TestProbe:
+    def test_open_port_is_reachable(self):
+        server = socket.socket()
+        server.bind(('127.0.0.1', 0))
+        server.listen(1)
+        try:
+            ok, latency_ms = probe_device('127.0.0.1', server.getsockname()[1], timeout=1)
+        finally:
+            server.close()
+
+        assert ok is True
+        assert latency_ms >= 0
+
+    def test_closed_port_is_unreachable(self):
+        server = socket.socket()
+        server.bind(('127.0.0.1', 0))
+        port = server.getsockname()[1]
+        server.close()
+
+        assert probe_device('127.0.0.1', port, timeout=1) == (False, None)
+
+    def test_probe_devices_keys_results_by_device(self, mocker):
+        mocker.patch('services.device_health.probe_device', side_effect=lambda ip, port, timeout: (ip == 'a', None))
+
+        results = probe_devices([{'id': 1, 'ip': 'a', 'port': 4370}, {'id': 2, 'ip': 'b', 'port': None}])
+
+        assert results == {1: (True, None), 2: (False, None)}
@@ -0,0 +1,178 @@
+"""
+Tests for services/live_capture.py
+
+Run with:
+    cd backend && python -m pytest tests/test_live_capture.py -v
+"""
+
+import pytest
+import sys
+import os
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from unittest.mock import MagicMock
+from types import SimpleNamespace
+from datetime import datetime
+from services.live_capture import LiveCaptureService, RECONNECT_MIN_SECONDS
+
+
+def make_service():
+    db = MagicMock()
+    db.get_device.return_value = {'id': 1, 'name': 'Front door'}
+    db.add_timesheet_entries.side_effect = lambda entries: {'new_records': len(entries), 'duplicates': 0}
+    pull = MagicMock()
+    pull.live_device_ids = set()
+    pull.build_timesheet_entries.side_effect = lambda records, stats: (
+        [r.timesheet_entry(10) for r in records], None
+    )
+    return LiveCaptureService(pull, db)
+
+
+def punch(minute):
+    return SimpleNamespace(user_id=1, timestamp=datetime(2026, 3, 6, 8, minute, 0), punch=0)
+
+
+class FakeStop:
+    """threading.Event stand-in that stops after `rounds` is_set() checks and records waits"""
+
+    def __init__(self, rounds):
+        self.rounds = rounds
+        self.waits = []
+
+    def is_set(self):
+        self.rounds -= 1
+        return self.rounds < 0
+
+    def wait(self, seconds):
+        self.waits.append(seconds)
+
+    def set(self):
+        self.rounds = 0
+
+
+class TestMicroBatching:
+    def test_events_written_in_micro_batches(self, mocker):
+        mocker.patch('services.live_capture.LIVE_BATCH_SIZE', 2)
+        svc = make_service()
+        conn = MagicMock()
+        conn.live_capture.return_value = iter([punch(0), None, punch(1), punch(2), None, punch(3)])
+
+        svc._capture(1, conn, threading.Event())
+
+        batches = [len(c.args[0]) for c in svc.database.add_timesheet_entries.call_args_list]
+        assert batches == [2, 2]
+        conn.live_capture.assert_called_once()
+
+    def test_partial_batch_flushed_after_flush_interval(self, mocker):
+        mocker.patch('services.live_capture.LIVE_FLUSH_SECONDS', 0)
+        svc = make_service()
+        conn = MagicMock()
+        conn.live_capture.return_value = iter([punch(0), None])
+
+        svc._capture(1, conn, threading.Event())
+
+        assert svc.database.add_timesheet_entries.call_count == 1
+
+    def test_stop_ends_the_capture_loop(self):
+        svc = make_service()
+        conn = MagicMock()
+        conn.end_live_capture = False
+        conn.live_capture.return_value = iter([None])
+        stop = threading.Event()
+        stop.set()
+
+        svc._capture(1, conn, stop)
+
+        assert conn.end_live_capture is True
+
+
+class TestReconnect:
+    def test_backoff_doubles_until_a_connection_succeeds(self, mocker):
+        svc = make_service()
+        svc.pull_service.pull_data.return_value = (True, "ok", {})
+        svc.pull_service.connect.side_effect = [Exception("timed out"), Exception("timed out"), MagicMock()]
+        capture = mocker.patch.object(svc, '_capture')
+        stop = FakeStop(rounds=3)
+
+        svc._run(1, stop)
+
+        assert stop.waits == [RECONNECT_MIN_SECONDS, RECONNECT_MIN_SECONDS * 2]
+        capture.assert_called_once()
+        assert svc.pull_service.live_device_ids == set()
+
+    def test_catch_up_pull_runs_before_each_capture(self, mocker):
+        svc = make_service()
+        svc.pull_service.pull_data.return_value = (True, "ok", {})
+        mocker.patch.object(svc, '_capture')
+
+        svc._run(1, FakeStop(rounds=2))
+
+        assert svc.pull_service.pull_data.call_count == 2
+        svc.pull_service.pull_data.assert_called_with(device_id=1)
+
+
+class TestWorkers:
+    def test_refresh_follows_device_settings(self, mocker):
+        svc = make_service()
+        started = threading.Event()
+
+        def fake_run(device_id, stop, previous=None):
+            started.set()
+            stop.wait(5)
+
+        mocker.patch.object(svc, '_run', side_effect=fake_run)
+        svc.database.get_enabled_devices.return_value = [
+            {'id': 1, 'live_capture': 1}, {'id': 2, 'live_capture': 0}
+        ]
+
+        svc.start()
+        assert started.wait(5)
+        assert svc.active_device_ids() == {1}
+
+        svc.database.get_enabled_devices.return_value = [{'id': 1, 'live_capture': 0}]
+        svc.refresh()
+        assert svc.active_device_ids() == set()
+
+        svc.stop()
+
+    def test_quick_toggle_waits_for_the_old_worker(self, mocker):
+        """Turning live capture off and on again never runs two workers for a device."""
+        svc = make_service()
+        release_old = threading.Event()
+        in_capture = []
+
+        def fake_capture(device_id, conn, stop):
+            in_capture.append(threading.current_thread().name)
+            if len(in_capture) == 1:
+                release_old.wait(5)  # the old worker is slow to notice it was stopped
+            stop.wait(5)
+
+        svc.pull_service.pull_data.return_value = (True, "ok", {})
+        mocker.patch.object(svc, '_capture', side_effect=fake_capture)
+        svc.database.get_enabled_devices.return_value = [{'id': 1, 'live_capture': 1}]
+
+        svc.start()
+        deadline = time.monotonic() + 5
+        while not in_capture and time.monotonic() < deadline:
+            time.sleep(0.01)
+        old_thread = svc._workers[1][0]
+
+        svc.database.get_enabled_devices.return_value = [{'id': 1, 'live_capture': 0}]
+        svc.refresh()
+        svc.database.get_enabled_devices.return_value = [{'id': 1, 'live_capture': 1}]
+        svc.refresh()
+
+        time.sleep(0.2)
+        assert len(in_capture) == 1
+        release_old.set()
+        old_thread.join(5)
+        deadline = time.monotonic() + 5
+        while len(in_capture) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        assert len(in_capture) == 2
+        assert svc.pull_service.live_device_ids == {1}
+        svc.stop()
@@ -0,0 +1,80 @@
+"""
+Tests for services/pipeline.py
+
+Run with:
+    cd backend && python -m pytest tests/test_pipeline.py -v
+"""
+
+import pytest
+import sys
+import os
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.pipeline import run_pipeline
+
+
+class TestRunPipeline:
+    def test_batches_flow_through_all_stages_in_order(self):
+        written = []
+
+        timings = run_pipeline(iter([[1, 2], [3], [4, 5]]), lambda batch: [n * 10 for n in batch], written.append)
+
+        assert written == [[10, 20], [30], [40, 50]]
+        assert set(timings) == {'fetch_ms', 'transform_ms', 'write_ms'}
+
+    def test_setup_runs_on_calling_thread_before_first_write(self):
+        calls = []
+        caller = threading.current_thread()
+
+        def setup():
+            assert threading.current_thread() is caller
+            calls.append('setup')
+
+        run_pipeline(iter([[1]]), lambda batch: batch, lambda batch: calls.append('write'),
+                     setup=setup, flush=lambda: calls.append('flush'))
+
+        assert calls == ['setup', 'write', 'flush']
+
+    def test_bounded_queues_hold_back_the_fetch_stage(self):
+        """The fetch stage can only run a few batches ahead of a slow writer."""
+        fetched = []
+        lead = []
+
+        def source():
+            for n in range(50):
+                fetched.append(n)
+                yield [n]
+
+        def write(batch):
+            lead.append(len(fetched) - batch[0])
+
+        run_pipeline(source(), lambda batch: batch, write, maxsize=2)
+
+        # 2 waiting per queue, plus one batch held by each stage thread
+        assert max(lead) <= 7
+
+    @pytest.mark.parametrize('failing_stage', ['fetch', 'transform', 'write'])
+    def test_stage_error_is_raised_to_caller(self, failing_stage):
+        def source():
+            yield [1]
+            if failing_stage == 'fetch':
+                raise ConnectionError("device went away")
+            yield [2]
+
+        def transform(batch):
+            if failing_stage == 'transform' and batch == [2]:
+                raise ConnectionError("device went away")
+            return batch
+
+        def write(batch):
+            if failing_stage == 'write':
+                raise ConnectionError("device went away")
+
+        flush_calls = []
+        with pytest.raises(ConnectionError):
+            run_pipeline(source(), transform, write, flush=lambda: flush_calls.append(1))
+
+        assert flush_calls == []
+        assert [t.name for t in threading.enumerate() if t.name.startswith('pipeline-')] == []
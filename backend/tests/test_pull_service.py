@@ -8,11 +8,12 @@ Run with:
 import pytest
 import sys
 import os
+import threading
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from unittest.mock import MagicMock, patch
-from datetime import datetime
+from datetime import datetime, timedelta
 from services.pull_service import PullService
 
 
@@ -20,6 +21,14 @@ from services.pull_service import PullService
 # Helpers
 # ---------------------------------------------------------------------------
 
+@pytest.fixture(autouse=True)
+def reachable_devices(mocker):
+    """Multi-device pulls probe devices over TCP first; report every device reachable."""
+    return mocker.patch('services.pull_service.probe_devices', side_effect=lambda devices: {
+        device['id']: (True, 1.0) for device in devices
+    })
+
+
 def make_service():
     """Return a PullService with a fully mocked database."""
     db = MagicMock()
@@ -30,7 +39,10 @@ def make_service():
     ]
     db.create_sync_log.return_value = 1
     db.get_employee_by_code.return_value = {'id': 10, 'name': 'Test User', 'employee_code': '1'}
-    db.add_timesheet_entry.return_value = 1  # new record
+    db.upsert_employees.return_value = {'inserted': 0, 'updated': 0, 'unchanged': 1}
+    db.add_timesheet_entries.side_effect = lambda entries: {  # all new records
+        'new_records': len(entries), 'duplicates': 0, 'chunks': []
+    }
     return PullService(db)
 
 
@@ -159,9 +171,9 @@ class TestPunchTypeMapping:
 
         svc._pull_from_device(1, '2026-03-06', '2026-03-06')
 
-        call_kwargs = svc.database.add_timesheet_entry.call_args
-        assert call_kwargs.kwargs['log_type'] == 'in', (
-            f"Punch type {punch} should map to 'in', got '{call_kwargs.kwargs['log_type']}'"
+        entry = svc.database.add_timesheet_entries.call_args.args[0][0]
+        assert entry['log_type'] == 'in', (
+            f"Punch type {punch} should map to 'in', got '{entry['log_type']}'"
         )
 
     @pytest.mark.parametrize("punch", [1, 2, 5])
@@ -178,9 +190,9 @@ class TestPunchTypeMapping:
 
         svc._pull_from_device(1, '2026-03-06', '2026-03-06')
 
-        call_kwargs = svc.database.add_timesheet_entry.call_args
-        assert call_kwargs.kwargs['log_type'] == 'out', (
-            f"Punch type {punch} should map to 'out', got '{call_kwargs.kwargs['log_type']}'"
+        entry = svc.database.add_timesheet_entries.call_args.args[0][0]
+        assert entry['log_type'] == 'out', (
+            f"Punch type {punch} should map to 'out', got '{entry['log_type']}'"
         )
 
 
@@ -212,9 +224,11 @@ class TestEmployeeHandling:
         assert stats['new_records'] == 1
 
     def test_pull_duplicate_entry_increments_duplicates(self, mocker):
-        """add_timesheet_entry returning None (duplicate sync_id) increments duplicates."""
+        """Entries ignored as duplicate sync_ids increment duplicates."""
         svc = make_service()
-        svc.database.add_timesheet_entry.return_value = None  # duplicate
+        svc.database.add_timesheet_entries.side_effect = lambda entries: {
+            'new_records': 0, 'duplicates': len(entries), 'chunks': []
+        }
 
         log = make_log(1, datetime(2026, 3, 6, 8, 0, 0))
         mock_conn = MagicMock()
@@ -227,3 +241,541 @@ class TestEmployeeHandling:
 
         assert stats['duplicates'] == 1
         assert stats['new_records'] == 0
+
+
+# ---------------------------------------------------------------------------
+# Batched ingest
+# ---------------------------------------------------------------------------
+
+class TestBatchedIngest:
+    def test_pull_writes_records_in_batches(self, mocker):
+        """Attendance is written through add_timesheet_entries in bounded batches."""
+        mocker.patch('services.pull_service.INGEST_BATCH_SIZE', 2)
+        svc = make_service()
+
+        logs = [make_log(1, datetime(2026, 3, 6, 8, i, 0)) for i in range(5)]
+        mock_conn = MagicMock()
+        mock_conn.get_attendance.return_value = logs
+        mock_conn.get_users.return_value = [make_user(1, 'Alice')]
+        mocker.patch.object(svc, 'connect', return_value=mock_conn)
+        mocker.patch.object(svc, 'disconnect')
+
+        _, _, stats = svc._pull_from_device(1, '2026-03-06', '2026-03-06')
+
+        batch_sizes = [len(c.args[0]) for c in svc.database.add_timesheet_entries.call_args_list]
+        assert batch_sizes == [2, 2, 1]
+        assert stats['new_records'] == 5
+        svc.database.add_timesheet_entry.assert_not_called()
+
+
+# ---------------------------------------------------------------------------
+# Device user sync
+# ---------------------------------------------------------------------------
+
+class TestDeviceUserSync:
+    def test_device_users_are_upserted_in_one_call(self, mocker):
+        """All device users go to upsert_employees together, and its counts reach the stats."""
+        svc = make_service()
+        svc.database.upsert_employees.return_value = {'inserted': 1, 'updated': 1, 'unchanged': 2}
+
+        mock_conn = MagicMock()
+        mock_conn.get_attendance.return_value = []
+        mock_conn.get_users.return_value = [make_user(i, f'User {i}') for i in range(1, 5)]
+        mocker.patch.object(svc, 'connect', return_value=mock_conn)
+        mocker.patch.object(svc, 'disconnect')
+
+        _, _, stats = svc._pull_from_device(1, '2026-03-06', '2026-03-06')
+
+        svc.database.upsert_employees.assert_called_once()
+        employees = list(svc.database.upsert_employees.call_args.args[0])
+        assert [e['employee_code'] for e in employees] == ['1', '2', '3', '4']
+        assert (stats['employees_inserted'], stats['employees_updated'],
+                stats['employees_unchanged']) == (1, 1, 2)
+
+
+# ---------------------------------------------------------------------------
+# Multi-device pull
+# ---------------------------------------------------------------------------
+
+class TestParallelPull:
+    def test_devices_pulled_in_parallel_and_stats_aggregated(self, mocker):
+        """Every enabled device is pulled on the worker pool and results are summed in device order."""
+        svc = make_service()
+        svc.database.get_enabled_devices.return_value = [
+            {'id': device_id, 'name': f'Device {device_id}'} for device_id in (1, 2, 3)
+        ]
+        barrier = threading.Barrier(3, timeout=5)
+
+        def fake_pull(device_id, date_from, date_to, progress_callback):
+            barrier.wait()  # only passes if all three devices run at once
+            if device_id == 2:
+                return False, "Connection timed out", {'total_logs': 0, 'errors': 0}
+            return True, "ok", {'total_logs': 10, 'processed': 10, 'new_records': 7, 'duplicates': 3}
+
+        mocker.patch.object(svc, '_pull_from_device', side_effect=fake_pull)
+
+        success, message, stats = svc.pull_data(max_workers=3)
+
+        assert success is True
+        assert stats['devices_synced'] == 2
+        assert stats['devices_failed'] == 1
+        assert stats['total_logs'] == 20
+        assert stats['new_records'] == 14
+        assert "1 device(s) failed" in message
+
+    def test_devices_in_live_capture_are_not_pulled(self, mocker):
+        svc = make_service()
+        svc.database.get_enabled_devices.return_value = [{'id': 1, 'name': 'A'}, {'id': 2, 'name': 'B'}]
+        svc.live_device_ids.add(1)
+        pull = mocker.patch.object(svc, '_pull_from_device', return_value=(True, "ok", {}))
+
+        svc.pull_data(max_workers=1)
+
+        assert [c.args[0] for c in pull.call_args_list] == [2]
+
+    def test_max_workers_defaults_to_api_config(self, mocker):
+        svc = make_service()
+        svc.database.get_api_config.return_value = {'pull_max_workers': 1}
+        pull = mocker.patch.object(svc, '_pull_from_device', return_value=(True, "ok", {}))
+        executor = mocker.patch('services.pull_service.ThreadPoolExecutor')
+
+        svc.pull_data()
+
+        pull.assert_called_once()
+        executor.assert_not_called()
+
+
+# ---------------------------------------------------------------------------
+# Incremental pulls (watermark)
+# ---------------------------------------------------------------------------
+
+class TestPullWatermark:
+    def _pull(self, mocker, svc, logs, date_from=None):
+        mock_conn = MagicMock()
+        mock_conn.get_attendance.return_value = logs
+        mock_conn.get_users.return_value = [make_user(1, 'Alice')]
+        mocker.patch.object(svc, 'connect', return_value=mock_conn)
+        mocker.patch.object(svc, 'disconnect')
+        return svc._pull_from_device(1, date_from, date_from)
+
+    def _recent_logs(self, count):
+        base = datetime.now().replace(microsecond=0) - timedelta(hours=1)
+        return [make_log(1, base + timedelta(minutes=i)) for i in range(count)]
+
+    def _set_watermark(self, svc, last_record_at, count):
+        svc.database.get_device.return_value = {
+            'id': 1, 'name': 'zkteko', 'ip': '192.168.1.201',
+            'last_record_at': last_record_at.isoformat(sep=' '), 'last_record_count': count
+        }
+
+    def test_records_at_or_below_watermark_are_skipped(self, mocker):
+        svc = make_service()
+        logs = self._recent_logs(5)
+        self._set_watermark(svc, logs[2].timestamp, 3)
+
+        _, _, stats = self._pull(mocker, svc, logs)
+
+        assert stats['below_watermark'] == 3
+        assert stats['processed'] == 2
+        ingested = svc.database.add_timesheet_entries.call_args.args[0]
+        assert len(ingested) == 2
+        svc.database.update_device_watermark.assert_called_once_with(1, logs[4].timestamp, 5)
+
+    def test_cleared_device_falls_back_to_full_rescan(self, mocker):
+        """A buffer smaller than the last pull's means the device was cleared."""
+        svc = make_service()
+        logs = self._recent_logs(2)
+        self._set_watermark(svc, logs[1].timestamp, 10)
+
+        _, _, stats = self._pull(mocker, svc, logs)
+
+        assert stats['below_watermark'] == 0
+        assert stats['processed'] == 2
+
+    def test_explicit_date_range_ignores_watermark(self, mocker):
+        svc = make_service()
+        logs = self._recent_logs(3)
+        self._set_watermark(svc, logs[2].timestamp, 3)
+
+        _, _, stats = self._pull(mocker, svc, logs, date_from=logs[0].timestamp.strftime("%Y-%m-%d"))
+
+        assert stats['below_watermark'] == 0
+        assert stats['processed'] + stats['filtered'] == 3
+
+    def test_watermark_not_advanced_when_records_fail(self, mocker):
+        svc = make_service()
+        svc.database.get_employee_by_code.side_effect = Exception("boom")
+
+        _, _, stats = self._pull(mocker, svc, self._recent_logs(2))
+
+        assert stats['errors'] == 2
+        svc.database.update_device_watermark.assert_not_called()
+
+
+# ---------------------------------------------------------------------------
+# Pull checkpoints
+# ---------------------------------------------------------------------------
+
+class TestPullCheckpoint:
+    def _pull(self, mocker, svc, logs, date_from=None):
+        mock_conn = MagicMock()
+        mock_conn.get_attendance.return_value = logs
+        mock_conn.get_users.return_value = [make_user(1, 'Alice')]
+        mocker.patch.object(svc, 'connect', return_value=mock_conn)
+        mocker.patch.object(svc, 'disconnect')
+        return svc._pull_from_device(1, date_from, date_from)
+
+    def _recent_logs(self, count):
+        base = datetime.now().replace(microsecond=0) - timedelta(hours=1)
+        return [make_log(1, base + timedelta(minutes=i)) for i in range(count)]
+
+    def _set_checkpoint(self, svc, position, checkpoint_at, checkpoint_range=None):
+        svc.database.get_device.return_value = {
+            'id': 1, 'name': 'zkteko', 'ip': '192.168.1.201',
+            'checkpoint_position': position, 'checkpoint_at': checkpoint_at.isoformat(sep=' '),
+            'checkpoint_range': checkpoint_range
+        }
+
+    def test_checkpoint_saved_after_each_write_and_cleared_at_the_end(self, mocker):
+        mocker.patch('services.pull_service.INGEST_BATCH_SIZE', 2)
+        svc = make_service()
+        svc.database.get_device.return_value = {'id': 1, 'name': 'zkteko', 'ip': '192.168.1.201'}
+        logs = self._recent_logs(5)
+
+        self._pull(mocker, svc, logs)
+
+        calls = [c.args for c in svc.database.update_pull_checkpoint.call_args_list]
+        assert calls == [
+            (1, 2, logs[1].timestamp, None),
+            (1, 4, logs[3].timestamp, None),
+            (1, 5, logs[4].timestamp, None),
+            (1, None),
+        ]
+
+    def test_interrupted_pull_resumes_from_checkpoint(self, mocker):
+        svc = make_service()
+        logs = self._recent_logs(5)
+        self._set_checkpoint(svc, 3, logs[2].timestamp)
+
+        _, _, stats = self._pull(mocker, svc, logs)
+
+        assert stats['resumed_from'] == 3
+        assert stats['below_watermark'] == 3
+        assert len(svc.database.add_timesheet_entries.call_args.args[0]) == 2
+
+    def test_checkpoint_from_another_date_range_is_ignored(self, mocker):
+        svc = make_service()
+        logs = self._recent_logs(5)
+        self._set_checkpoint(svc, 3, logs[2].timestamp, '2026-01-01|2026-01-31')
+
+        _, _, stats = self._pull(mocker, svc, logs)
+
+        assert stats['resumed_from'] is None
+        assert stats['processed'] == 5
+
+    def test_failed_pull_keeps_its_checkpoint(self, mocker):
+        mocker.patch('services.pull_service.INGEST_BATCH_SIZE', 2)
+        svc = make_service()
+        svc.database.get_device.return_value = {'id': 1, 'name': 'zkteko', 'ip': '192.168.1.201'}
+        svc.database.add_timesheet_entries.side_effect = [
+            {'new_records': 2, 'duplicates': 0}, Exception("disk I/O error")
+        ]
+
+        success, _, _ = self._pull(mocker, svc, self._recent_logs(5))
+
+        assert success is False
+        calls = [c.args for c in svc.database.update_pull_checkpoint.call_args_list]
+        assert [args[1] for args in calls] == [2]
+
+
+# ---------------------------------------------------------------------------
+# Unchanged device skip (fingerprint)
+# ---------------------------------------------------------------------------
+
+class TestDeviceFingerprint:
+    def _device_conn(self, mocker, svc, records, users):
+        mock_conn = MagicMock()
+        mock_conn.records = records
+        mock_conn.users = users
+        mock_conn.get_attendance.return_value = []
+        mock_conn.get_users.return_value = []
+        mocker.patch.object(svc, 'connect', return_value=mock_conn)
+        mocker.patch.object(svc, 'disconnect')
+        return mock_conn
+
+    def test_unchanged_device_is_skipped_before_download(self, mocker):
+        svc = make_service()
+        svc.database.get_device.return_value = {'id': 1, 'name': 'zkteko', 'state_fingerprint': '120:15'}
+        mock_conn = self._device_conn(mocker, svc, records=120, users=15)
+
+        success, message, stats = svc._pull_from_device(1)
+
+        assert success is True
+        assert stats['skipped'] is True
+        mock_conn.get_attendance.assert_not_called()
+        mock_conn.get_users.assert_not_called()
+        metadata = svc.database.update_sync_log.call_args.kwargs['metadata']
+        assert metadata['skipped'] is True
+
+    def test_changed_device_is_pulled_and_fingerprint_stored(self, mocker):
+        svc = make_service()
+        svc.database.get_device.return_value = {'id': 1, 'name': 'zkteko', 'state_fingerprint': '120:15'}
+        mock_conn = self._device_conn(mocker, svc, records=121, users=15)
+
+        _, _, stats = svc._pull_from_device(1)
+
+        assert stats['skipped'] is False
+        mock_conn.get_attendance.assert_called_once()
+        svc.database.update_device_fingerprint.assert_called_once_with(1, '121:15')
+
+    def test_explicit_date_range_always_downloads(self, mocker):
+        svc = make_service()
+        svc.database.get_device.return_value = {'id': 1, 'name': 'zkteko', 'state_fingerprint': '120:15'}
+        mock_conn = self._device_conn(mocker, svc, records=120, users=15)
+
+        svc._pull_from_device(1, '2026-03-01', '2026-03-06')
+
+        mock_conn.get_attendance.assert_called_once()
+
+    def test_date_range_pull_does_not_hide_recent_punches(self, mocker):
+        """A ranged pull stores no fingerprint or watermark, so the next default pull still ingests."""
+        svc = make_service()
+        device = {'id': 1, 'name': 'zkteko', 'ip': '192.168.1.201'}
+        svc.database.get_device.side_effect = lambda device_id: dict(device)
+        svc.database.update_device_fingerprint.side_effect = (
+            lambda device_id, fingerprint: device.update(state_fingerprint=fingerprint)
+        )
+        svc.database.update_device_watermark.side_effect = lambda device_id, at, count: device.update(
+            last_record_at=at.isoformat(sep=' '), last_record_count=count
+        )
+        recent = make_log(1, datetime.now().replace(microsecond=0) - timedelta(hours=1))
+        mock_conn = self._device_conn(mocker, svc, records=1, users=1)
+        mock_conn.get_attendance.return_value = [recent]
+
+        svc._pull_from_device(1, '2026-09-01', '2026-09-30')
+        _, _, stats = svc._pull_from_device(1)
+
+        assert stats['skipped'] is False
+        assert stats['new_records'] == 1
+        assert device['state_fingerprint'] == '1:1'
+
+    def test_skipped_devices_counted_in_pull_result(self, mocker):
+        svc = make_service()
+        svc.database.get_enabled_devices.return_value = [{'id': 1, 'name': 'A'}, {'id': 2, 'name': 'B'}]
+        mocker.patch.object(svc, '_pull_from_device', side_effect=[
+            (True, "No changes since last pull", {'skipped': True}),
+            (True, "3 new", {'new_records': 3, 'skipped': False}),
+        ])
+
+        _, message, stats = svc.pull_data(max_workers=1)
+
+        assert stats['devices_synced'] == 2
+        assert stats['devices_skipped'] == 1
+        assert "1 unchanged" in message
+
+
+# ---------------------------------------------------------------------------
+# Staged pipeline
+# ---------------------------------------------------------------------------
+
+class TestPullPipeline:
+    def test_stage_timings_reported(self, mocker):
+        svc = make_service()
+        mock_conn = MagicMock()
+        mock_conn.get_attendance.return_value = [make_log(1, datetime(2026, 3, 6, 8, 0, 0))]
+        mock_conn.get_users.return_value = [make_user(1, 'Alice')]
+        mocker.patch.object(svc, 'connect', return_value=mock_conn)
+        mocker.patch.object(svc, 'disconnect')
+
+        _, _, stats = svc._pull_from_device(1, '2026-03-06', '2026-03-06')
+
+        assert set(stats['stage_ms']) == {'fetch_ms', 'transform_ms', 'write_ms'}
+        metadata = svc.database.update_sync_log.call_args.kwargs['metadata']
+        assert metadata['stage_ms'] == stats['stage_ms']
+
+    def test_errors_from_both_stages_are_all_counted(self, mocker):
+        """Transform and write errors are merged on the calling thread, none are lost."""
+        mocker.patch('services.pull_service.INGEST_BATCH_SIZE', 3)
+        svc = make_service()
+        svc.database.get_device.return_value = {'id': 1, 'name': 'zkteko', 'ip': '192.168.1.201'}
+        employees = {'1': {'id': 10, 'name': 'Alice', 'employee_code': '1'}}
+
+        def get_employee(code):
+            if code == '2':
+                raise Exception("database is locked")
+            return employees[code]
+
+        svc.database.get_employee_by_code.side_effect = get_employee
+        base = datetime.now().replace(microsecond=0) - timedelta(hours=1)
+        logs = []
+        for i in range(30):
+            logs.append(make_log(1, base + timedelta(seconds=i)))
+            logs.append(make_log(2, base + timedelta(seconds=i)))
+            logs.append(make_log(1, None))
+        mock_conn = MagicMock()
+        mock_conn.get_attendance.return_value = logs
+        mock_conn.get_users.return_value = []
+        mocker.patch.object(svc, 'connect', return_value=mock_conn)
+        mocker.patch.object(svc, 'disconnect')
+
+        _, _, stats = svc._pull_from_device(1)
+
+        assert stats['errors'] == 60
+        assert stats['processed'] == 60
+        assert stats['new_records'] == 30
+        svc.database.update_device_watermark.assert_not_called()
+        saved = [c.args[1] for c in svc.database.update_pull_checkpoint.call_args_list if c.args[1] is not None]
+        assert saved == []
+
+    def test_device_error_mid_download_fails_the_pull(self, mocker):
+        svc = make_service()
+        mock_conn = MagicMock()
+        mock_conn.get_attendance.side_effect = Exception("timed out")
+        mock_conn.get_users.return_value = [make_user(1, 'Alice')]
+        mocker.patch.object(svc, 'connect', return_value=mock_conn)
+        mocker.patch.object(svc, 'disconnect')
+
+        success, message, _ = svc._pull_from_device(1, '2026-03-06', '2026-03-06')
+
+        assert success is False
+        assert message == "timed out"
+        svc.database.add_timesheet_entries.assert_not_called()
+
+
+# ---------------------------------------------------------------------------
+# Reachability probe
+# ---------------------------------------------------------------------------
+
+class TestReachabilityProbe:
+    def test_unreachable_devices_fail_without_connecting(self, mocker, reachable_devices):
+        svc = make_service()
+        svc.database.get_enabled_devices.return_value = [
+            {'id': 1, 'name': 'A', 'ip': '10.0.0.1', 'port': 4370},
+            {'id': 2, 'name': 'B', 'ip': '10.0.0.2', 'port': 4370},
+        ]
+        reachable_devices.side_effect = lambda devices: {1: (False, None), 2: (True, 3.5)}
+        pull = mocker.patch.object(svc, '_pull_from_device', return_value=(True, "ok", {}))
+
+        _, _, stats = svc.pull_data(max_workers=1)
+
+        assert [c.args[0] for c in pull.call_args_list] == [2]
+        assert stats['devices_failed'] == 1
+        svc.database.record_device_probes.assert_called_once_with({1: (False, None), 2: (True, 3.5)})
+        assert svc.database.update_device_health.call_args.args[0] == 1
+
+    def test_skipped_devices_get_an_error_sync_log(self, mocker, reachable_devices):
+        svc = make_service()
+        svc.database.get_enabled_devices.return_value = [
+            {'id': 1, 'name': 'A', 'ip': '10.0.0.1', 'port': 4370},
+            {'id': 2, 'name': 'B', 'ip': '10.0.0.2', 'port': 4370,
+             'circuit_open_until': (datetime.now() + timedelta(minutes=5)).isoformat()},
+            {'id': 3, 'name': 'C', 'ip': '10.0.0.3', 'port': 4370},
+        ]
+        reachable_devices.side_effect = lambda devices: {1: (False, None), 3: (True, 3.5)}
+        svc.database.create_sync_log.side_effect = [101, 102]
+        mocker.patch.object(svc, '_pull_from_device', return_value=(True, "ok", {}))
+
+        svc.pull_data(max_workers=1)
+
+        logged = {c.args[0]: c.kwargs for c in svc.database.update_sync_log.call_args_list}
+        assert set(logged) == {101, 102}
+        assert logged[101]['status'] == 'error'
+        assert logged[101]['error_message'].startswith("Device unreachable at 10.0.0.1")
+        assert logged[101]['metadata'] == {'device_id': 1, 'device_name': 'A'}
+        assert logged[102]['error_message'].startswith("Skipped after repeated connection failures")
+        assert logged[102]['metadata'] == {'device_id': 2, 'device_name': 'B'}
+
+
+# ---------------------------------------------------------------------------
+# Buffer rotation
+# ---------------------------------------------------------------------------
+
+class TestRotateDevice:
+    def _connect(self, mocker, svc, logs):
+        mock_conn = MagicMock()
+        mock_conn.records = len(logs)
+        mock_conn.get_attendance.return_value = logs
+        mocker.patch.object(svc, 'connect', return_value=mock_conn)
+        mocker.patch.object(svc, 'disconnect')
+        return mock_conn
+
+    def _logs(self, count):
+        base = datetime.now().replace(microsecond=0) - timedelta(days=3)
+        return [make_log(1, base + timedelta(minutes=i)) for i in range(count)]
+
+    def test_buffer_cleared_when_every_record_is_confirmed(self, mocker):
+        svc = make_service()
+        conn = self._connect(mocker, svc, self._logs(3))
+        svc.database.get_confirmed_sync_ids.side_effect = lambda sync_ids, pushed_only: set(sync_ids)
+
+        rotated, _, stats = svc.rotate_device(1, require_pushed=True)
+
+        assert rotated is True
+        assert stats['new_records'] == 3
+        conn.disable_device.assert_called_once()
+        conn.clear_attendance.assert_called_once()
+        conn.enable_device.assert_called_once()
+        svc.database.record_device_rotation.assert_called_once_with(1)
+        assert svc.database.get_confirmed_sync_ids.call_args.kwargs['pushed_only'] is True
+
+    def test_rotation_deferred_while_records_are_unconfirmed(self, mocker):
+        svc = make_service()
+        conn = self._connect(mocker, svc, self._logs(3))
+        svc.database.get_confirmed_sync_ids.side_effect = lambda sync_ids, pushed_only: set(list(sync_ids)[:2])
+
+        rotated, message, stats = svc.rotate_device(1)
+
+        assert rotated is False
+        assert stats['unconfirmed'] == 1
+        assert "deferred" in message
+        conn.clear_attendance.assert_not_called()
+        conn.enable_device.assert_called_once()
+        svc.database.record_device_rotation.assert_not_called()
+
+    def test_same_second_punches_do_not_block_rotation(self, mocker):
+        """Two punches sharing a sync_id are one stored row, not an unconfirmed record."""
+        svc = make_service()
+        logs = self._logs(2)
+        logs.append(make_log(1, logs[1].timestamp, punch=1))
+        conn = self._connect(mocker, svc, logs)
+        svc.database.get_confirmed_sync_ids.side_effect = lambda sync_ids, pushed_only: set(sync_ids)
+
+        rotated, _, stats = svc.rotate_device(1)
+
+        assert rotated is True
+        assert stats['unconfirmed'] == 0
+        conn.clear_attendance.assert_called_once()
+
+    def test_records_without_a_stored_row_are_unconfirmed(self, mocker):
+        svc = make_service()
+        svc.database.get_employee_by_code.return_value = None
+        conn = self._connect(mocker, svc, self._logs(2))
+        svc.database.get_confirmed_sync_ids.side_effect = lambda sync_ids, pushed_only: set()
+
+        rotated, _, stats = svc.rotate_device(1)
+
+        assert rotated is False
+        assert stats['unconfirmed'] == 2
+        conn.clear_attendance.assert_not_called()
+
+    def test_records_past_retention_are_not_checked(self, mocker):
+        svc = make_service()
+        logs = self._logs(3)
+        self._connect(mocker, svc, logs)
+        svc.database.get_confirmed_sync_ids.side_effect = lambda sync_ids, pushed_only: set(sync_ids)
+
+        rotated, _, stats = svc.rotate_device(1, retain_since=logs[1].timestamp)
+
+        assert rotated is True
+        assert stats['expired'] == 1
+        assert len(svc.database.add_timesheet_entries.call_args.args[0]) == 2
+
+    def test_small_buffer_left_alone(self, mocker):
+        svc = make_service()
+        conn = self._connect(mocker, svc, self._logs(3))
+
+        rotated, _, _ = svc.rotate_device(1, min_records=10)
+
+        assert rotated is False
+        conn.get_attendance.assert_not_called()
+        conn.disable_device.assert_not_called()
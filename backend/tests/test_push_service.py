@@ -9,11 +9,16 @@ import pytest
 import sys
 import os
 import requests
+import threading
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from unittest.mock import MagicMock, patch, call
-from services.push_service import PushService
+from datetime import datetime, timedelta
+from services.push_service import (
+    PUSH_LEASE_SECONDS, RETRY_LATER_MAX_ATTEMPTS, PushService, get_retry_class, schedule_retry
+)
+from services.retry_policy import RetryPolicy
 
 
 # ---------------------------------------------------------------------------
@@ -29,6 +34,8 @@ def make_service(db=None):
         'push_password': 'testpass',
         'push_token': None,
     }
+    # Every claimed record is still leased to the push
+    db.hold_push_claims.side_effect = lambda owner, ids, lease_seconds: set(ids)
     return PushService(db)
 
 
@@ -215,7 +222,7 @@ class TestPushData:
             'push_token': 'valid-token',
         }
         db.get_push_token.return_value = 'valid-token'
-        db.get_unsynced_timesheets.return_value = []
+        db.claim_push_batch.return_value = []
         db.create_sync_log.return_value = 1
 
         svc = make_service(db)
@@ -236,7 +243,7 @@ class TestPushData:
             'push_token': 'valid-token',
         }
         db.get_push_token.return_value = 'valid-token'
-        db.get_unsynced_timesheets.return_value = [
+        db.claim_push_batch.return_value = [
             {'id': 1, 'employee_code': None, 'time': '08:00', 'log_type': 'in',
              'sync_id': 'ZK_1_1_20260306', 'date': '2026-03-06', 'branch_id': None},
         ]
@@ -258,7 +265,7 @@ class TestPushData:
             'push_token': 'valid-token',
         }
         db.get_push_token.return_value = 'valid-token'
-        db.get_unsynced_timesheets.return_value = [
+        db.claim_push_batch.return_value = [
             {'id': 1, 'employee_code': 'E001', 'time': '08:00', 'log_type': 'in',
              'sync_id': 'ZK_1_1_20260306080000', 'date': '2026-03-06', 'branch_id': None},
             {'id': 2, 'employee_code': 'E002', 'time': '09:00', 'log_type': 'out',
@@ -276,7 +283,475 @@ class TestPushData:
 
         assert stats['success'] == 1
         assert stats['failed'] == 1
-        db.mark_timesheet_synced.assert_called_once_with(1, 1)
-        db.mark_timesheet_sync_failed.assert_called_once()
-        failed_args = db.mark_timesheet_sync_failed.call_args[0]
-        assert failed_args[0] == 2
+        db.mark_timesheets_synced.assert_called_once()
+        assert list(db.mark_timesheets_synced.call_args[0][0]) == [(1, 1)]
+        db.mark_timesheets_sync_failed.assert_called_once()
+        failed = list(db.mark_timesheets_sync_failed.call_args[0][0])
+        assert [failure[0] for failure in failed] == [2]
+        db.mark_timesheet_synced.assert_not_called()
+        db.mark_timesheet_sync_failed.assert_not_called()
+
+
+# ---------------------------------------------------------------------------
+# Concurrent batches
+# ---------------------------------------------------------------------------
+
+def make_push_db(count):
+    """Mocked database holding `count` unsynced timesheets."""
+    db = MagicMock()
+    db.get_push_token.return_value = 'valid-token'
+    db.claim_push_batch.return_value = [
+        {'id': i, 'employee_code': 'E001', 'time': '08:00', 'log_type': 'in',
+         'sync_id': f'ZK_1_1_{i}', 'date': '2026-03-06', 'branch_id': None}
+        for i in range(1, count + 1)
+    ]
+    db.create_sync_log.return_value = 1
+    return db
+
+
+class TestConcurrentPush:
+    def test_results_applied_in_batch_order_on_the_calling_thread(self, mocker):
+        db = make_push_db(150)
+        svc = make_service(db)
+        third_sent = threading.Event()
+        writers = set()
+
+        def push_batch(token, batch):
+            if batch[0]['id'] == 1:
+                # First batch answers last
+                assert third_sent.wait(5)
+            if batch[0]['id'] == 101:
+                third_sent.set()
+            return True, {'logs_successfully_sync': [entry['id'] for entry in batch], 'logs_not_sync': []}
+
+        mocker.patch.object(svc, 'push_batch', side_effect=push_batch)
+        db.mark_timesheets_synced.side_effect = lambda synced: writers.add(threading.current_thread())
+
+        success, _, stats = svc.push_data(max_in_flight=3)
+
+        assert success is True
+        assert stats['success'] == 150
+        assert stats['batches_completed'] == 3
+        assert writers == {threading.current_thread()}
+
+    def test_failed_batch_stops_sending_but_in_flight_results_are_kept(self, mocker):
+        db = make_push_db(250)
+        svc = make_service(db)
+        second_sent = threading.Event()
+
+        def push_batch(token, batch):
+            if batch[0]['id'] == 1:
+                assert second_sent.wait(5)
+                return False, {'error': 'Payroll server error'}
+            second_sent.set()
+            return True, {'logs_successfully_sync': [entry['id'] for entry in batch], 'logs_not_sync': []}
+
+        mocker.patch.object(svc, 'push_batch', side_effect=push_batch)
+
+        success, message, stats = svc.push_data(max_in_flight=2)
+
+        assert success is False
+        assert svc.push_batch.call_count == 2
+        assert stats['success'] == 50
+        assert stats['failed'] == 50
+        assert stats['records_not_sent'] == 150
+        assert "150 record(s) left" in message
+
+    def test_concurrent_401s_re_authenticate_once(self, mocker):
+        svc = make_service()
+        authenticate = mocker.patch.object(svc, 'authenticate', return_value={'token': 'fresh-token'})
+        tokens = []
+
+        threads = [threading.Thread(target=lambda: tokens.append(svc._refresh_token('expired-token')))
+                   for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert tokens == ['fresh-token'] * 4
+        authenticate.assert_called_once()
+
+
+# ---------------------------------------------------------------------------
+# Adaptive batch size
+# ---------------------------------------------------------------------------
+
+class TestAdaptiveBatchSize:
+    def _echo(self, token, batch):
+        return True, {'logs_successfully_sync': [entry['id'] for entry in batch], 'logs_not_sync': []}
+
+    def test_batches_grow_and_sizes_are_logged(self, mocker):
+        db = make_push_db(200)
+        svc = make_service(db)
+        push_batch = mocker.patch.object(svc, 'push_batch', side_effect=self._echo)
+
+        success, _, stats = svc.push_data(max_in_flight=1)
+
+        assert success is True
+        assert [len(c.args[1]) for c in push_batch.call_args_list] == [50, 75, 75]
+        metadata = db.update_sync_log.call_args.kwargs['metadata']
+        assert [size for size, _ in metadata['batches']] == [50, 75, 75]
+        assert metadata['batch_size_final'] == 125
+        assert metadata['latency_ms_max'] is not None
+
+    def test_next_push_starts_from_the_learned_size(self, mocker):
+        svc = make_service(make_push_db(100))
+        mocker.patch.object(svc, 'push_batch', side_effect=self._echo)
+
+        svc.push_data(max_in_flight=1)
+
+        assert svc.get_batch_sizer().size == 100
+
+    def test_configured_ceiling_caps_growth(self, mocker):
+        svc = make_service(make_push_db(200))
+        svc.database.get_api_config.return_value['push_batch_max'] = 60
+        push_batch = mocker.patch.object(svc, 'push_batch', side_effect=self._echo)
+
+        svc.push_data(max_in_flight=1)
+
+        assert [len(c.args[1]) for c in push_batch.call_args_list] == [50, 60, 60, 30]
+
+    def test_too_large_batch_is_resent_smaller_in_the_same_cycle(self, mocker):
+        db = make_push_db(100)
+        svc = make_service(db)
+
+        def push_batch(token, batch):
+            if len(batch) > 25:
+                return False, {'error': 'Payload too large', 'status_code': 413}
+            return self._echo(token, batch)
+
+        mocker.patch.object(svc, 'push_batch', side_effect=push_batch)
+
+        success, _, stats = svc.push_data(max_in_flight=1)
+
+        assert success is True
+        assert stats['success'] == 100
+        assert stats['failed'] == 0
+        assert stats['batches_resplit'] == 1
+        sizes = [len(c.args[1]) for c in svc.push_batch.call_args_list]
+        assert sizes[:2] == [50, 25]
+        assert sum(sizes[1:]) == 100
+        assert all(list(c.args[0]) == [] for c in db.mark_timesheets_sync_failed.call_args_list)
+
+    def test_timeout_at_the_floor_is_not_resplit(self, mocker):
+        db = make_push_db(10)
+        svc = make_service(db)
+        svc.sleep = MagicMock()
+        svc.database.get_api_config.return_value['push_batch_min'] = 10
+        svc._batch_size = 10
+        mocker.patch.object(svc, 'push_batch', return_value=(False, {'error': 'timed out', 'error_type': 'timeout'}))
+
+        _, _, stats = svc.push_data(max_in_flight=1)
+
+        assert stats['batches_resplit'] == 0
+        assert stats['failed'] == 10
+
+    def test_push_batch_reports_status_code_for_non_json_errors(self, mocker):
+        svc = make_service()
+        resp = mock_response(413, {})
+        resp.json.side_effect = ValueError("not JSON")
+        mocker.patch.object(svc.session, 'post', return_value=resp)
+
+        success, result = svc.push_batch('token', [{'id': 1}])
+
+        assert success is False
+        assert result['status_code'] == 413
+
+
+# ---------------------------------------------------------------------------
+# Retries
+# ---------------------------------------------------------------------------
+
+class TestPushRetries:
+    TIMEOUT = (False, {'error': 'Request timed out', 'error_type': 'timeout'})
+    UNAVAILABLE = (False, {'error': 'Payroll service is under maintenance', 'status_code': 503})
+
+    def _echo(self, batch):
+        return True, {'logs_successfully_sync': [entry['id'] for entry in batch], 'logs_not_sync': []}
+
+    def test_transient_failure_is_retried_within_the_cycle(self, mocker):
+        db = make_push_db(50)
+        svc = make_service(db)
+        svc.sleep = MagicMock()
+        responses = iter([self.UNAVAILABLE, self.UNAVAILABLE])
+        mocker.patch.object(svc, 'push_batch', side_effect=lambda token, batch: next(responses, self._echo(batch)))
+
+        success, _, stats = svc.push_data(max_in_flight=1)
+
+        assert success is True
+        assert stats['success'] == 50
+        assert stats['failed'] == 0
+        assert stats['retries'] == 2
+        assert svc.sleep.call_count == 2
+        db.mark_timesheets_sync_failed.assert_called_once_with([])
+        assert db.update_sync_log.call_args.kwargs['metadata']['retries'] == 2
+
+    def test_timed_out_batch_is_resplit_instead_of_retried_at_full_size(self, mocker):
+        db = make_push_db(50)
+        svc = make_service(db)
+        svc.sleep = MagicMock()
+        responses = iter([self.TIMEOUT, self.TIMEOUT])
+        mocker.patch.object(svc, 'push_batch', side_effect=lambda token, batch: next(responses, self._echo(batch)))
+
+        success, _, stats = svc.push_data(max_in_flight=1)
+
+        assert success is True
+        assert stats['success'] == 50
+        sizes = [len(c.args[1]) for c in svc.push_batch.call_args_list]
+        assert sizes[:3] == [50, 25, 12]
+        assert sum(sizes[2:]) == 50
+        assert stats['retries'] == 0
+        assert stats['batches_resplit'] == 2
+        svc.sleep.assert_not_called()
+
+    def test_exhausted_batch_is_failed_and_the_push_continues(self, mocker):
+        db = make_push_db(100)
+        svc = make_service(db)
+        svc.sleep = MagicMock()
+
+        def push_batch(token, batch):
+            return self.UNAVAILABLE if batch[0]['id'] == 1 else self._echo(batch)
+
+        mocker.patch.object(svc, 'push_batch', side_effect=push_batch)
+
+        success, message, stats = svc.push_data(max_in_flight=1)
+
+        assert success is True
+        assert stats['batches_exhausted'] == 1
+        assert stats['failed'] == 50
+        assert stats['success'] == 50
+        assert "completed with errors" in message
+
+    def test_spent_budget_stops_the_push(self, mocker):
+        db = make_push_db(150)
+        svc = make_service(db)
+        svc.sleep = MagicMock()
+        mocker.patch('services.push_service.RetryPolicy', side_effect=lambda sleep: RetryPolicy(sleep=sleep, budget=1))
+        mocker.patch.object(svc, 'push_batch', return_value=self.UNAVAILABLE)
+
+        success, _, stats = svc.push_data(max_in_flight=1)
+
+        assert success is False
+        assert svc.push_batch.call_count == 2
+        assert stats['records_not_sent'] == 100
+
+
+# ---------------------------------------------------------------------------
+# Rejected record retry classification
+# ---------------------------------------------------------------------------
+
+class TestRetryClassification:
+    @pytest.mark.parametrize('code, expected', [
+        (102, 'permanent'), (120, 'synced'), (140, 'later'), (141, 'later'),
+        (500, 'now'), (999, 'later'), ('140', 'later'), (None, 'later'),
+    ])
+    def test_codes_map_to_retry_classes(self, code, expected):
+        assert get_retry_class(code) == expected
+
+    def test_later_delay_doubles_then_rejects(self):
+        now = datetime(2026, 3, 6, 8, 0, 0)
+
+        assert schedule_retry('later', 1, now) == (now + timedelta(hours=1), False)
+        assert schedule_retry('later', 3, now) == (now + timedelta(hours=4), False)
+        assert schedule_retry('later', RETRY_LATER_MAX_ATTEMPTS - 1, now)[0] == now + timedelta(hours=24)
+        assert schedule_retry('later', RETRY_LATER_MAX_ATTEMPTS, now) == (None, True)
+        assert schedule_retry('permanent', 1, now) == (None, True)
+        assert schedule_retry('now', 5, now) == (None, False)
+
+    def test_outage_does_not_count_toward_rejection(self, mocker):
+        """A whole-batch failure leaves the records' attempt counts alone."""
+        db = make_push_db(3)
+        svc = make_service(db)
+        svc.sleep = MagicMock()
+        mocker.patch.object(svc, 'push_batch', return_value=(False, {
+            'error': 'Payroll server error', 'status_code': 500
+        }))
+
+        svc.push_data(max_in_flight=1)
+
+        assert db.mark_timesheets_sync_failed.call_args.kwargs['count_attempt'] is False
+        assert [f[0] for f in db.mark_timesheets_sync_failed.call_args.args[0]] == [1, 2, 3]
+
+    def test_duplicate_record_is_marked_synced(self, mocker):
+        """Code 120 means Payroll already has the record, e.g. after a crashed push re-sent it."""
+        db = make_push_db(2)
+        svc = make_service(db)
+        mocker.patch.object(svc, 'push_batch', return_value=(True, {
+            'logs_successfully_sync': [1],
+            'logs_not_sync': [{'id': 2, 'reason': 'Duplicate', 'error_code': 120, 'timesheet_id': 7001}],
+        }))
+
+        success, _, stats = svc.push_data()
+
+        assert success is True
+        assert stats['success'] == 2
+        assert stats['failed'] == 0
+        assert list(db.mark_timesheets_synced.call_args.args[0]) == [(1, 1), (2, 7001)]
+        assert list(db.mark_timesheets_sync_failed.call_args.args[0]) == []
+
+    def test_record_failures_are_scheduled_by_error_code(self, mocker):
+        db = make_push_db(3)
+        db.claim_push_batch.return_value[1]['sync_attempts'] = 2
+        svc = make_service(db)
+        mocker.patch.object(svc, 'push_batch', return_value=(True, {
+            'logs_successfully_sync': [],
+            'logs_not_sync': [
+                {'id': 1, 'reason': 'Bad date', 'error_code': 102},
+                {'id': 2, 'reason': 'Employee not found', 'error_code': 140},
+                {'id': 3, 'reason': 'Server error', 'error_code': 500},
+            ],
+        }))
+
+        _, message, stats = svc.push_data()
+
+        failures = {f[0]: f for f in db.mark_timesheets_sync_failed.call_args.args[0]}
+        assert failures[1][2:] == (None, True)
+        assert failures[2][3] is False
+        assert failures[2][2] - datetime.now() > timedelta(hours=3, minutes=59)
+        assert failures[3][2:] == (None, False)
+        assert stats['rejected'] == 1
+        assert "1 rejected" in message
+
+
+# ---------------------------------------------------------------------------
+# Push outbox leasing
+# ---------------------------------------------------------------------------
+
+class TestPushOutbox:
+    def test_claims_are_renewed_and_released(self, mocker):
+        db = make_push_db(3)
+        svc = make_service(db)
+        mocker.patch.object(svc, 'push_batch', return_value=(True, {
+            'logs_successfully_sync': [1, 2, 3], 'logs_not_sync': []
+        }))
+
+        svc.push_data()
+
+        owner = db.claim_push_batch.call_args.args[0]
+        db.renew_push_claims.assert_called_with(owner, mocker.ANY)
+        db.release_push_claims.assert_called_once_with(owner)
+
+    def test_claims_are_renewed_while_a_batch_is_slow(self, mocker):
+        db = make_push_db(3)
+        svc = make_service(db)
+        mocker.patch('services.push_service.PUSH_LEASE_RENEW_SECONDS', 0.01)
+        renewed = threading.Event()
+        db.renew_push_claims.side_effect = lambda owner, lease_seconds: renewed.set()
+
+        def push_batch(token, batch):
+            # Still waiting on Payroll when the renewal interval passes
+            assert renewed.wait(timeout=5)
+            return True, {'logs_successfully_sync': [entry['id'] for entry in batch], 'logs_not_sync': []}
+
+        mocker.patch.object(svc, 'push_batch', side_effect=push_batch)
+
+        success, _, stats = svc.push_data()
+
+        assert success is True
+        assert stats['success'] == 3
+        assert db.renew_push_claims.call_count >= 2
+
+    def test_claims_are_released_when_the_push_errors(self, mocker):
+        db = make_push_db(3)
+        svc = make_service(db)
+        mocker.patch.object(svc, 'push_batch', side_effect=RuntimeError("boom"))
+
+        success, _, _ = svc.push_data()
+
+        assert success is False
+        db.release_push_claims.assert_called_once_with(db.claim_push_batch.call_args.args[0])
+
+    def test_each_push_uses_its_own_owner(self, mocker):
+        db = make_push_db(0)
+        svc = make_service(db)
+
+        svc.push_data()
+        svc.push_data()
+
+        first, second = [c.args[0] for c in db.claim_push_batch.call_args_list]
+        assert first != second
+
+    def test_concurrent_pushes_never_send_a_record_twice(self, tmp_path, mocker):
+        from database import Database
+        database = Database(tmp_path / 'test.db')
+        database.add_or_update_employee('1', 'Alice', employee_code='1')
+        employee = database.get_employee_by_code('1')
+        database.add_timesheet_entries([{
+            'sync_id': f'ZK_1_1_{i}', 'employee_id': employee['id'], 'log_type': 'in',
+            'date': '2026-03-06', 'time': '08:00:00', 'device_id': None
+        } for i in range(60)])
+        sent = []
+        claims = []
+        both_claimed = threading.Event()
+        claim = database.claim_push_batch
+
+        def claim_push_batch(*args):
+            rows = claim(*args)
+            claims.append(len(rows))
+            if len(claims) == 2:
+                both_claimed.set()
+            return rows
+
+        def push_batch(token, batch):
+            # Hold the first send until the other push has claimed too
+            assert both_claimed.wait(timeout=5)
+            sent.extend(entry['id'] for entry in batch)
+            return True, {'logs_successfully_sync': [entry['id'] for entry in batch], 'logs_not_sync': []}
+
+        mocker.patch.object(database, 'claim_push_batch', side_effect=claim_push_batch)
+        services = [PushService(database), PushService(database)]
+        for svc in services:
+            mocker.patch.object(svc, 'get_valid_token', return_value='valid-token')
+            mocker.patch.object(svc, 'get_batch_sizer').return_value.size = 100
+            mocker.patch.object(svc, 'push_batch', side_effect=push_batch)
+
+        threads = [threading.Thread(target=svc.push_data) for svc in services]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert sorted(claims) == [0, 60]
+        assert len(sent) == len(set(sent)) == 60
+        assert database.get_unsynced_timesheets() == []
+        database.close()
+
+    def test_records_claimed_elsewhere_during_a_retry_are_not_resent(self, tmp_path, mocker):
+        """A lease that expires while a batch waits to retry hands its records to the other push."""
+        from database import Database
+        database = Database(tmp_path / 'test.db')
+        database.add_or_update_employee('1', 'Alice', employee_code='1')
+        employee = database.get_employee_by_code('1')
+        database.add_timesheet_entries([{
+            'sync_id': f'ZK_1_1_{i}', 'employee_id': employee['id'], 'log_type': 'in',
+            'date': '2026-03-06', 'time': '08:00:00', 'device_id': None
+        } for i in range(10)])
+        stolen = []
+
+        def slow_backoff(seconds):
+            # The wait outlasts the lease and another push claims half the records
+            expired = datetime.now() + timedelta(seconds=PUSH_LEASE_SECONDS + 1)
+            stolen.extend(row['id'] for row in database.claim_push_batch('other', 5, 600, now=expired))
+
+        svc = PushService(database, sleep=slow_backoff)
+        mocker.patch.object(svc, 'get_valid_token', return_value='valid-token')
+        sends = []
+
+        def push_batch(token, batch):
+            sends.append([entry['id'] for entry in batch])
+            if len(sends) == 1:
+                return False, {'error': 'Payroll service is under maintenance', 'status_code': 503}
+            return True, {'logs_successfully_sync': [entry['id'] for entry in batch], 'logs_not_sync': []}
+
+        mocker.patch.object(svc, 'push_batch', side_effect=push_batch)
+
+        _, _, stats = svc.push_data(max_in_flight=1)
+
+        assert len(sends) == 2
+        assert len(sends[0]) == 10
+        assert sorted(sends[1]) == sorted(set(sends[0]) - set(stolen))
+        assert stats['lease_lost'] == 5
+        assert stats['success'] == 5
+        assert sorted(row['id'] for row in database.get_unsynced_timesheets()) == sorted(stolen)
+        database.close()
@@ -0,0 +1,97 @@
+"""
+Tests for services/retry_policy.py
+
+Run with:
+    cd backend && python -m pytest tests/test_retry_policy.py -v
+"""
+
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from unittest.mock import MagicMock
+from datetime import datetime, timezone
+from services.retry_policy import RETRY_AFTER_MAX_SECONDS, RetryPolicy, is_retryable, parse_retry_after
+
+TIMEOUT = {'error': 'timed out', 'error_type': 'timeout'}
+
+
+class TestRetryable:
+    @pytest.mark.parametrize('result', [
+        TIMEOUT, {'error_type': 'connection'}, {'status_code': 429}, {'status_code': 503}, {'status_code': 500},
+    ])
+    def test_transient_failures(self, result):
+        assert is_retryable(result)
+
+    @pytest.mark.parametrize('result', [{'status_code': 400}, {'status_code': 401}, {'error': 'boom'}])
+    def test_permanent_failures(self, result):
+        assert not is_retryable(result)
+
+
+class TestParseRetryAfter:
+    def test_delta_seconds(self):
+        assert parse_retry_after('120') == 120
+
+    def test_http_date(self):
+        now = datetime(2026, 3, 6, 8, 0, 0, tzinfo=timezone.utc)
+        assert parse_retry_after('Fri, 06 Mar 2026 08:00:30 GMT', now=now) == 30
+
+    @pytest.mark.parametrize('value', [None, '', 'soon', MagicMock()])
+    def test_unusable_values(self, value):
+        assert parse_retry_after(value) is None
+
+
+class TestRetryPolicy:
+    def test_backoff_is_jittered_below_an_exponential_cap(self):
+        policy = RetryPolicy(base_delay=2, max_delay=60, rng=lambda: 1.0)
+
+        assert [policy.backoff(attempt) for attempt in (1, 2, 3, 6, 7)] == [2, 4, 8, 60, 60]
+        assert RetryPolicy(rng=lambda: 0.0).backoff(3) == 0
+
+    def test_retry_after_overrides_backoff(self):
+        policy = RetryPolicy(rng=lambda: 1.0)
+
+        assert policy.next_delay(1, {'status_code': 503, 'retry_after': '7'}) == 7
+        assert policy.next_delay(1, {'status_code': 429, 'retry_after': str(RETRY_AFTER_MAX_SECONDS + 1)}) is None
+
+    def test_gives_up_after_max_attempts_or_permanent_errors(self):
+        policy = RetryPolicy(max_attempts=3)
+
+        assert policy.next_delay(2, TIMEOUT) is not None
+        assert policy.next_delay(3, TIMEOUT) is None
+        assert policy.next_delay(1, {'status_code': 400}) is None
+
+    def test_budget_is_shared_across_batches(self):
+        policy = RetryPolicy(budget=2)
+
+        assert policy.next_delay(1, TIMEOUT) is not None
+        assert policy.next_delay(1, TIMEOUT) is not None
+        assert policy.exhausted
+        assert policy.next_delay(1, TIMEOUT) is None
+
+    def test_call_retries_until_success(self):
+        sleep = MagicMock()
+        policy = RetryPolicy(sleep=sleep, rng=lambda: 0.5)
+        send = MagicMock(side_effect=[(False, TIMEOUT), (False, TIMEOUT), (True, {'ok': 1})])
+
+        success, result, attempts = policy.call(send)
+
+        assert success is True
+        assert result == {'ok': 1}
+        assert len(attempts) == 3
+        assert [c.args[0] for c in sleep.call_args_list] == [1.0, 2.0]
+        assert policy.retries == 2
+
+    def test_call_stops_when_told_to_give_up(self):
+        sleep = MagicMock()
+        policy = RetryPolicy(sleep=sleep)
+        send = MagicMock(return_value=(False, TIMEOUT))
+
+        success, result, attempts = policy.call(send, give_up=lambda result: result is TIMEOUT)
+
+        assert success is False
+        assert len(attempts) == 1
+        sleep.assert_not_called()
+        assert policy.retries == 0
@@ -0,0 +1,81 @@
+"""
+Tests for services/scheduler.py
+
+Run with:
+    cd backend && python -m pytest tests/test_scheduler.py -v
+"""
+
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from unittest.mock import MagicMock
+from datetime import datetime, timedelta
+from services.scheduler import SyncScheduler, in_maintenance_window
+
+
+def make_scheduler(devices, window=('00:00', '23:59')):
+    db = MagicMock()
+    db.get_api_config.return_value = {
+        'rotation_window_start': window[0], 'rotation_window_end': window[1], 'rotation_require_pushed': 1
+    }
+    db.get_enabled_devices.return_value = devices
+    pull = MagicMock()
+    pull.live_device_ids = set()
+    pull.rotate_device.return_value = (True, "ok", {})
+    return SyncScheduler(pull, MagicMock(), db)
+
+
+class TestMaintenanceWindow:
+    @pytest.mark.parametrize('time, expected', [
+        ('02:59', False), ('03:00', True), ('04:59', True), ('05:00', False),
+    ])
+    def test_same_day_window(self, time, expected):
+        now = datetime.strptime(f"2026-03-06 {time}", "%Y-%m-%d %H:%M")
+        assert in_maintenance_window(now, '03:00', '05:00') is expected
+
+    @pytest.mark.parametrize('time, expected', [
+        ('22:59', False), ('23:30', True), ('01:00', True), ('02:00', False),
+    ])
+    def test_window_spanning_midnight(self, time, expected):
+        now = datetime.strptime(f"2026-03-06 {time}", "%Y-%m-%d %H:%M")
+        assert in_maintenance_window(now, '23:00', '02:00') is expected
+
+
+class TestRunRotation:
+    def test_only_due_devices_are_rotated(self):
+        recently = (datetime.now() - timedelta(hours=1)).isoformat(sep=' ', timespec='seconds')
+        scheduler = make_scheduler([
+            {'id': 1, 'name': 'A', 'rotation_threshold': 5000},
+            {'id': 2, 'name': 'B', 'rotation_threshold': 0},
+            {'id': 3, 'name': 'C', 'rotation_threshold': 5000, 'last_rotated_at': recently},
+            {'id': 4, 'name': 'D', 'rotation_threshold': 5000},
+        ])
+        scheduler.pull_service.live_device_ids = {4}
+
+        scheduler.run_rotation()
+
+        assert [c.args[0] for c in scheduler.pull_service.rotate_device.call_args_list] == [1]
+        kwargs = scheduler.pull_service.rotate_device.call_args.kwargs
+        assert kwargs['min_records'] == 5000
+        assert kwargs['require_pushed'] is True
+
+    def test_null_require_pushed_defaults_to_true(self):
+        scheduler = make_scheduler([{'id': 1, 'name': 'A', 'rotation_threshold': 5000}])
+        scheduler.database.get_api_config.return_value['rotation_require_pushed'] = None
+
+        scheduler.run_rotation()
+
+        assert scheduler.pull_service.rotate_device.call_args.kwargs['require_pushed'] is True
+
+    def test_nothing_runs_outside_the_window(self):
+        now = datetime.now()
+        start = (now + timedelta(hours=2)).strftime("%H:%M")
+        end = (now + timedelta(hours=3)).strftime("%H:%M")
+        scheduler = make_scheduler([{'id': 1, 'name': 'A', 'rotation_threshold': 5000}], window=(start, end))
+
+        scheduler.run_rotation()
+
+        scheduler.pull_service.rotate_device.assert_not_called()
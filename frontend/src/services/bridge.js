@@ -115,10 +115,18 @@ class BridgeService {
     return this.call('getTimesheetStats')
   }
 
+  async getTimesheetStatsByDevice() {
+    return this.call('getTimesheetStatsByDevice')
+  }
+
   async getAllTimesheets(limit = 1000, offset = 0) {
     return this.call('getAllTimesheets', limit, offset)
   }
 
+  async getTimesheetsPage(limit = 100, cursor = '') {
+    return this.call('getTimesheetsPage', limit, cursor || '')
+  }
+
   async getUnsyncedTimesheets(limit = 100) {
     return this.call('getUnsyncedTimesheets', limit)
   }
@@ -188,6 +196,14 @@ class BridgeService {
     return this.call('updateDevice', deviceId, name, ip, port, commKey, branchId, enabled)
   }
 
+  async setDeviceLiveCapture(deviceId, enabled) {
+    return this.call('setDeviceLiveCapture', deviceId, enabled)
+  }
+
+  async setDeviceRotation(deviceId, threshold) {
+    return this.call('setDeviceRotation', deviceId, threshold)
+  }
+
   async deleteDevice(deviceId) {
     return this.call('deleteDevice', deviceId)
   }